@@ -0,0 +1,302 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import time
+import warnings
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch import Tensor
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+
+class ExportWrapper(nn.Module):
+    """Wrap a segmentor into a plain ``forward(inputs)`` module that can be
+    traced to TorchScript or ONNX.
+
+    The wrapped module takes a batch of raw images, in the channel order of
+    the test pipeline (BGR for images loaded by ``LoadImageFromFile``), and
+    returns the logits resized to the input size, or the label map if
+    ``with_argmax``. It reproduces the 'whole' test mode of the segmentor:
+    the normalization of its ``SegDataPreProcessor``, the network forward
+    and the final resize. The padding of the data preprocessor is not
+    applied, export models whose backbone accepts any input size.
+
+    Args:
+        model (nn.Module): A segmentor with ``_forward``, e.g.
+            :class:`EncoderDecoder`, in eval mode.
+        with_norm (bool): Fuse the normalization and channel conversion of
+            the data preprocessor. If False the inputs are expected to be
+            normalized already. Defaults to True.
+        with_argmax (bool): Return the (N, H, W) label map instead of the
+            (N, C, H, W) logits. Binary models with one output channel are
+            thresholded instead. Defaults to False.
+    """
+
+    def __init__(self,
+                 model: nn.Module,
+                 with_norm: bool = True,
+                 with_argmax: bool = False):
+        super().__init__()
+        self.model = model
+        self.with_argmax = with_argmax
+        decode_head = model.decode_head
+        if isinstance(decode_head, nn.ModuleList):
+            decode_head = decode_head[-1]
+        self.align_corners = decode_head.align_corners
+        self.threshold = getattr(decode_head, 'threshold', None)
+
+        data_preprocessor = model.data_preprocessor
+        self.with_norm = with_norm and getattr(data_preprocessor,
+                                               '_enable_normalize', False)
+        self.channel_conversion = with_norm and getattr(
+            data_preprocessor, 'channel_conversion', False)
+        if self.with_norm:
+            self.register_buffer('mean',
+                                 data_preprocessor.mean.clone()[None], False)
+            self.register_buffer('std', data_preprocessor.std.clone()[None],
+                                 False)
+
+    def forward(self, inputs: Tensor) -> Tensor:
+        """Segment a (N, 3, H, W) batch of images."""
+        x = inputs.float()
+        if self.channel_conversion:
+            x = x.flip(1)
+        if self.with_norm:
+            x = (x - self.mean) / self.std
+        seg_logits = self.model._forward(x)
+        seg_logits = F.interpolate(
+            seg_logits,
+            size=x.shape[2:],
+            mode='bilinear',
+            align_corners=self.align_corners)
+        if not self.with_argmax:
+            return seg_logits
+        if seg_logits.shape[1] == 1:
+            return (seg_logits.sigmoid() > self.threshold).squeeze(1).long()
+        return seg_logits.argmax(dim=1)
+
+
+def _example_inputs(shape: Sequence[int]) -> Tensor:
+    """Random images in [0, 255] of the (N, 3, H, W) ``shape``."""
+    generator = torch.Generator().manual_seed(0)
+    return torch.rand(tuple(shape), generator=generator) * 255
+
+
+def export_torchscript(wrapper: ExportWrapper, output_file: str,
+                       shape: Sequence[int]) -> str:
+    """Trace ``wrapper`` to a TorchScript file.
+
+    The input size is read from the input tensor at run time, so the traced
+    graph accepts other heights and widths than ``shape``, which
+    :func:`check_parity` can verify.
+
+    Args:
+        wrapper (ExportWrapper): The module to export.
+        output_file (str): The path of the ``.pt`` file.
+        shape (Sequence[int]): The (N, 3, H, W) shape of the example input.
+
+    Returns:
+        str: ``output_file``.
+    """
+    wrapper.eval()
+    with torch.no_grad(), warnings.catch_warnings():
+        # the tracer warns about every Python int taken from a shape
+        warnings.simplefilter('ignore', torch.jit.TracerWarning)
+        traced = torch.jit.trace(
+            wrapper, _example_inputs(shape), check_trace=False)
+    traced.save(output_file)
+    return output_file
+
+
+def export_onnx(wrapper: ExportWrapper,
+                output_file: str,
+                shape: Sequence[int],
+                opset_version: int = 13) -> str:
+    """Export ``wrapper`` to an ONNX file with dynamic batch size, height and
+    width.
+
+    Args:
+        wrapper (ExportWrapper): The module to export.
+        output_file (str): The path of the ``.onnx`` file.
+        shape (Sequence[int]): The (N, 3, H, W) shape of the example input.
+        opset_version (int): The ONNX opset. Defaults to 13.
+
+    Returns:
+        str: ``output_file``.
+    """
+    wrapper.eval()
+    output_axes = {0: 'batch', 1: 'height', 2: 'width'} \
+        if wrapper.with_argmax else {0: 'batch', 2: 'height', 3: 'width'}
+    with torch.no_grad(), warnings.catch_warnings():
+        warnings.simplefilter('ignore', torch.jit.TracerWarning)
+        torch.onnx.export(
+            wrapper,
+            _example_inputs(shape),
+            output_file,
+            input_names=['inputs'],
+            output_names=['outputs'],
+            dynamic_axes={
+                'inputs': {
+                    0: 'batch',
+                    2: 'height',
+                    3: 'width'
+                },
+                'outputs': output_axes
+            },
+            opset_version=opset_version)
+    return output_file
+
+
+def load_exported(file: str) -> Callable[[Tensor], Tensor]:
+    """Load an exported ``.pt`` or ``.onnx`` file as a ``fn(inputs)``
+    callable, without the mmseg or mmengine runtime.
+
+    ONNX files are run with ``onnxruntime`` on CPU.
+    """
+    if file.endswith('.onnx'):
+        if onnxruntime is None:
+            raise ImportError('Please run "pip install onnxruntime" to run '
+                              'ONNX models.')
+        session = onnxruntime.InferenceSession(
+            file, providers=['CPUExecutionProvider'])
+
+        def run_onnx(inputs: Tensor) -> Tensor:
+            outputs = session.run(None, {'inputs': inputs.numpy()})
+            return torch.from_numpy(outputs[0])
+
+        return run_onnx
+
+    module = torch.jit.load(file, map_location='cpu')
+    module.eval()
+
+    def run_torchscript(inputs: Tensor) -> Tensor:
+        with torch.no_grad():
+            return module(inputs)
+
+    return run_torchscript
+
+
+def check_parity(wrapper: ExportWrapper,
+                 run_exported: Callable[[Tensor], Tensor],
+                 shapes: Sequence[Sequence[int]],
+                 atol: float = 1e-3,
+                 max_mismatch: float = 1e-3) -> List[dict]:
+    """Compare an exported model with the eager ``wrapper``.
+
+    Logits must agree within ``atol``. Label maps may differ on a fraction
+    ``max_mismatch`` of the pixels, where two classes are nearly tied.
+
+    Args:
+        wrapper (ExportWrapper): The eager module.
+        run_exported (Callable): The exported model, see
+            :func:`load_exported`.
+        shapes (Sequence[Sequence[int]]): The (N, 3, H, W) input shapes to
+            test, preferably including other sizes than the exported one.
+        atol (float): The tolerance on the logits. Defaults to 1e-3.
+        max_mismatch (float): The tolerated fraction of different labels.
+            Defaults to 1e-3.
+
+    Returns:
+        list[dict]: For every shape, the ``max_abs_diff`` of the logits, or
+        the ``mismatch`` fraction of the labels, and whether it ``passed``.
+    """
+    reports = []
+    wrapper.eval()
+    for shape in shapes:
+        inputs = _example_inputs(shape)
+        with torch.no_grad():
+            expected = wrapper(inputs)
+            outputs = run_exported(inputs)
+        report = dict(shape=tuple(shape))
+        if tuple(outputs.shape) != tuple(expected.shape):
+            report.update(passed=False, error=f'output shape {outputs.shape}')
+        elif wrapper.with_argmax:
+            mismatch = (outputs != expected).float().mean().item()
+            report.update(mismatch=mismatch, passed=mismatch <= max_mismatch)
+        else:
+            diff = (outputs.float() - expected).abs().max().item()
+            report.update(max_abs_diff=diff, passed=diff <= atol)
+        reports.append(report)
+    return reports
+
+
+def measure_latency(run: Callable[[Tensor], Tensor],
+                    shape: Sequence[int],
+                    num_warmup: int = 3,
+                    num_runs: int = 20) -> dict:
+    """Measure the latency of ``run`` on inputs of ``shape``.
+
+    Returns:
+        dict: The ``mean``, ``median`` and ``p90`` latencies, in ms.
+    """
+    inputs = _example_inputs(shape)
+    with torch.no_grad():
+        for _ in range(num_warmup):
+            run(inputs)
+        times = []
+        for _ in range(num_runs):
+            start = time.perf_counter()
+            run(inputs)
+            times.append((time.perf_counter() - start) * 1000)
+    return dict(
+        mean=float(np.mean(times)),
+        median=float(np.median(times)),
+        p90=float(np.percentile(times, 90)))
+
+
+def export_model(model: nn.Module,
+                 output_prefix: str,
+                 formats: Sequence[str] = ('torchscript', 'onnx'),
+                 shape: Tuple[int, int] = (512, 512),
+                 with_norm: bool = True,
+                 with_argmax: bool = False,
+                 verify_shapes: Optional[Sequence[Sequence[int]]] = None,
+                 opset_version: int = 13) -> dict:
+    """Export a segmentor and check the exported files against it.
+
+    Args:
+        model (nn.Module): The segmentor, on CPU, e.g. from
+            :func:`init_model`.
+        output_prefix (str): The exported files are
+            ``{output_prefix}.pt`` and ``{output_prefix}.onnx``.
+        formats (Sequence[str]): 'torchscript' and/or 'onnx'.
+        shape (tuple[int]): The (H, W) size of the example input.
+        with_norm (bool): See :class:`ExportWrapper`. Defaults to True.
+        with_argmax (bool): See :class:`ExportWrapper`. Defaults to False.
+        verify_shapes (Sequence[Sequence[int]], optional): The (H, W) sizes
+            of the parity check. Defaults to ``shape`` and a smaller size.
+        opset_version (int): The ONNX opset. Defaults to 13.
+
+    Returns:
+        dict: The path and parity reports of every format. ONNX files are
+        only checked if ``onnxruntime`` is installed.
+    """
+    model.eval()
+    wrapper = ExportWrapper(model, with_norm, with_argmax)
+    example_shape = (1, 3) + tuple(shape)
+    if verify_shapes is None:
+        verify_shapes = [shape, (shape[0] // 2 + 32, shape[1] // 2 + 16)]
+    verify_shapes = [(1, 3) + tuple(s) for s in verify_shapes]
+
+    results = dict()
+    for fmt in formats:
+        if fmt == 'torchscript':
+            file = export_torchscript(wrapper, output_prefix + '.pt',
+                                      example_shape)
+        elif fmt == 'onnx':
+            file = export_onnx(wrapper, output_prefix + '.onnx',
+                               example_shape, opset_version)
+        else:
+            raise ValueError(f'Unknown export format {fmt}')
+        result = dict(file=file, parity=None)
+        if fmt == 'torchscript' or onnxruntime is not None:
+            result['parity'] = check_parity(wrapper, load_exported(file),
+                                            verify_shapes)
+        results[fmt] = result
+    return results
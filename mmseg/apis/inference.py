@@ -1,14 +1,16 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import warnings
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Union
+from typing import Iterator, Optional, Union
 
 import mmcv
 import numpy as np
 import torch
 from mmengine import Config
 from mmengine.registry import init_default_scope
-from mmengine.runner import load_checkpoint
+from mmengine.runner.checkpoint import CheckpointLoader, load_state_dict
 from mmengine.utils import mkdir_or_exist
 
 from mmseg.models import BaseSegmentor
@@ -16,24 +18,90 @@ from mmseg.registry import MODELS
 from mmseg.structures import SegDataSample
 from mmseg.utils import SampleList, dataset_aliases, get_classes, get_palette
 from mmseg.visualization import SegLocalVisualizer
-from .utils import ImageType, _preprare_data
+from .quantization import quantize_model
+from .utils import ImageType, _group_by_shape, _preprare_data
+
+# autocast dtypes of the inference precisions
+PRECISIONS = {'fp32': None, 'bf16': torch.bfloat16, 'fp16': torch.float16}
+
+
+def set_inference_mode(model: torch.nn.Module,
+                       precision: str = 'fp32',
+                       channels_last: bool = False) -> torch.nn.Module:
+    """Set the numeric precision and memory format of a segmentor for
+    :func:`inference_context`.
+
+    The weights stay in fp32: 'bf16' and 'fp16' run the forward under
+    ``torch.autocast``, whose support depends on the device and the PyTorch
+    version (PyTorch 2.1 autocasts to bf16 only on CPU). The logits are
+    post-processed in fp32.
+
+    Args:
+        model (nn.Module): The segmentor, already on its device.
+        precision (str): 'fp32', 'bf16' or 'fp16'. Defaults to 'fp32'.
+        channels_last (bool): Convert the 4D weights to the channels last
+            memory format, so that the convolutions produce channels last
+            feature maps. Defaults to False.
+
+    Returns:
+        nn.Module: ``model``.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f'precision must be one of {list(PRECISIONS)}, '
+                         f'but got {precision}')
+    device_type = next(model.parameters()).device.type
+    if PRECISIONS[precision] is not None:
+        # an unsupported autocast dtype only warns and disables autocast
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            torch.autocast(device_type, dtype=PRECISIONS[precision])
+        if caught:
+            raise ValueError(f'{precision} autocast is not supported on '
+                             f'{device_type}: {caught[0].message}')
+    model.to(memory_format=torch.channels_last
+             if channels_last else torch.contiguous_format)
+    model.infer_precision = precision
+    model.infer_channels_last = channels_last
+    return model
+
+
+@contextmanager
+def inference_context(model: torch.nn.Module) -> Iterator[None]:
+    """Run the enclosed forward in ``torch.inference_mode``, under autocast
+    if the precision of :func:`set_inference_mode` asks for it."""
+    dtype = PRECISIONS[getattr(model, 'infer_precision', 'fp32')]
+    with torch.inference_mode():
+        if dtype is None:
+            yield
+        else:
+            device_type = next(model.parameters()).device.type
+            with torch.autocast(device_type, dtype=dtype):
+                yield
 
 
 def init_model(config: Union[str, Path, Config],
                checkpoint: Optional[str] = None,
                device: str = 'cuda:0',
-               cfg_options: Optional[dict] = None):
+               cfg_options: Optional[dict] = None,
+               precision: str = 'fp32',
+               channels_last: bool = False):
     """Initialize a segmentor from config file.
 
     Args:
         config (str, :obj:`Path`, or :obj:`mmengine.Config`): Config file path,
             :obj:`Path`, or the config object.
         checkpoint (str, optional): Checkpoint path. If left as None, the model
-            will not load any weights.
+            will not load any weights. A checkpoint saved by
+            :func:`mmseg.apis.quantization.save_quantized` gives the int8
+            model, which runs on CPU in fp32 precision only.
         device (str, optional) CPU/CUDA device option. Default 'cuda:0'.
             Use 'cpu' for loading model on CPU.
         cfg_options (dict, optional): Options to override some settings in
             the used config.
+        precision (str): Inference precision, 'fp32', 'bf16' or 'fp16', see
+            :func:`set_inference_mode`. Defaults to 'fp32'.
+        channels_last (bool): Use the channels last memory format.
+            Defaults to False.
     Returns:
         nn.Module: The constructed segmentor.
     """
@@ -57,7 +125,24 @@ def init_model(config: Union[str, Path, Config],
 
     model = MODELS.build(config.model)
     if checkpoint is not None:
-        checkpoint = load_checkpoint(model, checkpoint, map_location='cpu')
+        checkpoint = CheckpointLoader.load_checkpoint(
+            checkpoint, map_location='cpu')
+        quantization = checkpoint.get('meta', {}).get('quantization')
+        if quantization is not None:
+            if torch.device(device).type != 'cpu' or precision != 'fp32':
+                raise ValueError('quantized models run on CPU in fp32, '
+                                 f'but got device {device} and precision '
+                                 f'{precision}')
+            quantize_model(model, **quantization)
+        _state_dict = checkpoint.get('state_dict', checkpoint)
+        # strip the prefix of the checkpoints of wrapped models, keeping the
+        # metadata, whose versions the quantized modules need
+        state_dict = OrderedDict(
+            (k[7:] if k.startswith('module.') else k, v)
+            for k, v in _state_dict.items())
+        state_dict._metadata = getattr(_state_dict, '_metadata',
+                                       OrderedDict())
+        load_state_dict(model, state_dict)
         dataset_meta = checkpoint['meta'].get('dataset_meta', None)
         # save the dataset_meta in the model for convenience
         if 'dataset_meta' in checkpoint.get('meta', {}):
@@ -91,17 +176,32 @@ def init_model(config: Union[str, Path, Config],
     model.cfg = config  # save the config in the model for convenience
     model.to(device)
     model.eval()
+    set_inference_mode(model, precision, channels_last)
     return model
 
 
-def inference_model(model: BaseSegmentor,
-                    img: ImageType) -> Union[SegDataSample, SampleList]:
+def inference_model(
+        model: BaseSegmentor,
+        img: ImageType,
+        batch_size: Optional[int] = None,
+        bucket_stride: int = 32) -> Union[SegDataSample, SampleList]:
     """Inference image(s) with the segmentor.
 
+    The forward runs in the precision set by :func:`init_model` or
+    :func:`set_inference_mode`.
+
     Args:
         model (nn.Module): The loaded segmentor.
         imgs (str/ndarray or list[str/ndarray]): Either image files or loaded
             images.
+        batch_size (int, optional): If given, a list of images is run in
+            batches of at most ``batch_size`` images. Images are grouped into
+            size buckets so that images of different sizes can be batched:
+            each batch is padded to its largest image and the padding is
+            removed from every result. Defaults to None, which runs the whole
+            list as a single batch.
+        bucket_stride (int): Size granularity of the buckets, in pixels of
+            the network input. Only used with ``batch_size``. Defaults to 32.
 
     Returns:
         :obj:`SegDataSample` or list[:obj:`SegDataSample`]:
@@ -112,8 +212,18 @@ def inference_model(model: BaseSegmentor,
     data, is_batch = _preprare_data(img, model)
 
     # forward the model
-    with torch.no_grad():
-        results = model.test_step(data)
+    if batch_size is None:
+        with inference_context(model):
+            results = model.test_step(data)
+    else:
+        shapes = [inputs.shape for inputs in data['inputs']]
+        results = [None] * len(shapes)
+        for indices in _group_by_shape(shapes, batch_size, bucket_stride):
+            batch = {k: [v[i] for i in indices] for k, v in data.items()}
+            with inference_context(model):
+                batch_results = model.test_step(batch)
+            for i, result in zip(indices, batch_results):
+                results[i] = result
 
     return results if is_batch else results[0]
 
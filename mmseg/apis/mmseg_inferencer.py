@@ -18,6 +18,7 @@ from PIL import Image
 from mmseg.structures import SegDataSample
 from mmseg.utils import ConfigType, SampleList, get_classes, get_palette
 from mmseg.visualization import SegLocalVisualizer
+from .inference import inference_context, set_inference_mode
 
 InputType = Union[str, np.ndarray]
 InputsType = Union[InputType, Sequence[InputType]]
@@ -55,6 +56,10 @@ class MMSegInferencer(BaseInferencer):
         device (str, optional): Device to run inference. If None, the available
             device will be automatically used. Defaults to None.
         scope (str, optional): The scope of the model. Defaults to 'mmseg'.
+        precision (str): Inference precision, 'fp32', 'bf16' or 'fp16', see
+            :func:`mmseg.apis.set_inference_mode`. Defaults to 'fp32'.
+        channels_last (bool): Use the channels last memory format.
+            Defaults to False.
     """ # noqa
 
     preprocess_kwargs: set = set()
@@ -72,7 +77,9 @@ class MMSegInferencer(BaseInferencer):
                  palette: Optional[Union[str, List]] = None,
                  dataset_name: Optional[str] = None,
                  device: Optional[str] = None,
-                 scope: Optional[str] = 'mmseg') -> None:
+                 scope: Optional[str] = 'mmseg',
+                 precision: str = 'fp32',
+                 channels_last: bool = False) -> None:
         # A global counter tracking the number of images processes, for
         # naming of the output images
         self.num_visualized_imgs = 0
@@ -83,6 +90,7 @@ class MMSegInferencer(BaseInferencer):
 
         if device == 'cpu' or not torch.cuda.is_available():
             self.model = revert_sync_batchnorm(self.model)
+        set_inference_mode(self.model, precision, channels_last)
 
         assert isinstance(self.visualizer, SegLocalVisualizer)
         self.visualizer.set_dataset_meta(classes, palette, dataset_name)
@@ -136,6 +144,12 @@ class MMSegInferencer(BaseInferencer):
                 'palette': get_palette('cityscapes')
             }
 
+    def forward(self, inputs: Union[dict, tuple], **kwargs) -> SampleList:
+        """Feed the inputs to the model, in the precision and memory format
+        of the inferencer."""
+        with inference_context(self.model):
+            return self.model.test_step(inputs)
+
     def __call__(self,
                  inputs: InputsType,
                  return_datasamples: bool = False,
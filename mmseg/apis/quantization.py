@@ -0,0 +1,237 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import warnings
+from typing import Iterable, List, Optional
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from mmengine.runner import save_checkpoint
+from torch import Tensor
+from torch.ao.quantization import (QuantWrapper, convert,
+                                   default_dynamic_qconfig,
+                                   get_default_qconfig, prepare,
+                                   quantize_dynamic)
+
+from mmseg.models.backbones.mit import EfficientMultiheadAttention, MixFFN
+from mmseg.models.utils import fuse_conv_bn
+
+QUANT_MODES = ('dynamic', 'static')
+
+
+class QuantizableAttention(nn.Module):
+    """Replacement of the ``nn.MultiheadAttention`` of
+    :class:`EfficientMultiheadAttention` whose query, key-value and output
+    projections are separate ``nn.Linear`` layers, which the PyTorch
+    quantization passes can swap for int8 linears.
+
+    It takes the arguments of ``nn.MultiheadAttention`` as called by
+    :class:`EfficientMultiheadAttention`, where the key and the value are the
+    same tensor, and is meant for inference only.
+
+    Args:
+        attn (nn.MultiheadAttention): The attention whose projections are
+            copied.
+    """
+
+    def __init__(self, attn: nn.MultiheadAttention):
+        super().__init__()
+        self.num_heads = attn.num_heads
+        self.batch_first = attn.batch_first
+        C = attn.embed_dim
+        with_bias = attn.in_proj_bias is not None
+        self.q_proj = nn.Linear(C, C, bias=with_bias)
+        self.kv_proj = nn.Linear(C, 2 * C, bias=with_bias)
+        self.out_proj = nn.Linear(C, C)
+        with torch.no_grad():
+            w_q, w_kv = attn.in_proj_weight.split([C, 2 * C])
+            self.q_proj.weight.copy_(w_q)
+            self.kv_proj.weight.copy_(w_kv)
+            if with_bias:
+                b_q, b_kv = attn.in_proj_bias.split([C, 2 * C])
+                self.q_proj.bias.copy_(b_q)
+                self.kv_proj.bias.copy_(b_kv)
+            self.out_proj.load_state_dict(attn.out_proj.state_dict())
+
+    def forward(self,
+                query: Tensor,
+                key: Tensor,
+                value: Tensor,
+                need_weights: bool = False) -> tuple:
+        if not self.batch_first:
+            query, key = query.transpose(0, 1), key.transpose(0, 1)
+        B, Nq, C = query.shape
+        head_dims = C // self.num_heads
+        q = self.q_proj(query).unflatten(-1, (self.num_heads, head_dims))
+        k, v = self.kv_proj(key).unflatten(
+            -1, (2, self.num_heads, head_dims)).permute(2, 0, 3, 1, 4)
+        out = F.scaled_dot_product_attention(q.transpose(1, 2), k, v)
+        out = self.out_proj(out.transpose(1, 2).flatten(2))
+        if not self.batch_first:
+            out = out.transpose(0, 1)
+        return out, None
+
+
+def _to_torch_module(module: nn.Module) -> nn.Module:
+    """Copy a subclass of a torch conv or linear, e.g. the ``Conv2d`` of
+    mmcv, into the torch class, which the quantization mappings expect."""
+    for cls in (nn.Conv2d, nn.Linear):
+        if isinstance(module, cls) and type(module) is not cls:
+            if cls is nn.Linear:
+                plain = nn.Linear(module.in_features, module.out_features,
+                                  module.bias is not None)
+            else:
+                plain = nn.Conv2d(
+                    module.in_channels,
+                    module.out_channels,
+                    module.kernel_size,
+                    stride=module.stride,
+                    padding=module.padding,
+                    dilation=module.dilation,
+                    groups=module.groups,
+                    bias=module.bias is not None,
+                    padding_mode=module.padding_mode)
+            plain.load_state_dict(module.state_dict())
+            return plain
+    return module
+
+
+def _prepare_modules(model: nn.Module, static: bool) -> List[str]:
+    """Rewrite the quantized parts of ``model`` in place.
+
+    The attention projections are split into ``nn.Linear`` layers. For static
+    quantization, the convs of the MixFFNs, the spatial reduction convs of
+    the attentions, the projections and the convs of the decode head are
+    wrapped into ``QuantWrapper``, which quantizes their inputs and
+    dequantizes their outputs. The MixFFN ``fc1`` and depth-wise ``pe_conv``
+    share a wrapper, the GELU between ``pe_conv`` and ``fc2`` has no int8
+    kernel.
+
+    Returns:
+        list[str]: The names of the modules to quantize.
+    """
+    targets = []
+
+    def wrap(module):
+        if static:
+            module = QuantWrapper(_to_torch_module(module))
+        targets.append(module)
+        return module
+
+    decode_heads = getattr(model, 'decode_head', None)
+    decode_heads = [] if decode_heads is None else \
+        decode_heads if isinstance(decode_heads, nn.ModuleList) \
+        else [decode_heads]
+    for module in list(model.modules()):
+        if isinstance(module, EfficientMultiheadAttention):
+            if not isinstance(module.attn, QuantizableAttention):
+                module.attn = QuantizableAttention(module.attn)
+            # the 'sdpa' backend reads the packed projections of the
+            # ``nn.MultiheadAttention``, 'mha' calls the replacement
+            module.attn_backend = 'mha'
+            for name in ('q_proj', 'kv_proj', 'out_proj'):
+                setattr(module.attn, name, wrap(getattr(module.attn, name)))
+            if static and module.sr_ratio > 1:
+                module.sr = wrap(module.sr)
+        elif isinstance(module, MixFFN) and static:
+            fc1, pe_conv, _, _, fc2, _ = module.layers
+            module.layers[0] = wrap(
+                nn.Sequential(
+                    _to_torch_module(fc1), _to_torch_module(pe_conv)))
+            module.layers[1] = nn.Identity()
+            module.layers[4] = wrap(fc2)
+    if static:
+        for head in decode_heads:
+            for parent in list(head.modules()):
+                for name, child in parent.named_children():
+                    if isinstance(child, nn.Conv2d):
+                        setattr(parent, name, wrap(child))
+
+    target_ids = {id(module) for module in targets}
+    return [
+        name for name, module in model.named_modules()
+        if id(module) in target_ids
+    ]
+
+
+def quantize_model(model: nn.Module,
+                   mode: str = 'static',
+                   data_batches: Optional[Iterable[dict]] = None,
+                   backend: str = 'x86') -> nn.Module:
+    """Post-training int8 quantization of a SegFormer for CPU inference.
+
+    The BN layers are folded into the convs first. 'dynamic' mode quantizes
+    the weights of the attention projections and quantizes their inputs on
+    the fly, PyTorch has no dynamic int8 conv. 'static' mode also quantizes
+    the MixFFN convs, the spatial reduction convs of the attentions and the
+    decode head convs, with activation ranges calibrated on
+    ``data_batches``. The patch embeddings, the norms, the attention itself
+    and the resizes stay in fp32.
+
+    Without ``data_batches``, a static model gets the quantized structure
+    with placeholder ranges, to load the state dict of a quantized
+    checkpoint into, as :func:`mmseg.apis.init_model` does.
+
+    Args:
+        model (nn.Module): A segmentor with a :class:`MixVisionTransformer`
+            backbone, on CPU and in eval mode.
+        mode (str): 'dynamic' or 'static'. Defaults to 'static'.
+        data_batches (Iterable[dict], optional): Batches of the dataloader
+            run through ``model.test_step`` to calibrate a static model.
+            Defaults to None.
+        backend (str): The quantized engine, see
+            ``torch.backends.quantized.supported_engines``.
+            Defaults to 'x86'.
+
+    Returns:
+        nn.Module: ``model``, quantized in place.
+    """
+    if mode not in QUANT_MODES:
+        raise ValueError(f'mode must be one of {QUANT_MODES}, but got {mode}')
+    if backend not in torch.backends.quantized.supported_engines:
+        raise ValueError(f'the quantized engine {backend} is not supported, '
+                         'the supported engines are '
+                         f'{torch.backends.quantized.supported_engines}')
+    torch.backends.quantized.engine = backend
+    model.eval()
+    fuse_conv_bn(model)
+    names = _prepare_modules(model, mode == 'static')
+    if not names:
+        raise ValueError(f'{type(model).__name__} has no module to quantize, '
+                         'only MiT backbones and their decode heads are '
+                         'supported')
+
+    if mode == 'dynamic':
+        quantize_dynamic(
+            model, {name: default_dynamic_qconfig
+                    for name in names},
+            inplace=True)
+    else:
+        qconfig = get_default_qconfig(backend)
+        for module in model.modules():
+            if isinstance(module, QuantWrapper):
+                module.qconfig = qconfig
+        prepare(model, inplace=True)
+        with warnings.catch_warnings():
+            if data_batches is None:
+                # the observers have not seen any data
+                warnings.simplefilter('ignore')
+            else:
+                with torch.no_grad():
+                    for data in data_batches:
+                        model.test_step(data)
+            convert(model, inplace=True)
+    model.quantization = dict(mode=mode, backend=backend)
+    return model
+
+
+def save_quantized(model: nn.Module, filename: str) -> None:
+    """Save a model quantized by :func:`quantize_model` to a checkpoint that
+    :func:`mmseg.apis.init_model` loads.
+
+    The quantization mode and engine are saved in the meta of the
+    checkpoint, with the dataset meta of the model if it has one.
+    """
+    meta = dict(quantization=model.quantization)
+    if hasattr(model, 'dataset_meta'):
+        meta['dataset_meta'] = model.dataset_meta
+    save_checkpoint(dict(meta=meta, state_dict=model.state_dict()), filename)
@@ -1,6 +1,7 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import copy
 from collections import defaultdict
-from typing import Sequence, Union
+from typing import List, Sequence, Tuple, Union
 
 import numpy as np
 from mmengine.dataset import Compose
@@ -9,24 +10,82 @@ from mmengine.model import BaseModel
 ImageType = Union[str, np.ndarray, Sequence[str], Sequence[np.ndarray]]
 
 
-def _preprare_data(imgs: ImageType, model: BaseModel):
+def _get_test_pipeline(model: BaseModel, from_ndarray: bool) -> Compose:
+    """Get the inference pipeline of a model, building it only once.
+
+    The pipeline is derived from ``model.cfg.test_pipeline`` without
+    ``LoadAnnotations`` and, for ndarray inputs, with the loading transform
+    replaced by ``LoadImageFromNDArray``. ``model.cfg`` is left untouched.
+    Built pipelines are cached on the model, keyed by the input kind and the
+    content of ``test_pipeline``, so that editing the config still takes
+    effect.
+
+    Args:
+        model (BaseModel): The loaded segmentor.
+        from_ndarray (bool): Whether the inputs are loaded images.
+
+    Returns:
+        Compose: The test pipeline.
+    """
+    test_pipeline = model.cfg.test_pipeline
+    key = (from_ndarray, repr(test_pipeline))
+    cache = getattr(model, '_test_pipeline_cache', None)
+    if cache is None:
+        cache = model._test_pipeline_cache = dict()
+    if key not in cache:
+        pipeline_cfg = [
+            copy.deepcopy(t) for t in test_pipeline
+            if t.get('type') != 'LoadAnnotations'
+        ]
+        if from_ndarray:
+            pipeline_cfg[0]['type'] = 'LoadImageFromNDArray'
+        cache[key] = Compose(pipeline_cfg)
+    return cache[key]
+
+
+def _shape_bucket(shape: Sequence[int], bucket_stride: int) -> Tuple[int]:
+    """Key of the size bucket of an input of shape (..., H, W).
+
+    Inputs whose height and width round up to the same multiple of
+    ``bucket_stride`` share a bucket, so that padding them to a common size
+    wastes less than ``bucket_stride`` pixels per side.
+    """
+    h, w = shape[-2:]
+    return (-(-h // bucket_stride), -(-w // bucket_stride))
 
-    cfg = model.cfg
-    for t in cfg.test_pipeline:
-        if t.get('type') == 'LoadAnnotations':
-            cfg.test_pipeline.remove(t)
+
+def _group_by_shape(shapes: Sequence[Sequence[int]], batch_size: int,
+                    bucket_stride: int) -> List[List[int]]:
+    """Group input indices into batches of similarly sized inputs.
+
+    Args:
+        shapes (Sequence[Sequence[int]]): Shapes (..., H, W) of the inputs.
+        batch_size (int): The maximum number of inputs per batch.
+        bucket_stride (int): Size granularity of the buckets, see
+            :func:`_shape_bucket`.
+
+    Returns:
+        list[list[int]]: Indices of the inputs of each batch, in the order
+        of their first input.
+    """
+    buckets = defaultdict(list)
+    for idx, shape in enumerate(shapes):
+        buckets[_shape_bucket(shape, bucket_stride)].append(idx)
+    batches = [
+        indices[i:i + batch_size] for indices in buckets.values()
+        for i in range(0, len(indices), batch_size)
+    ]
+    return sorted(batches, key=lambda indices: indices[0])
+
+
+def _preprare_data(imgs: ImageType, model: BaseModel):
 
     is_batch = True
     if not isinstance(imgs, (list, tuple)):
         imgs = [imgs]
         is_batch = False
 
-    if isinstance(imgs[0], np.ndarray):
-        cfg.test_pipeline[0]['type'] = 'LoadImageFromNDArray'
-
-    # TODO: Consider using the singleton pattern to avoid building
-    # a pipeline for each inference
-    pipeline = Compose(cfg.test_pipeline)
+    pipeline = _get_test_pipeline(model, isinstance(imgs[0], np.ndarray))
 
     data = defaultdict(list)
     for img in imgs:
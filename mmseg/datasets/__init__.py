@@ -2,6 +2,7 @@
 from .basesegdataset import BaseCDDataset, BaseSegDataset
 from .fashionpedia import FashionpediaDataset
 from .pog_bg import PogBgDataset
+from .sharded import ShardedSegDataset, ShardWriter
 
 from .transforms import (
     CLAHE,
@@ -16,10 +17,12 @@ from .transforms import (
     ConcatCDInput,
     GenerateEdge,
     LoadAnnotations,
+    LoadAnnotationsFromShard,
     LoadBiomedicalAnnotation,
     LoadBiomedicalData,
     LoadBiomedicalImageFromFile,
     LoadImageFromNDArray,
+    LoadImageFromShard,
     LoadMultipleRSImageFromFile,
     LoadSingleRSImageFromFile,
     PackSegInputs,
@@ -43,6 +46,8 @@ __all__ = [
     "BioMedical3DRandomFlip",
     "FashionpediaDataset",
     "PogBgDataset",
+    "ShardedSegDataset",
+    "ShardWriter",
     "LoadAnnotations",
     "RandomCrop",
     "SegRescale",
@@ -73,4 +78,6 @@ __all__ = [
     "LoadMultipleRSImageFromFile",
     "LoadSingleRSImageFromFile",
     "ConcatCDInput",
+    "LoadImageFromShard",
+    "LoadAnnotationsFromShard",
 ]
@@ -1,12 +1,17 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import copy
+import hashlib
+import logging
+import os
 import os.path as osp
+from concurrent.futures import ThreadPoolExecutor
 from typing import Callable, Dict, List, Optional, Sequence, Union
 
 import mmengine
 import mmengine.fileio as fileio
 import numpy as np
 from mmengine.dataset import BaseDataset, Compose
+from mmengine.logging import print_log
 
 from mmseg.registry import DATASETS
 
@@ -77,6 +82,14 @@ class BaseSegDataset(BaseDataset):
             See https://mmengine.readthedocs.io/en/latest/api/fileio.htm
             for details. Defaults to None.
             Notes: mmcv>=2.0.0rc4, mmengine>=0.2.0 required.
+        index_cache (dict, optional): Keep the list of images found in
+            ``img_path`` in a persistent index, so that the folder is not
+            walked again while it is unchanged. Only used for local folders
+            without ``ann_file``. Accepts ``path``, the index file, which
+            defaults to a hidden ``.mmseg_index_*.npz`` file in
+            ``data_root``, and ``nproc``, the number of threads checking
+            that every image has its ``seg_map_suffix`` mask when the index
+            is built, defaulting to 8. Defaults to None.
     """
     METAINFO: dict = dict()
 
@@ -96,13 +109,15 @@ class BaseSegDataset(BaseDataset):
                  max_refetch: int = 1000,
                  ignore_index: int = 255,
                  reduce_zero_label: bool = False,
-                 backend_args: Optional[dict] = None) -> None:
+                 backend_args: Optional[dict] = None,
+                 index_cache: Optional[dict] = None) -> None:
 
         self.img_suffix = img_suffix
         self.seg_map_suffix = seg_map_suffix
         self.ignore_index = ignore_index
         self.reduce_zero_label = reduce_zero_label
         self.backend_args = backend_args.copy() if backend_args else None
+        self.index_cache = copy.deepcopy(index_cache)
 
         self.data_root = data_root
         self.data_prefix = copy.copy(data_prefix)
@@ -253,12 +268,16 @@ class BaseSegDataset(BaseDataset):
                 data_list.append(data_info)
         else:
             _suffix_len = len(self.img_suffix)
-            for img in fileio.list_dir_or_file(
+            if self.index_cache is not None and self.backend_args is None:
+                img_names = self._load_index(img_dir, ann_dir)
+            else:
+                img_names = fileio.list_dir_or_file(
                     dir_path=img_dir,
                     list_dir=False,
                     suffix=self.img_suffix,
                     recursive=True,
-                    backend_args=self.backend_args):
+                    backend_args=self.backend_args)
+            for img in img_names:
                 data_info = dict(img_path=osp.join(img_dir, img))
                 if ann_dir is not None:
                     seg_map = img[:-_suffix_len] + self.seg_map_suffix
@@ -270,6 +289,147 @@ class BaseSegDataset(BaseDataset):
             data_list = sorted(data_list, key=lambda x: x['img_path'])
         return data_list
 
+    def _index_key(self, img_dir: str, ann_dir: Optional[str]) -> str:
+        """The folders and suffixes an index is built for."""
+        return '|'.join(
+            str(x) for x in (osp.abspath(img_dir), ann_dir, self.img_suffix,
+                             self.seg_map_suffix))
+
+    def _index_path(self, img_dir: str, ann_dir: Optional[str]) -> str:
+        """The default index file of a split, named after the folders and
+        suffixes it depends on."""
+        key = self._index_key(img_dir, ann_dir)
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        root = self.data_root if self.data_root else osp.dirname(
+            osp.abspath(img_dir))
+        return osp.join(root, f'.mmseg_index_{digest}.npz')
+
+    def _load_index(self, img_dir: str, ann_dir: Optional[str]) -> List[str]:
+        """Get the sorted image names of ``img_dir`` from the persistent
+        index, rebuilding it if a folder changed since it was written.
+
+        The index records the modification time of every folder under
+        ``img_dir`` and ``ann_dir``. Adding, removing or renaming a file
+        updates the time of its folder, so the index is valid as long as
+        all the recorded times are unchanged, which only costs one ``stat``
+        per folder instead of listing every file. It also records the
+        folders and suffixes it was built for, so that splits sharing an
+        ``index_cache['path']`` rebuild it instead of reading each other's
+        image names.
+        """
+        key = self._index_key(img_dir, ann_dir)
+        index_path = self.index_cache.get('path', None) or self._index_path(
+            img_dir, ann_dir)
+        if osp.isfile(index_path):
+            try:
+                with np.load(index_path) as index:
+                    dirs = _decode_names(index['dirs'])
+                    mtimes = index['mtimes']
+                    same_key = 'key' in index.files and _decode_names(
+                        index['key']) == [key]
+                    if same_key and all(
+                            _dir_mtime(d) == m
+                            for d, m in zip(dirs, mtimes.tolist())):
+                        img_names = _decode_names(index['names'])
+                        orphans = _decode_names(index['orphans'])
+                        self._report_orphans(orphans, ann_dir)
+                        return img_names
+            except (OSError, KeyError, ValueError) as e:
+                print_log(
+                    f'Ignoring the unreadable dataset index {index_path}: '
+                    f'{e}',
+                    logger='current',
+                    level=logging.WARNING)
+
+        # the folder times are taken as they are listed, so that a file
+        # added during the walk invalidates the index on the next load
+        dirs, mtimes, img_names = [], [], []
+        for root, _, files in os.walk(osp.abspath(img_dir), followlinks=True):
+            dirs.append(root)
+            mtimes.append(_dir_mtime(root))
+            rel_root = osp.relpath(root, osp.abspath(img_dir))
+            for file in files:
+                if file.endswith(self.img_suffix):
+                    img_names.append(
+                        file if rel_root == '.' else osp.join(rel_root, file))
+        img_names.sort()
+        orphans = []
+        if ann_dir is not None:
+            for root, _, _ in os.walk(osp.abspath(ann_dir), followlinks=True):
+                dirs.append(root)
+                mtimes.append(_dir_mtime(root))
+            orphans = self._find_orphans(img_names, ann_dir)
+        self._report_orphans(orphans, ann_dir)
+
+        try:
+            # write then rename, so that a concurrent reader never sees a
+            # partial index
+            tmp_path = f'{index_path}.{os.getpid()}.tmp.npz'
+            np.savez(
+                tmp_path,
+                key=_encode_names([key]),
+                dirs=_encode_names(dirs),
+                mtimes=np.array(mtimes, dtype=np.int64),
+                names=_encode_names(img_names),
+                orphans=_encode_names(orphans))
+            os.replace(tmp_path, index_path)
+        except OSError as e:
+            print_log(
+                f'Could not write the dataset index {index_path}: {e}',
+                logger='current',
+                level=logging.WARNING)
+        return img_names
+
+    def _find_orphans(self, img_names: List[str], ann_dir: str) -> List[str]:
+        """Find in parallel the images without a segmentation map."""
+        _suffix_len = len(self.img_suffix)
+        nproc = max(1, self.index_cache.get('nproc', 8))
+        chunk = -(-len(img_names) // nproc)
+
+        def missing(names):
+            return [
+                name for name in names if not osp.isfile(
+                    osp.join(ann_dir,
+                             name[:-_suffix_len] + self.seg_map_suffix))
+            ]
+
+        with ThreadPoolExecutor(max_workers=nproc) as pool:
+            chunks = pool.map(missing, [
+                img_names[i:i + chunk]
+                for i in range(0, len(img_names), max(chunk, 1))
+            ])
+            return [name for names in chunks for name in names]
+
+    def _report_orphans(self, orphans: List[str],
+                        ann_dir: Optional[str]) -> None:
+        """Warn about the images without a segmentation map."""
+        if orphans:
+            print_log(
+                f'{len(orphans)} images have no `{self.seg_map_suffix}` '
+                f'segmentation map in {ann_dir}, e.g. '
+                f'{", ".join(orphans[:5])}',
+                logger='current',
+                level=logging.WARNING)
+
+
+def _dir_mtime(path: str) -> int:
+    """Modification time of a folder in ns, -1 if it does not exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return -1
+
+
+def _encode_names(names: List[str]) -> np.ndarray:
+    """Pack strings into a compact uint8 array, separated by newlines."""
+    return np.frombuffer('\n'.join(names).encode(), dtype=np.uint8)
+
+
+def _decode_names(array: np.ndarray) -> List[str]:
+    """Unpack strings packed by ``_encode_names``."""
+    data = array.tobytes().decode()
+    return data.split('\n') if data else []
+
 
 @DATASETS.register_module()
 class BaseCDDataset(BaseDataset):
@@ -0,0 +1,178 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import json
+import os
+import os.path as osp
+from typing import List, Optional
+
+import mmengine
+import numpy as np
+
+from mmseg.registry import DATASETS
+from .basesegdataset import BaseSegDataset
+
+SHARD_INDEX = 'index.json'
+SHARD_VERSION = 1
+
+
+class ShardWriter:
+    """Pack decoded images and segmentation maps into memory-mappable shards.
+
+    Each shard is a flat ``shard_XXXXX.bin`` file holding raw uint8 arrays
+    back to back, and ``index.json`` records where every sample lives:
+
+    .. code-block:: none
+
+        {
+            "version": 1,
+            "scale": [1080, 1080] or null,
+            "channel_order": "bgr",
+            "shards": ["shard_00000.bin", ...],
+            "samples": [
+                {
+                    "name": "xxx",
+                    "img_path": "/original/images/train/xxx.jpg",
+                    "shard": 0,
+                    "img_offset": 0,
+                    "img_shape": [H, W, 3],
+                    "seg_offset": 3 * H * W,   # null without a mask
+                    "seg_shape": [H, W]        # null without a mask
+                },
+                ...
+            ]
+        }
+
+    Images are stored in C order as (H, W, 3), segmentation maps as (H, W),
+    so a sample is read back with a plain ``np.frombuffer`` on the mapped
+    shard. The index is only written by ``close``, hence an interrupted
+    conversion leaves no usable dataset behind.
+
+    Args:
+        out_dir (str): The output folder, created if needed.
+        shard_size (int): A new shard is started once the current one
+            exceeds this many bytes. Defaults to 1 GiB.
+        scale (tuple[int], optional): The scale the samples were resized to,
+            recorded in the index for reference. Defaults to None.
+    """
+
+    def __init__(self, out_dir: str, shard_size: int = 1 << 30, scale=None):
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        self.scale = list(scale) if scale is not None else None
+        self.shards = []
+        self.samples = []
+        self._file = None
+        os.makedirs(out_dir, exist_ok=True)
+
+    def _next_shard(self):
+        if self._file is not None:
+            self._file.close()
+        name = f'shard_{len(self.shards):05d}.bin'
+        self.shards.append(name)
+        self._file = open(osp.join(self.out_dir, name), 'wb')
+
+    def write(self,
+              name: str,
+              img: np.ndarray,
+              seg_map: Optional[np.ndarray] = None,
+              img_path: Optional[str] = None) -> None:
+        """Append a sample to the current shard.
+
+        Args:
+            name (str): The sample name, usually the image file stem.
+            img (np.ndarray): The (H, W, 3) uint8 image.
+            seg_map (np.ndarray, optional): The (H, W) uint8 segmentation map.
+            img_path (str, optional): The path of the source image.
+        """
+        assert img.dtype == np.uint8 and img.ndim == 3, \
+            'img must be (H, W, C) uint8'
+        if self._file is None or self._file.tell() >= self.shard_size:
+            self._next_shard()
+        sample = dict(
+            name=name,
+            img_path=img_path,
+            shard=len(self.shards) - 1,
+            img_offset=self._file.tell(),
+            img_shape=list(img.shape),
+            seg_offset=None,
+            seg_shape=None)
+        self._file.write(np.ascontiguousarray(img).tobytes())
+        if seg_map is not None:
+            assert seg_map.dtype == np.uint8 and \
+                seg_map.shape == img.shape[:2], \
+                'seg_map must be a uint8 (H, W) map of the image size'
+            sample['seg_offset'] = self._file.tell()
+            sample['seg_shape'] = list(seg_map.shape)
+            self._file.write(np.ascontiguousarray(seg_map).tobytes())
+        self.samples.append(sample)
+
+    def close(self) -> None:
+        """Close the last shard and write the index."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        index = dict(
+            version=SHARD_VERSION,
+            scale=self.scale,
+            channel_order='bgr',
+            shards=self.shards,
+            samples=self.samples)
+        with open(osp.join(self.out_dir, SHARD_INDEX), 'w') as f:
+            json.dump(index, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self._file is not None:
+            self._file.close()
+
+
+@DATASETS.register_module()
+class ShardedSegDataset(BaseSegDataset):
+    """Dataset reading the shards written by
+    ``tools/dataset_converters/pack_shards.py``.
+
+    ``data_prefix['img_path']`` is the folder holding ``index.json`` and the
+    shards. The samples are meant to be loaded with ``LoadImageFromShard``
+    and ``LoadAnnotationsFromShard``, which map the shards instead of
+    decoding files. ``img_path`` still points to the source image, if the
+    converter was given one, for visualization and result files.
+
+    The classes are not stored in the shards, so ``metainfo`` has to be
+    given in the config unless a subclass sets ``METAINFO``.
+    """
+
+    def __init__(self, data_prefix=dict(img_path=''), **kwargs) -> None:
+        super().__init__(data_prefix=data_prefix, **kwargs)
+
+    def load_data_list(self) -> List[dict]:
+        """Load the sample locations from the shard index.
+
+        Returns:
+            list[dict]: All data info of dataset.
+        """
+        shard_dir = self.data_prefix.get('img_path', None)
+        index = mmengine.load(
+            osp.join(shard_dir, SHARD_INDEX), file_format='json')
+        assert index['version'] == SHARD_VERSION, \
+            f'Unsupported shard version {index["version"]}, ' \
+            f'expected {SHARD_VERSION}'
+        shard_paths = [osp.join(shard_dir, shard) for shard in index['shards']]
+        data_list = []
+        for sample in index['samples']:
+            data_info = dict(
+                img_path=sample['img_path']
+                or osp.join(shard_dir, sample['name']),
+                shard_path=shard_paths[sample['shard']],
+                img_offset=sample['img_offset'],
+                img_shard_shape=tuple(sample['img_shape']))
+            if sample['seg_offset'] is not None:
+                data_info['seg_offset'] = sample['seg_offset']
+                data_info['seg_shard_shape'] = tuple(sample['seg_shape'])
+            data_info['label_map'] = self.label_map
+            data_info['reduce_zero_label'] = self.reduce_zero_label
+            data_info['seg_fields'] = []
+            data_list.append(data_info)
+        return data_list
@@ -1,8 +1,9 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 from .formatting import PackSegInputs
-from .loading import (LoadAnnotations, LoadBiomedicalAnnotation,
-                      LoadBiomedicalData, LoadBiomedicalImageFromFile,
-                      LoadDepthAnnotation, LoadImageFromNDArray,
+from .loading import (LoadAnnotations, LoadAnnotationsFromShard,
+                      LoadBiomedicalAnnotation, LoadBiomedicalData,
+                      LoadBiomedicalImageFromFile, LoadDepthAnnotation,
+                      LoadImageFromNDArray, LoadImageFromShard,
                       LoadMultipleRSImageFromFile, LoadSingleRSImageFromFile)
 # yapf: disable
 from .transforms import (CLAHE, AdjustGamma, Albu, BioMedical3DPad,
@@ -26,5 +27,5 @@ __all__ = [
     'BioMedical3DRandomFlip', 'BioMedicalRandomGamma', 'BioMedical3DPad',
     'RandomRotFlip', 'Albu', 'LoadSingleRSImageFromFile', 'ConcatCDInput',
     'LoadMultipleRSImageFromFile', 'LoadDepthAnnotation', 'RandomDepthMix',
-    'RandomFlip', 'Resize'
+    'RandomFlip', 'Resize', 'LoadImageFromShard', 'LoadAnnotationsFromShard'
 ]
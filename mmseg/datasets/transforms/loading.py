@@ -1,5 +1,6 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import warnings
+from functools import lru_cache
 from typing import Dict, Optional, Union
 
 import mmcv
@@ -10,7 +11,7 @@ from mmcv.transforms import LoadAnnotations as MMCV_LoadAnnotations
 from mmcv.transforms import LoadImageFromFile
 
 from mmseg.registry import TRANSFORMS
-from mmseg.utils import datafrombytes
+from mmseg.utils import build_label_lut, datafrombytes
 
 try:
     from osgeo import gdal
@@ -85,6 +86,7 @@ class LoadAnnotations(MMCV_LoadAnnotations):
                           'set `reduce_zero_label=True` when dataset '
                           'initialized')
         self.imdecode_backend = imdecode_backend
+        self._label_luts = dict()
 
     def _load_seg_map(self, results: dict) -> None:
         """Private function to load semantic segmentation annotations.
@@ -96,11 +98,7 @@ class LoadAnnotations(MMCV_LoadAnnotations):
             dict: The dict contains loaded semantic segmentation annotations.
         """
 
-        img_bytes = fileio.get(
-            results['seg_map_path'], backend_args=self.backend_args)
-        gt_semantic_seg = mmcv.imfrombytes(
-            img_bytes, flag='unchanged',
-            backend=self.imdecode_backend).squeeze().astype(np.uint8)
+        gt_semantic_seg = self._read_seg_map(results)
 
         # reduce zero_label
         if self.reduce_zero_label is None:
@@ -109,22 +107,31 @@ class LoadAnnotations(MMCV_LoadAnnotations):
             'Initialize dataset with `reduce_zero_label` as ' \
             f'{results["reduce_zero_label"]} but when load annotation ' \
             f'the `reduce_zero_label` is {self.reduce_zero_label}'
-        if self.reduce_zero_label:
-            # avoid using underflow conversion
-            gt_semantic_seg[gt_semantic_seg == 0] = 255
-            gt_semantic_seg = gt_semantic_seg - 1
-            gt_semantic_seg[gt_semantic_seg == 254] = 255
-        # modify if custom classes
-        if results.get('label_map', None) is not None:
-            # Add deep copy to solve bug of repeatedly
-            # replace `gt_semantic_seg`, which is reported in
-            # https://github.com/open-mmlab/mmsegmentation/pull/1445/
-            gt_semantic_seg_copy = gt_semantic_seg.copy()
-            for old_id, new_id in results['label_map'].items():
-                gt_semantic_seg[gt_semantic_seg_copy == old_id] = new_id
+        # reduce zero_label and modify if custom classes, in one lookup
+        label_map = results.get('label_map', None)
+        if self.reduce_zero_label or label_map:
+            gt_semantic_seg = self._get_label_lut(label_map)[gt_semantic_seg]
         results['gt_seg_map'] = gt_semantic_seg
         results['seg_fields'].append('gt_seg_map')
 
+    def _get_label_lut(self, label_map: Optional[dict]) -> np.ndarray:
+        """Get the lookup table of ``label_map`` and the zero label
+        reduction, compiled once per mapping."""
+        key = tuple(label_map.items()) if label_map else None
+        lut = self._label_luts.get(key, None)
+        if lut is None:
+            lut = build_label_lut(label_map, self.reduce_zero_label)
+            self._label_luts[key] = lut
+        return lut
+
+    def _read_seg_map(self, results: dict) -> np.ndarray:
+        """Read the raw (H, W) uint8 segmentation map of a sample."""
+        img_bytes = fileio.get(
+            results['seg_map_path'], backend_args=self.backend_args)
+        return mmcv.imfrombytes(
+            img_bytes, flag='unchanged',
+            backend=self.imdecode_backend).squeeze().astype(np.uint8)
+
     def __repr__(self) -> str:
         repr_str = self.__class__.__name__
         repr_str += f'(reduce_zero_label={self.reduce_zero_label}, '
@@ -180,6 +187,121 @@ class LoadImageFromNDArray(LoadImageFromFile):
         return results
 
 
+@lru_cache(maxsize=None)
+def _map_shard(shard_path: str) -> np.memmap:
+    """Map a shard read-only, once per process."""
+    return np.memmap(shard_path, dtype=np.uint8, mode='r')
+
+
+@TRANSFORMS.register_module()
+class LoadImageFromShard(BaseTransform):
+    """Load an image from the shards of :obj:`ShardedSegDataset`.
+
+    The image is a read-only view of the memory-mapped shard, so loading it
+    costs neither a decode nor a copy. Transforms that write into the image
+    in place need ``copy=True``.
+
+    Required Keys:
+
+    - shard_path
+    - img_offset
+    - img_shard_shape
+
+    Modified Keys:
+
+    - img
+    - img_shape
+    - ori_shape
+
+    Args:
+        to_float32 (bool): Whether to convert the loaded image to a float32
+            numpy array. If set to False, the loaded image is an uint8 array.
+            Defaults to False.
+        copy (bool): Whether to copy the image out of the shard, giving a
+            writable array. Defaults to False.
+    """
+
+    def __init__(self, to_float32: bool = False, copy: bool = False) -> None:
+        self.to_float32 = to_float32
+        self.copy = copy
+
+    def transform(self, results: dict) -> dict:
+        """Functions to load image.
+
+        Args:
+            results (dict): Result dict from :obj:``mmcv.BaseDataset``.
+
+        Returns:
+            dict: The dict contains loaded image and meta information.
+        """
+        shape = results['img_shard_shape']
+        img = np.frombuffer(
+            _map_shard(results['shard_path']),
+            dtype=np.uint8,
+            count=int(np.prod(shape)),
+            offset=results['img_offset']).reshape(shape)
+        if self.to_float32:
+            img = img.astype(np.float32)
+        elif self.copy:
+            img = img.copy()
+        results['img'] = img
+        results['img_shape'] = img.shape[:2]
+        results['ori_shape'] = img.shape[:2]
+        return results
+
+    def __repr__(self) -> str:
+        repr_str = self.__class__.__name__
+        repr_str += f'(to_float32={self.to_float32}, '
+        repr_str += f'copy={self.copy})'
+        return repr_str
+
+
+@TRANSFORMS.register_module()
+class LoadAnnotationsFromShard(LoadAnnotations):
+    """Load the segmentation map of a sample from the shards of
+    :obj:`ShardedSegDataset`.
+
+    Same as :obj:`LoadAnnotations`, but the map is copied out of the
+    memory-mapped shard instead of being decoded from a file.
+
+    Required Keys:
+
+    - shard_path
+    - seg_offset
+    - seg_shard_shape
+
+    Added Keys:
+
+    - seg_fields (List)
+    - gt_seg_map (np.uint8)
+
+    Args:
+        reduce_zero_label (bool, optional): Whether reduce all label value
+            by 1. Usually used for datasets where 0 is background label.
+            Defaults to None.
+    """
+
+    def __init__(self, reduce_zero_label=None) -> None:
+        super().__init__(reduce_zero_label=reduce_zero_label)
+
+    def _read_seg_map(self, results: dict) -> np.ndarray:
+        """Copy the (H, W) uint8 segmentation map out of its shard."""
+        assert 'seg_offset' in results, \
+            f'No segmentation map was packed for {results["img_path"]}'
+        shape = results['seg_shard_shape']
+        # copied, so that the map is writable as with LoadAnnotations
+        return np.frombuffer(
+            _map_shard(results['shard_path']),
+            dtype=np.uint8,
+            count=int(np.prod(shape)),
+            offset=results['seg_offset']).reshape(shape).copy()
+
+    def __repr__(self) -> str:
+        repr_str = self.__class__.__name__
+        repr_str += f'(reduce_zero_label={self.reduce_zero_label})'
+        return repr_str
+
+
 @TRANSFORMS.register_module()
 class LoadBiomedicalImageFromFile(BaseTransform):
     """Load an biomedical mage from file.
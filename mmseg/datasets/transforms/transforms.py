@@ -204,6 +204,77 @@ class CLAHE(BaseTransform):
         return repr_str
 
 
+class _CropLabelCounter:
+    """Count the labels of crops of a segmentation map, ignoring
+    ``ignore_index``.
+
+    Crops are counted directly until the remaining candidates would cost
+    more than building an integral image of each label present in the map.
+    From then on every crop is counted with four lookups per label,
+    whatever its size.
+
+    Args:
+        seg_map (np.ndarray): The (H, W) segmentation map.
+        ignore_index (int): The label index to be ignored.
+    """
+
+    def __init__(self, seg_map: np.ndarray, ignore_index: int):
+        self.seg_map = seg_map
+        self.ignore_index = ignore_index
+        self.labels = None
+        self.integrals = None
+
+    def _histogram(self, seg: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """The labels of ``seg`` and their counts, ``ignore_index``
+        excluded."""
+        if seg.dtype == np.uint8:
+            cnt = cv2.calcHist([seg], [0], None, [256], [0, 256])
+            cnt = cnt.ravel().astype(np.int64)
+            labels = np.flatnonzero(cnt)
+            cnt = cnt[labels]
+        else:
+            labels, cnt = np.unique(seg, return_counts=True)
+        keep = labels != self.ignore_index
+        return labels[keep], cnt[keep]
+
+    def _build_integrals(self, labels: np.ndarray) -> None:
+        h, w = self.seg_map.shape[:2]
+        self.integrals = np.empty((len(labels), h + 1, w + 1), dtype=np.int32)
+        for i, label in enumerate(labels):
+            self.integrals[i] = cv2.integral(
+                (self.seg_map == label).view(np.uint8), sdepth=cv2.CV_32S)
+
+    def __call__(self, crop_bbox: tuple, num_left: int = 0) -> np.ndarray:
+        """Count the labels in ``crop_bbox``.
+
+        Args:
+            crop_bbox (tuple): Coordinates of the crop.
+            num_left (int): How many more crops may be counted after this
+                one. Defaults to 0.
+
+        Returns:
+            np.ndarray: The pixel count of each label, in no particular
+                order and possibly with zeros for absent labels.
+        """
+        h, w = self.seg_map.shape[:2]
+        crop_y1, crop_y2, crop_x1, crop_x2 = crop_bbox
+        crop_y2, crop_x2 = min(crop_y2, h), min(crop_x2, w)
+        crop_area = (crop_y2 - crop_y1) * (crop_x2 - crop_x1)
+        # an integral image costs about as much as counting a crop of the
+        # same area, and one is needed per label
+        if self.integrals is None and h * w <= num_left * crop_area:
+            if self.labels is None:
+                self.labels = self._histogram(self.seg_map)[0]
+            if len(self.labels) * h * w <= num_left * crop_area:
+                self._build_integrals(self.labels)
+        if self.integrals is None:
+            return self._histogram(
+                self.seg_map[crop_y1:crop_y2, crop_x1:crop_x2])[1]
+        ii = self.integrals
+        return (ii[:, crop_y2, crop_x2] - ii[:, crop_y1, crop_x2] -
+                ii[:, crop_y2, crop_x1] + ii[:, crop_y1, crop_x1])
+
+
 @TRANSFORMS.register_module()
 class RandomCrop(BaseTransform):
     """Random crop the image & seg.
@@ -279,12 +350,12 @@ class RandomCrop(BaseTransform):
         img = results['img']
         crop_bbox = generate_crop_bbox(img)
         if self.cat_max_ratio < 1.:
+            count_labels = _CropLabelCounter(results['gt_seg_map'],
+                                             self.ignore_index)
             # Repeat 10 times
-            for _ in range(10):
-                seg_temp = self.crop(results['gt_seg_map'], crop_bbox)
-                labels, cnt = np.unique(seg_temp, return_counts=True)
-                cnt = cnt[labels != self.ignore_index]
-                if len(cnt) > 1 and np.max(cnt) / np.sum(
+            for i in range(10):
+                cnt = count_labels(crop_bbox, num_left=9 - i)
+                if np.count_nonzero(cnt) > 1 and np.max(cnt) / np.sum(
                         cnt) < self.cat_max_ratio:
                     break
                 crop_bbox = generate_crop_bbox(img)
@@ -593,6 +664,9 @@ class PhotoMetricDistortion(BaseTransform):
     6. convert color from HSV to BGR
     7. random contrast (mode 1)
 
+    uint8 BGR images are distorted in a single pass with lookup tables, see
+    ``_distort_fused``, other images one step after the other.
+
     Required Keys:
 
     - img
@@ -705,6 +779,91 @@ class PhotoMetricDistortion(BaseTransform):
             img = mmcv.hsv2bgr(img)
         return img
 
+    def _get_params(self) -> dict:
+        """Draw the distortion parameters, in the order of the sequential
+        distortions, None for the ones that are not applied."""
+        params = dict(
+            brightness=None, contrast=None, saturation=None, hue=None)
+        if random.randint(2):
+            params['brightness'] = random.uniform(-self.brightness_delta,
+                                                  self.brightness_delta)
+        # mode == 1 --> do random contrast first
+        # mode == 0 --> do random contrast last
+        params['contrast_first'] = random.randint(2) == 1
+        if params['contrast_first'] and random.randint(2):
+            params['contrast'] = random.uniform(self.contrast_lower,
+                                                self.contrast_upper)
+        if random.randint(2):
+            params['saturation'] = random.uniform(self.saturation_lower,
+                                                  self.saturation_upper)
+        if random.randint(2):
+            params['hue'] = random.randint(-self.hue_delta, self.hue_delta)
+        if not params['contrast_first'] and random.randint(2):
+            params['contrast'] = random.uniform(self.contrast_lower,
+                                                self.contrast_upper)
+        return params
+
+    def _distort_sequential(self, img: np.ndarray, params: dict) -> np.ndarray:
+        """Apply the distortions one after the other, for non uint8 images."""
+        if params['brightness'] is not None:
+            img = self.convert(img, beta=params['brightness'])
+        if params['contrast_first'] and params['contrast'] is not None:
+            img = self.convert(img, alpha=params['contrast'])
+        if params['saturation'] is not None:
+            img = mmcv.bgr2hsv(img)
+            img[:, :, 1] = self.convert(
+                img[:, :, 1], alpha=params['saturation'])
+            img = mmcv.hsv2bgr(img)
+        if params['hue'] is not None:
+            img = mmcv.bgr2hsv(img)
+            img[:, :, 0] = (img[:, :, 0].astype(int) + params['hue']) % 180
+            img = mmcv.hsv2bgr(img)
+        if not params['contrast_first'] and params['contrast'] is not None:
+            img = self.convert(img, alpha=params['contrast'])
+        return img
+
+    def _distort_fused(self, img: np.ndarray, params: dict) -> np.ndarray:
+        """Apply the distortions to a uint8 image with lookup tables.
+
+        ``convert`` maps every uint8 value independently, so the brightness
+        and contrast changes before and after the HSV changes compose into
+        one 256-entry table each, and the saturation and hue changes into a
+        table per HSV channel. The image goes through at most one BGR-HSV
+        round trip and is never converted to float.
+        """
+        identity = np.arange(256, dtype=np.uint8)
+        pre_lut = identity
+        if params['brightness'] is not None:
+            pre_lut = self.convert(pre_lut, beta=params['brightness'])
+        if params['contrast_first'] and params['contrast'] is not None:
+            pre_lut = self.convert(pre_lut, alpha=params['contrast'])
+        post_lut = identity
+        if not params['contrast_first'] and params['contrast'] is not None:
+            post_lut = self.convert(post_lut, alpha=params['contrast'])
+
+        if params['saturation'] is None and params['hue'] is None:
+            lut = post_lut[pre_lut]
+            if lut is identity or np.array_equal(lut, identity):
+                return img
+            return cv2.LUT(img, lut)
+
+        if pre_lut is not identity:
+            img = cv2.LUT(img, pre_lut)
+        hsv = mmcv.bgr2hsv(img)
+        hue_lut, sat_lut = identity, identity
+        if params['hue'] is not None:
+            # hue values are in [0, 180)
+            hue_lut = ((identity.astype(int) + params['hue']) %
+                       180).astype(np.uint8)
+        if params['saturation'] is not None:
+            sat_lut = self.convert(identity, alpha=params['saturation'])
+        hsv_lut = np.stack([hue_lut, sat_lut, identity], axis=-1)
+        hsv = cv2.LUT(hsv, hsv_lut.reshape(256, 1, 3))
+        img = mmcv.hsv2bgr(hsv)
+        if post_lut is not identity:
+            img = cv2.LUT(img, post_lut)
+        return img
+
     def transform(self, results: dict) -> dict:
         """Transform function to perform photometric distortion on images.
 
@@ -716,25 +875,11 @@ class PhotoMetricDistortion(BaseTransform):
         """
 
         img = results['img']
-        # random brightness
-        img = self.brightness(img)
-
-        # mode == 0 --> do random contrast first
-        # mode == 1 --> do random contrast last
-        mode = random.randint(2)
-        if mode == 1:
-            img = self.contrast(img)
-
-        # random saturation
-        img = self.saturation(img)
-
-        # random hue
-        img = self.hue(img)
-
-        # random contrast
-        if mode == 0:
-            img = self.contrast(img)
-
+        params = self._get_params()
+        if img.dtype == np.uint8 and img.ndim == 3 and img.shape[2] == 3:
+            img = self._distort_fused(img, params)
+        else:
+            img = self._distort_sequential(img, params)
         results['img'] = img
         return results
 
@@ -5,7 +5,8 @@ from typing import Dict, List, Optional, Sequence
 
 import numpy as np
 import torch
-from mmengine.dist import is_main_process
+from mmengine.dist import (all_reduce, broadcast_object_list, get_dist_info,
+                           is_main_process)
 from mmengine.evaluator import BaseMetric
 from mmengine.logging import MMLogger, print_log
 from mmengine.utils import mkdir_or_exist
@@ -13,6 +14,7 @@ from PIL import Image
 from prettytable import PrettyTable
 
 from mmseg.registry import METRICS
+from mmseg.utils import AsyncPNGWriter
 
 
 @METRICS.register_module()
@@ -41,6 +43,22 @@ class IoUMetric(BaseMetric):
             names to disambiguate homonymous metrics of different evaluators.
             If prefix is not provided in the argument, self.default_prefix
             will be used instead. Defaults to None.
+        streaming (bool): Accumulate a single ``num_classes x num_classes``
+            confusion matrix on the device of the predictions instead of
+            storing per-image histograms. The ranks are then merged with one
+            all-reduce, and :meth:`snapshot` gives the metrics of the images
+            processed so far. As in the default mode, the samples padded by
+            the distributed sampler are not counted: the confusion matrix of
+            the last sample of every rank is held back until ``evaluate``
+            knows the share of the dataset of the rank. Defaults to False.
+        output_writer (dict, optional): Save the predictions of
+            ``output_dir`` in background threads with an
+            :class:`AsyncPNGWriter` built from this config, e.g.
+            ``dict(num_workers=2, max_queue=32, compress_level=1)``.
+            ``palette=True`` uses the palette of the dataset. The files are
+            complete, and the writer threads stopped, once ``evaluate``
+            returns. Defaults to None, which
+            saves them synchronously in ``process``.
     """
 
     def __init__(self,
@@ -52,6 +70,8 @@ class IoUMetric(BaseMetric):
                  output_dir: Optional[str] = None,
                  format_only: bool = False,
                  prefix: Optional[str] = None,
+                 streaming: bool = False,
+                 output_writer: Optional[dict] = None,
                  **kwargs) -> None:
         super().__init__(collect_device=collect_device, prefix=prefix)
 
@@ -63,6 +83,12 @@ class IoUMetric(BaseMetric):
         if self.output_dir and is_main_process():
             mkdir_or_exist(self.output_dir)
         self.format_only = format_only
+        self.streaming = streaming
+        self._confusion: Optional[torch.Tensor] = None
+        self._last_confusion: Optional[torch.Tensor] = None
+        self._num_processed = 0
+        self.output_writer = output_writer
+        self._writer: Optional[AsyncPNGWriter] = None
 
     def process(self, data_batch: dict, data_samples: Sequence[dict]) -> None:
         """Process one batch of data and data_samples.
@@ -81,9 +107,20 @@ class IoUMetric(BaseMetric):
             if not self.format_only:
                 label = data_sample['gt_sem_seg']['data'].squeeze().to(
                     pred_label)
-                self.results.append(
-                    self.intersect_and_union(pred_label, label, num_classes,
-                                             self.ignore_index))
+                if self.streaming:
+                    confusion = self.confusion_matrix(pred_label, label,
+                                                      num_classes,
+                                                      self.ignore_index)
+                    # the last sample of a rank may be a padded duplicate,
+                    # see `_rank_confusion`
+                    self._merge_last_confusion()
+                    self._last_confusion = confusion
+                    self._num_processed += 1
+                else:
+                    self.results.append(
+                        self.intersect_and_union(pred_label, label,
+                                                 num_classes,
+                                                 self.ignore_index))
             # format_result
             if self.output_dir is not None:
                 basename = osp.splitext(osp.basename(
@@ -96,14 +133,138 @@ class IoUMetric(BaseMetric):
                 # That is because we set reduce_zero_label=True.
                 if data_sample.get('reduce_zero_label', False):
                     output_mask = output_mask + 1
-                output = Image.fromarray(output_mask.astype(np.uint8))
-                output.save(png_filename)
+                if self.output_writer is not None:
+                    self._get_writer().write(
+                        output_mask.astype(np.uint8), png_filename)
+                else:
+                    output = Image.fromarray(output_mask.astype(np.uint8))
+                    output.save(png_filename)
+
+    def _merge_last_confusion(self) -> None:
+        """Add the held back confusion matrix of the last sample to the
+        confusion matrix of the rank."""
+        if self._last_confusion is None:
+            return
+        if self._confusion is None:
+            self._confusion = self._last_confusion
+        else:
+            self._confusion += self._last_confusion
+        self._last_confusion = None
+
+    def _rank_confusion(self, size: int) -> Optional[torch.Tensor]:
+        """The confusion matrix of the samples of this rank, without the
+        sample the distributed sampler padded the dataset with.
+
+        The sampler gives rank ``r`` the indices ``r, r + world_size, ...``
+        and pads the dataset to a multiple of ``world_size`` by repeating
+        samples at the end, so a rank processes at most one sample past its
+        share of the ``size`` samples, and that sample is its last one.
+        """
+        rank, world_size = get_dist_info()
+        if self._num_processed > len(range(rank, size, world_size)):
+            self._last_confusion = None
+        self._merge_last_confusion()
+        confusion = self._confusion
+        self._confusion = None
+        self._num_processed = 0
+        return confusion
+
+    def _get_writer(self) -> AsyncPNGWriter:
+        """Build the writer of the predictions on first use, once the
+        dataset palette is known."""
+        if self._writer is None:
+            cfg = dict(self.output_writer)
+            if cfg.get('palette') is True:
+                cfg['palette'] = self.dataset_meta['palette']
+            self._writer = AsyncPNGWriter(**cfg)
+        return self._writer
+
+    def flush_outputs(self) -> None:
+        """Wait for the predictions of ``output_dir`` to be written, close the
+        writer and log the write throughput.
+
+        The next prediction starts a new writer, so that no thread outlives
+        an evaluation.
+        """
+        if self._writer is None:
+            return
+        writer, self._writer = self._writer, None
+        stats = writer.close()
+        num_files = stats['num_files']
+        if num_files:
+            mib = stats['num_bytes'] / 2**20
+            seconds = max(stats['seconds'], 1e-6)
+            print_log(
+                f'wrote {num_files} prediction files ({mib:.1f} MiB) in '
+                f'{seconds:.1f}s, {num_files / seconds:.1f} files/s, '
+                f'{mib / seconds:.1f} MiB/s',
+                logger='current')
+
+    def evaluate(self, size: int) -> dict:
+        """Evaluate the model performance of the whole dataset after
+        processing all batches.
+
+        The predictions of ``output_dir`` are written, and the writer
+        closed, on every rank first.
+        In streaming mode the confusion matrices of the ranks are summed with
+        one all-reduce instead of gathering the per-image results, the
+        samples padded by the distributed sampler are left out as in the
+        default mode.
+
+        Args:
+            size (int): Length of the entire validation dataset.
+
+        Returns:
+            dict: Evaluation metrics dict on the val dataset.
+        """
+        self.flush_outputs()
+        if not self.streaming or self.format_only:
+            return super().evaluate(size)
+        confusion = self._rank_confusion(size)
+        if confusion is None:
+            num_classes = len(self.dataset_meta['classes'])
+            confusion = torch.zeros((num_classes, num_classes),
+                                    dtype=torch.int64)
+        all_reduce(confusion)
+
+        if is_main_process():
+            _metrics = self.compute_metrics([confusion.cpu()])
+            if self.prefix:
+                _metrics = {
+                    '/'.join((self.prefix, k)): v
+                    for k, v in _metrics.items()
+                }
+            metrics = [_metrics]
+        else:
+            metrics = [None]
+        broadcast_object_list(metrics)
+        return metrics[0]
+
+    def snapshot(self) -> Dict[str, float]:
+        """Get the summary metrics of the images processed so far.
+
+        Only available in streaming mode. The metrics are those of the
+        current rank, no communication happens.
+
+        Returns:
+            Dict[str, float]: The summary metrics, as in
+                :meth:`compute_metrics`, empty before the first image.
+        """
+        assert self.streaming, 'snapshot is only available in streaming mode'
+        confusion = self._confusion
+        if self._last_confusion is not None:
+            confusion = self._last_confusion if confusion is None else \
+                confusion + self._last_confusion
+        if confusion is None:
+            return dict()
+        return self._summarize(*self.confusion_to_areas(confusion.cpu()))[0]
 
     def compute_metrics(self, results: list) -> Dict[str, float]:
         """Compute the metrics from processed results.
 
         Args:
-            results (list): The processed results of each batch.
+            results (list): The processed results of each batch, or the
+                confusion matrices to sum in streaming mode.
 
         Returns:
             Dict[str, float]: The computed metrics. The keys are the names of
@@ -112,37 +273,23 @@ class IoUMetric(BaseMetric):
                 mRecall.
         """
         logger: MMLogger = MMLogger.get_current_instance()
+        self.flush_outputs()
         if self.format_only:
             logger.info(f'results are saved to {osp.dirname(self.output_dir)}')
             return OrderedDict()
-        # convert list of tuples to tuple of lists, e.g.
-        # [(A_1, B_1, C_1, D_1), ...,  (A_n, B_n, C_n, D_n)] to
-        # ([A_1, ..., A_n], ..., [D_1, ..., D_n])
-        results = tuple(zip(*results))
-        assert len(results) == 4
-
-        total_area_intersect = sum(results[0])
-        total_area_union = sum(results[1])
-        total_area_pred_label = sum(results[2])
-        total_area_label = sum(results[3])
-        ret_metrics = self.total_area_to_metrics(
-            total_area_intersect, total_area_union, total_area_pred_label,
-            total_area_label, self.metrics, self.nan_to_num, self.beta)
+        if self.streaming:
+            areas = self.confusion_to_areas(sum(results))
+        else:
+            # convert list of tuples to tuple of lists, e.g.
+            # [(A_1, B_1, C_1, D_1), ...,  (A_n, B_n, C_n, D_n)] to
+            # ([A_1, ..., A_n], ..., [D_1, ..., D_n])
+            results = tuple(zip(*results))
+            assert len(results) == 4
+            areas = [sum(result) for result in results]
 
+        metrics, ret_metrics = self._summarize(*areas)
         class_names = self.dataset_meta['classes']
 
-        # summary table
-        ret_metrics_summary = OrderedDict({
-            ret_metric: np.round(np.nanmean(ret_metric_value) * 100, 2)
-            for ret_metric, ret_metric_value in ret_metrics.items()
-        })
-        metrics = dict()
-        for key, val in ret_metrics_summary.items():
-            if key == 'aAcc':
-                metrics[key] = val
-            else:
-                metrics['m' + key] = val
-
         # each class table
         ret_metrics.pop('aAcc', None)
         ret_metrics_class = OrderedDict({
@@ -160,6 +307,75 @@ class IoUMetric(BaseMetric):
 
         return metrics
 
+    def _summarize(self, total_area_intersect: torch.Tensor,
+                   total_area_union: torch.Tensor,
+                   total_area_pred_label: torch.Tensor,
+                   total_area_label: torch.Tensor) -> tuple:
+        """Get the summary metrics and the per class metrics of the total
+        areas."""
+        ret_metrics = self.total_area_to_metrics(
+            total_area_intersect, total_area_union, total_area_pred_label,
+            total_area_label, self.metrics, self.nan_to_num, self.beta)
+
+        # summary table
+        ret_metrics_summary = OrderedDict({
+            ret_metric: np.round(np.nanmean(ret_metric_value) * 100, 2)
+            for ret_metric, ret_metric_value in ret_metrics.items()
+        })
+        metrics = dict()
+        for key, val in ret_metrics_summary.items():
+            if key == 'aAcc':
+                metrics[key] = val
+            else:
+                metrics['m' + key] = val
+        return metrics, ret_metrics
+
+    @staticmethod
+    def confusion_matrix(pred_label: torch.Tensor, label: torch.Tensor,
+                         num_classes: int,
+                         ignore_index: int) -> torch.Tensor:
+        """Calculate the confusion matrix with a single ``bincount``.
+
+        Args:
+            pred_label (torch.Tensor): Prediction segmentation map. The shape
+                is (H, W).
+            label (torch.Tensor): Ground truth segmentation map. The shape is
+                (H, W).
+            num_classes (int): Number of categories.
+            ignore_index (int): Index that will be ignored in evaluation.
+
+        Returns:
+            torch.Tensor: The (num_classes, num_classes) int64 matrix, on the
+                device of the inputs, whose rows are the ground truth classes
+                and columns the predicted classes.
+        """
+        mask = (label != ignore_index) & (label >= 0) & (
+            label < num_classes) & (pred_label >= 0) & (
+                pred_label < num_classes)
+        index = label[mask].long() * num_classes + pred_label[mask].long()
+        return torch.bincount(
+            index, minlength=num_classes**2).view(num_classes, num_classes)
+
+    @staticmethod
+    def confusion_to_areas(confusion: torch.Tensor) -> tuple:
+        """Get the areas of :meth:`intersect_and_union` from a confusion
+        matrix.
+
+        Args:
+            confusion (torch.Tensor): The (num_classes, num_classes) confusion
+                matrix, rows being the ground truth classes.
+
+        Returns:
+            tuple[torch.Tensor]: The intersection, union, prediction and
+                ground truth histograms on all classes, as float64.
+        """
+        confusion = confusion.double()
+        area_intersect = confusion.diagonal()
+        area_pred_label = confusion.sum(dim=0)
+        area_label = confusion.sum(dim=1)
+        area_union = area_pred_label + area_label - area_intersect
+        return area_intersect, area_union, area_pred_label, area_label
+
     @staticmethod
     def intersect_and_union(pred_label: torch.tensor, label: torch.tensor,
                             num_classes: int, ignore_index: int):
@@ -1,6 +1,8 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 from .assigners import *  # noqa: F401,F403
 from .backbones import *  # noqa: F401,F403
+from .batch_augments import (BatchPhotoMetricDistortion, BatchRandomCrop,
+                             BatchRandomFlip, BatchRandomResize)
 from .builder import (BACKBONES, HEADS, LOSSES, SEGMENTORS, build_backbone,
                       build_head, build_loss, build_segmentor)
 from .data_preprocessor import SegDataPreProcessor
@@ -12,5 +14,7 @@ from .text_encoder import *  # noqa: F401,F403
 
 __all__ = [
     'BACKBONES', 'HEADS', 'LOSSES', 'SEGMENTORS', 'build_backbone',
-    'build_head', 'build_loss', 'build_segmentor', 'SegDataPreProcessor'
+    'build_head', 'build_loss', 'build_segmentor', 'SegDataPreProcessor',
+    'BatchRandomFlip', 'BatchRandomResize', 'BatchRandomCrop',
+    'BatchPhotoMetricDistortion'
 ]
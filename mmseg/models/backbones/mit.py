@@ -4,6 +4,7 @@ import warnings
 
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.utils.checkpoint as cp
 from mmcv.cnn import Conv2d, build_activation_layer, build_norm_layer
 from mmcv.cnn.bricks.drop import build_dropout
@@ -112,6 +113,11 @@ class EfficientMultiheadAttention(MultiheadAttention):
             Default: dict(type='LN').
         sr_ratio (int): The ratio of spatial reduction of Efficient Multi-head
             Attention of Segformer. Default: 1.
+        attn_backend (str): 'mha' runs ``nn.MultiheadAttention``, 'sdpa'
+            runs ``F.scaled_dot_product_attention`` on batch first tensors
+            with the same parameters, which avoids materializing the
+            attention matrix when a fused kernel is available.
+            Default: 'mha'.
     """
 
     def __init__(self,
@@ -124,7 +130,8 @@ class EfficientMultiheadAttention(MultiheadAttention):
                  batch_first=True,
                  qkv_bias=False,
                  norm_cfg=dict(type='LN'),
-                 sr_ratio=1):
+                 sr_ratio=1,
+                 attn_backend='mha'):
         super().__init__(
             embed_dims,
             num_heads,
@@ -145,6 +152,15 @@ class EfficientMultiheadAttention(MultiheadAttention):
             # The ret[0] of build_norm_layer is norm name.
             self.norm = build_norm_layer(norm_cfg, embed_dims)[1]
 
+        assert attn_backend in ('mha', 'sdpa'), \
+            f'attn_backend must be "mha" or "sdpa", got {attn_backend}'
+        if attn_backend == 'sdpa' and not hasattr(
+                F, 'scaled_dot_product_attention'):
+            warnings.warn('scaled_dot_product_attention requires '
+                          'torch>=2.0, fall back to nn.MultiheadAttention')
+            attn_backend = 'mha'
+        self.attn_backend = attn_backend
+
         # handle the BC-breaking from https://github.com/open-mmlab/mmcv/pull/1418 # noqa
         from mmseg import digit_version, mmcv_version
         if mmcv_version < digit_version('1.3.17'):
@@ -168,6 +184,15 @@ class EfficientMultiheadAttention(MultiheadAttention):
         if identity is None:
             identity = x_q
 
+        if self.attn_backend == 'sdpa':
+            if not self.batch_first:
+                x_q = x_q.transpose(0, 1)
+                x_kv = x_kv.transpose(0, 1)
+            out = self._sdpa_forward(x_q, x_kv)
+            if not self.batch_first:
+                out = out.transpose(0, 1)
+            return identity + self.dropout_layer(self.proj_drop(out))
+
         # Because the dataflow('key', 'query', 'value') of
         # ``torch.nn.MultiheadAttention`` is (num_query, batch,
         # embed_dims), We should adjust the shape of dataflow from
@@ -178,13 +203,51 @@ class EfficientMultiheadAttention(MultiheadAttention):
             x_q = x_q.transpose(0, 1)
             x_kv = x_kv.transpose(0, 1)
 
-        out = self.attn(query=x_q, key=x_kv, value=x_kv)[0]
+        value = x_kv
+        in_onnx_export = torch.onnx.is_in_onnx_export()
+        if in_onnx_export:
+            # ``nn.MultiheadAttention`` exports the projection of a shared
+            # key/value tensor with the traced sequence length, a distinct
+            # value tensor keeps the ONNX graph valid for any input size
+            value = x_kv.clone()
+        # the attention weights are not used, computing their mean over the
+        # heads is a full pass over the attention matrix. Without them the
+        # attention runs on scaled_dot_product_attention, which older ONNX
+        # opsets can not export.
+        out = self.attn(
+            query=x_q, key=x_kv, value=value,
+            need_weights=in_onnx_export)[0]
 
         if self.batch_first:
             out = out.transpose(0, 1)
 
         return identity + self.dropout_layer(self.proj_drop(out))
 
+    def _sdpa_forward(self, x_q, x_kv):
+        """Attention of batch first ``x_q`` (B, Nq, C) over ``x_kv`` (B, Nkv,
+        C) with the parameters of ``self.attn``, so that checkpoints of both
+        backends are interchangeable."""
+        attn = self.attn
+        B, Nq, C = x_q.shape
+        head_dims = C // self.num_heads
+        w_q, w_kv = attn.in_proj_weight.split([C, 2 * C])
+        b_q, b_kv = (None, None) if attn.in_proj_bias is None else \
+            attn.in_proj_bias.split([C, 2 * C])
+        # (B, N, C) -> (B, num_heads, N, head_dims)
+        q = F.linear(x_q, w_q, b_q).unflatten(-1, (self.num_heads, head_dims))
+        k, v = F.linear(x_kv, w_kv, b_kv).unflatten(
+            -1, (2, self.num_heads, head_dims)).permute(2, 0, 3, 1, 4)
+        q = q.transpose(1, 2)
+        dropout_p = attn.dropout if self.training else 0.
+        if torch.onnx.is_in_onnx_export():
+            # spelled out, older opsets have no attention operator
+            weights = (q * head_dims**-0.5) @ k.transpose(-2, -1)
+            out = weights.softmax(dim=-1) @ v
+        else:
+            out = F.scaled_dot_product_attention(q, k, v, dropout_p=dropout_p)
+        out = out.transpose(1, 2).flatten(2)
+        return attn.out_proj(out)
+
     def legacy_forward(self, x, hw_shape, identity=None):
         """multi head attention forward in mmcv version < 1.3.17."""
 
@@ -238,6 +301,8 @@ class TransformerEncoderLayer(BaseModule):
             Attention of Segformer. Default: 1.
         with_cp (bool): Use checkpoint or not. Using checkpoint will save
             some memory while slowing down the training speed. Default: False.
+        attn_backend (str): The attention implementation, 'mha' or 'sdpa',
+            see :class:`EfficientMultiheadAttention`. Default: 'mha'.
     """
 
     def __init__(self,
@@ -252,7 +317,8 @@ class TransformerEncoderLayer(BaseModule):
                  norm_cfg=dict(type='LN'),
                  batch_first=True,
                  sr_ratio=1,
-                 with_cp=False):
+                 with_cp=False,
+                 attn_backend='mha'):
         super().__init__()
 
         # The ret[0] of build_norm_layer is norm name.
@@ -267,7 +333,8 @@ class TransformerEncoderLayer(BaseModule):
             batch_first=batch_first,
             qkv_bias=qkv_bias,
             norm_cfg=norm_cfg,
-            sr_ratio=sr_ratio)
+            sr_ratio=sr_ratio,
+            attn_backend=attn_backend)
 
         # The ret[0] of build_norm_layer is norm name.
         self.norm2 = build_norm_layer(norm_cfg, embed_dims)[1]
@@ -335,6 +402,9 @@ class MixVisionTransformer(BaseModule):
             Default: None.
         with_cp (bool): Use checkpoint or not. Using checkpoint will save
             some memory while slowing down the training speed. Default: False.
+        attn_backend (str): The attention implementation, 'mha' or 'sdpa',
+            see :class:`EfficientMultiheadAttention`. It does not change the
+            parameters, checkpoints load with either. Default: 'mha'.
     """
 
     def __init__(self,
@@ -356,7 +426,8 @@ class MixVisionTransformer(BaseModule):
                  norm_cfg=dict(type='LN', eps=1e-6),
                  pretrained=None,
                  init_cfg=None,
-                 with_cp=False):
+                 with_cp=False,
+                 attn_backend='mha'):
         super().__init__(init_cfg=init_cfg)
 
         assert not (init_cfg and pretrained), \
@@ -411,7 +482,8 @@ class MixVisionTransformer(BaseModule):
                     act_cfg=act_cfg,
                     norm_cfg=norm_cfg,
                     with_cp=with_cp,
-                    sr_ratio=sr_ratios[i]) for idx in range(num_layer)
+                    sr_ratio=sr_ratios[i],
+                    attn_backend=attn_backend) for idx in range(num_layer)
             ])
             in_channels = embed_dims_i
             # The ret[0] of build_norm_layer is norm name.
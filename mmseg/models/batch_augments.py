@@ -0,0 +1,270 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from typing import Sequence, Tuple, Union
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from mmengine.structures import PixelData
+from torch import Tensor
+
+from mmseg.registry import MODELS
+from mmseg.utils import SampleList
+
+# per-pixel fields of a data sample moved along with the image
+_PIXEL_FIELDS = ('gt_sem_seg', 'gt_edge_map', 'gt_depth_map')
+
+
+def _pixel_fields(data_sample) -> list:
+    return [key for key in _PIXEL_FIELDS if key in data_sample]
+
+
+def _apply_to_fields(data_sample, fn) -> None:
+    """Replace every per-pixel field of ``data_sample`` by ``fn(data)``."""
+    for key in _pixel_fields(data_sample):
+        data = fn(data_sample.get(key).data)
+        data_sample.set_data({key: PixelData(data=data)})
+
+
+@MODELS.register_module()
+class BatchRandomFlip(nn.Module):
+    """Flip each image of a batch, and its maps, with probability ``prob``.
+
+    Args:
+        prob (float): The flipping probability. Defaults to 0.5.
+        direction (str): 'horizontal' or 'vertical'.
+            Defaults to 'horizontal'.
+    """
+
+    def __init__(self, prob: float = 0.5, direction: str = 'horizontal'):
+        super().__init__()
+        assert 0 <= prob <= 1
+        assert direction in ['horizontal', 'vertical']
+        self.prob = prob
+        self.direction = direction
+
+    def forward(self, inputs: Tensor,
+                data_samples: SampleList) -> Tuple[Tensor, SampleList]:
+        flip = (torch.rand(inputs.shape[0]) < self.prob).tolist()
+        if not any(flip):
+            return inputs, data_samples
+        dim = -1 if self.direction == 'horizontal' else -2
+        flip_ids = [i for i, f in enumerate(flip) if f]
+        inputs = inputs.clone()
+        inputs[flip_ids] = inputs[flip_ids].flip(dim)
+        for i in flip_ids:
+            data_sample = data_samples[i]
+            _apply_to_fields(data_sample, lambda data: data.flip(dim))
+            data_sample.set_metainfo(
+                dict(flip=True, flip_direction=self.direction))
+        return inputs, data_samples
+
+
+@MODELS.register_module()
+class BatchRandomResize(nn.Module):
+    """Resize a batch, and its maps, by a random factor.
+
+    The whole batch is resized by the same factor so that it stays a single
+    tensor. Follow it with :class:`BatchRandomCrop` to train on fixed-size
+    crops of every image.
+
+    Args:
+        ratio_range (tuple[float]): The range of the resize factor.
+            Defaults to (0.5, 2.0).
+    """
+
+    def __init__(self, ratio_range: Tuple[float, float] = (0.5, 2.0)):
+        super().__init__()
+        assert ratio_range[0] <= ratio_range[1]
+        self.ratio_range = ratio_range
+
+    def forward(self, inputs: Tensor,
+                data_samples: SampleList) -> Tuple[Tensor, SampleList]:
+        ratio = torch.empty(1).uniform_(*self.ratio_range).item()
+        h, w = inputs.shape[-2:]
+        size = (max(1, int(h * ratio + 0.5)), max(1, int(w * ratio + 0.5)))
+        if size == (h, w):
+            return inputs, data_samples
+        inputs = F.interpolate(
+            inputs, size=size, mode='bilinear', align_corners=False)
+        for data_sample in data_samples:
+            _apply_to_fields(
+                data_sample, lambda data: F.interpolate(
+                    data[None].float(), size=size, mode='nearest')[0].to(
+                        data.dtype))
+            data_sample.set_metainfo(dict(img_shape=size, pad_shape=size))
+        return inputs, data_samples
+
+
+@MODELS.register_module()
+class BatchRandomCrop(nn.Module):
+    """Crop each image of a batch, and its maps, at a random location.
+
+    Images smaller than ``crop_size`` are padded on the bottom and right.
+
+    Args:
+        crop_size (int | tuple[int]): The (h, w) size of the crops.
+        pad_val (float): Padding value of the images. Defaults to 0.
+        seg_pad_val (int): Padding value of the maps. Defaults to 255.
+    """
+
+    def __init__(self,
+                 crop_size: Union[int, Tuple[int, int]],
+                 pad_val: float = 0,
+                 seg_pad_val: int = 255):
+        super().__init__()
+        if isinstance(crop_size, int):
+            crop_size = (crop_size, crop_size)
+        assert crop_size[0] > 0 and crop_size[1] > 0
+        self.crop_size = tuple(crop_size)
+        self.pad_val = pad_val
+        self.seg_pad_val = seg_pad_val
+
+    def forward(self, inputs: Tensor,
+                data_samples: SampleList) -> Tuple[Tensor, SampleList]:
+        crop_h, crop_w = self.crop_size
+        h, w = inputs.shape[-2:]
+        if h < crop_h or w < crop_w:
+            pad = (0, max(crop_w - w, 0), 0, max(crop_h - h, 0))
+            inputs = F.pad(inputs, pad, value=self.pad_val)
+            for data_sample in data_samples:
+                _apply_to_fields(
+                    data_sample,
+                    lambda data: F.pad(data, pad, value=self.seg_pad_val))
+            h, w = inputs.shape[-2:]
+        offsets_h = torch.randint(0, h - crop_h + 1, (inputs.shape[0], ))
+        offsets_w = torch.randint(0, w - crop_w + 1, (inputs.shape[0], ))
+        crops = []
+        for i, data_sample in enumerate(data_samples):
+            y1, x1 = int(offsets_h[i]), int(offsets_w[i])
+            crops.append(inputs[i, :, y1:y1 + crop_h, x1:x1 + crop_w])
+            _apply_to_fields(
+                data_sample,
+                lambda data: data[:, y1:y1 + crop_h, x1:x1 + crop_w])
+            data_sample.set_metainfo(
+                dict(img_shape=self.crop_size, pad_shape=self.crop_size))
+        return torch.stack(crops), data_samples
+
+
+def rgb_to_hsv(img: Tensor) -> Tensor:
+    """Convert (N, 3, H, W) RGB images in [0, 1] to HSV, all in [0, 1]."""
+    r, g, b = img.unbind(1)
+    maxc, _ = img.max(dim=1)
+    minc, _ = img.min(dim=1)
+    delta = maxc - minc
+    gray = delta == 0
+    s = delta / torch.where(maxc == 0, torch.ones_like(maxc), maxc)
+    delta = torch.where(gray, torch.ones_like(delta), delta)
+    rc = (maxc - r) / delta
+    gc = (maxc - g) / delta
+    bc = (maxc - b) / delta
+    h = torch.where(
+        maxc == r, bc - gc,
+        torch.where(maxc == g, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = torch.where(gray, torch.zeros_like(h), h)
+    h = (h / 6.0) % 1.0
+    return torch.stack((h, s, maxc), dim=1)
+
+
+def hsv_to_rgb(img: Tensor) -> Tensor:
+    """Convert (N, 3, H, W) HSV images in [0, 1] back to RGB."""
+    h, s, v = img.unbind(1)
+    h6 = h * 6.0
+    sector = torch.floor(h6)
+    f = h6 - sector
+    sector = sector.long() % 6
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    index = sector[:, None]
+    r = torch.stack((v, q, p, p, t, v), dim=1).gather(1, index)
+    g = torch.stack((t, v, v, q, p, p), dim=1).gather(1, index)
+    b = torch.stack((p, p, t, v, v, q), dim=1).gather(1, index)
+    return torch.cat((r, g, b), dim=1)
+
+
+@MODELS.register_module()
+class BatchPhotoMetricDistortion(nn.Module):
+    """Apply :class:`PhotoMetricDistortion` to a whole batch in torch.
+
+    Every image draws its own parameters, with the same distributions as
+    the per-sample transform: each of the brightness, contrast, saturation
+    and hue changes is applied with probability 0.5, and the contrast
+    change happens either first or last. The images are expected in the
+    [0, 255] range, before normalization.
+
+    Args:
+        brightness_delta (int): delta of brightness. Defaults to 32.
+        contrast_range (Sequence[float]): range of contrast.
+            Defaults to (0.5, 1.5).
+        saturation_range (Sequence[float]): range of saturation.
+            Defaults to (0.5, 1.5).
+        hue_delta (int): delta of hue, in degrees halved as in OpenCV.
+            Defaults to 18.
+        channel_order (str): The channel order of the batch, 'rgb' or 'bgr'.
+            Defaults to 'rgb'.
+    """
+
+    def __init__(self,
+                 brightness_delta: int = 32,
+                 contrast_range: Sequence[float] = (0.5, 1.5),
+                 saturation_range: Sequence[float] = (0.5, 1.5),
+                 hue_delta: int = 18,
+                 channel_order: str = 'rgb'):
+        super().__init__()
+        assert channel_order in ['rgb', 'bgr']
+        self.brightness_delta = brightness_delta
+        self.contrast_lower, self.contrast_upper = contrast_range
+        self.saturation_lower, self.saturation_upper = saturation_range
+        self.hue_delta = hue_delta
+        self.channel_order = channel_order
+
+    def _rand(self, n: int, low: float, high: float,
+              inputs: Tensor) -> Tensor:
+        """``n`` uniform values in [low, high), shaped to broadcast over
+        the images of the batch."""
+        values = torch.empty(n).uniform_(low, high)
+        return values.to(inputs).view(n, 1, 1, 1)
+
+    def forward(self, inputs: Tensor,
+                data_samples: SampleList) -> Tuple[Tensor, SampleList]:
+        n = inputs.shape[0]
+        # the same draws as PhotoMetricDistortion, one per image
+        brightness = torch.rand(n) < 0.5
+        contrast_first = torch.rand(n) < 0.5
+        contrast = torch.rand(n) < 0.5
+        saturation = torch.rand(n) < 0.5
+        hue = torch.rand(n) < 0.5
+
+        def where(apply, values, default):
+            return torch.where(
+                apply.to(inputs.device).view(n, 1, 1, 1), values,
+                torch.full_like(values, default))
+
+        img = inputs.float()
+        if brightness.any():
+            delta = self._rand(n, -self.brightness_delta,
+                               self.brightness_delta, img)
+            img = (img + where(brightness, delta, 0.)).clamp_(0, 255)
+        alpha = self._rand(n, self.contrast_lower, self.contrast_upper, img)
+        if (contrast & contrast_first).any():
+            img = (img * where(contrast & contrast_first, alpha,
+                               1.)).clamp_(0, 255)
+        if (saturation | hue).any():
+            if self.channel_order == 'bgr':
+                img = img.flip(1)
+            hsv = rgb_to_hsv(img / 255.)
+            if saturation.any():
+                sat = self._rand(n, self.saturation_lower,
+                                 self.saturation_upper, img)
+                hsv[:, 1:2] = (hsv[:, 1:2] *
+                               where(saturation, sat, 1.)).clamp_(0, 1)
+            if hue.any():
+                shift = self._rand(n, -self.hue_delta, self.hue_delta, img)
+                hsv[:, :1] = (hsv[:, :1] + where(hue, shift, 0.) / 180.) % 1.
+            img = (hsv_to_rgb(hsv) * 255.).clamp_(0, 255)
+            if self.channel_order == 'bgr':
+                img = img.flip(1)
+        if (contrast & ~contrast_first).any():
+            img = (img * where(contrast & ~contrast_first, alpha,
+                               1.)).clamp_(0, 255)
+        return img, data_samples
@@ -3,6 +3,7 @@ from numbers import Number
 from typing import Any, Dict, List, Optional, Sequence
 
 import torch
+import torch.nn as nn
 from mmengine.model import BaseDataPreprocessor
 
 from mmseg.registry import MODELS
@@ -47,10 +48,18 @@ class SegDataPreProcessor(BaseDataPreprocessor):
             Defaults to False.
         rgb_to_bgr (bool): whether to convert image from RGB to RGB.
             Defaults to False.
-        batch_augments (list[dict], optional): Batch-level augmentations
+        batch_augments (list[dict], optional): Batch-level augmentations,
+            e.g. ``BatchRandomResize``, ``BatchRandomCrop``,
+            ``BatchRandomFlip`` and ``BatchPhotoMetricDistortion``, applied
+            in order during training on the device of the batch. With batch
+            augmentations, the images are stacked and padded before the
+            normalization, so ``pad_val`` is a pixel value, and the
+            augmentations see images in the [0, 255] range. Defaults to None.
         test_cfg (dict, optional): The padding size config in testing, if not
             specify, will use `size` and `size_divisor` params as default.
             Defaults to None, only supports keys `size` or `size_divisor`.
+            Test batches of images with different sizes are always padded to
+            the largest image, on top of this config.
     """
 
     def __init__(
@@ -89,8 +98,11 @@ class SegDataPreProcessor(BaseDataPreprocessor):
         else:
             self._enable_normalize = False
 
-        # TODO: support batch augmentations.
-        self.batch_augments = batch_augments
+        if batch_augments is not None:
+            self.batch_augments = nn.ModuleList(
+                [MODELS.build(aug) for aug in batch_augments])
+        else:
+            self.batch_augments = None
 
         # Support different padding methods in testing
         self.test_cfg = test_cfg
@@ -114,6 +126,29 @@ class SegDataPreProcessor(BaseDataPreprocessor):
             inputs = [_input[[2, 1, 0], ...] for _input in inputs]
 
         inputs = [_input.float() for _input in inputs]
+
+        if training and self.batch_augments is not None:
+            assert data_samples is not None, ('During training, ',
+                                              '`data_samples` must be define.')
+            # augment the stacked batch in pixel space, then normalize,
+            # without a padding config the batch is padded to its largest
+            # image
+            size_divisor = self.size_divisor
+            if self.size is None and size_divisor is None:
+                size_divisor = 1
+            inputs, data_samples = stack_batch(
+                inputs=inputs,
+                data_samples=data_samples,
+                size=self.size,
+                size_divisor=size_divisor,
+                pad_val=self.pad_val,
+                seg_pad_val=self.seg_pad_val)
+            for batch_aug in self.batch_augments:
+                inputs, data_samples = batch_aug(inputs, data_samples)
+            if self._enable_normalize:
+                inputs = (inputs - self.mean) / self.std
+            return dict(inputs=inputs, data_samples=data_samples)
+
         if self._enable_normalize:
             inputs = [(_input - self.mean) / self.std for _input in inputs]
 
@@ -127,20 +162,24 @@ class SegDataPreProcessor(BaseDataPreprocessor):
                 size_divisor=self.size_divisor,
                 pad_val=self.pad_val,
                 seg_pad_val=self.seg_pad_val)
-
-            if self.batch_augments is not None:
-                inputs, data_samples = self.batch_augments(
-                    inputs, data_samples)
         else:
             img_size = inputs[0].shape[1:]
-            assert all(input_.shape[1:] == img_size for input_ in inputs),  \
+            same_size = all(input_.shape[1:] == img_size for input_ in inputs)
+            assert same_size or data_samples is not None, \
                 'The image size in a batch should be the same.'
-            # pad images when testing
-            if self.test_cfg:
+            # pad images when testing, images of different sizes are padded
+            # to the largest one and the padding is recorded in the data
+            # samples so that it is removed by `postprocess_result`
+            if self.test_cfg or not same_size:
+                test_cfg = self.test_cfg or dict()
+                size = test_cfg.get('size', None)
+                size_divisor = test_cfg.get('size_divisor', None)
+                if size is None and size_divisor is None:
+                    size_divisor = 1
                 inputs, padded_samples = stack_batch(
                     inputs=inputs,
-                    size=self.test_cfg.get('size', None),
-                    size_divisor=self.test_cfg.get('size_divisor', None),
+                    size=size,
+                    size_divisor=size_divisor,
                     pad_val=self.pad_val,
                     seg_pad_val=self.seg_pad_val)
                 for data_sample, pad_info in zip(data_samples, padded_samples):
@@ -5,7 +5,7 @@ from mmcv.cnn import ConvModule
 
 from mmseg.models.decode_heads.decode_head import BaseDecodeHead
 from mmseg.registry import MODELS
-from ..utils import resize
+from ..utils import fuse_conv_bn, resize
 
 
 @MODELS.register_module()
@@ -15,6 +15,10 @@ class SegformerHead(BaseDecodeHead):
     This head is the implementation of
     `Segformer <https://arxiv.org/abs/2105.15203>` _.
 
+    After :meth:`fuse_for_inference`, the fusion conv is split into one
+    projection per input, applied before the upsampling, and the projected
+    maps are summed instead of concatenated.
+
     Args:
         interpolate_mode: The interpolate mode of MLP head upsample operation.
             Default: 'bilinear'.
@@ -45,7 +49,48 @@ class SegformerHead(BaseDecodeHead):
             kernel_size=1,
             norm_cfg=self.norm_cfg)
 
+        # the per-input slices of ``fusion_conv``, see `fuse_for_inference`
+        self.fusion_projs = None
+
+    def fuse_for_inference(self):
+        """Fold the BN layers into the convs and split ``fusion_conv`` into
+        per-input projections for inference.
+
+        The upsampling interpolates every channel independently with weights
+        that sum to one, so it commutes with a 1x1 conv. The slice of the
+        fusion conv that sees input ``i`` can therefore run at the resolution
+        of that input, and the four projected maps are summed at 1/4 scale
+        instead of concatenating four upsampled maps of ``channels``
+        channels. The outputs are equal up to floating point rounding.
+
+        The head is only meant for inference afterwards: the BN statistics
+        are frozen into the conv weights.
+        """
+        if self.fusion_projs is not None:
+            return
+        fuse_conv_bn(self)
+        fusion_conv = self.fusion_conv
+        if fusion_conv.with_norm and not isinstance(fusion_conv.norm,
+                                                    nn.Identity):
+            # a norm that cannot be folded, e.g. GN, needs the whole map
+            return
+        weight = fusion_conv.conv.weight.detach()
+        bias = fusion_conv.conv.bias
+        self.fusion_projs = nn.ModuleList()
+        for i in range(len(self.convs)):
+            proj = nn.Conv2d(
+                self.channels, self.channels, 1, bias=i == 0
+                and bias is not None).to(weight)
+            proj.weight.data.copy_(weight[:, i * self.channels:(i + 1) *
+                                          self.channels])
+            if proj.bias is not None:
+                proj.bias.data.copy_(bias.detach())
+            self.fusion_projs.append(proj)
+
     def forward(self, inputs):
+        if self.fusion_projs is not None:
+            return self._fused_forward(inputs)
+
         # Receive 4 stage backbone feature map: 1/4, 1/8, 1/16, 1/32
         inputs = self._transform_inputs(inputs)
         outs = []
@@ -64,3 +109,24 @@ class SegformerHead(BaseDecodeHead):
         out = self.cls_seg(out)
 
         return out
+
+    def _fused_forward(self, inputs):
+        """Forward of the head after :meth:`fuse_for_inference`."""
+        inputs = self._transform_inputs(inputs)
+        size = inputs[0].shape[2:]
+        out = None
+        for idx in range(len(inputs)):
+            x = self.fusion_projs[idx](self.convs[idx](inputs[idx]))
+            if x.shape[2:] != size:
+                x = resize(
+                    input=x,
+                    size=size,
+                    mode=self.interpolate_mode,
+                    align_corners=self.align_corners)
+            out = x if out is None else out.add_(x)
+
+        if self.fusion_conv.with_activation:
+            out = self.fusion_conv.activate(out)
+        out = self.cls_seg(out)
+
+        return out
@@ -2,6 +2,8 @@
 from abc import ABCMeta, abstractmethod
 from typing import List, Tuple
 
+import torch
+import torch.nn as nn
 from mmengine.model import BaseModel
 from mmengine.structures import PixelData
 from torch import Tensor
@@ -9,7 +11,7 @@ from torch import Tensor
 from mmseg.structures import SegDataSample
 from mmseg.utils import (ForwardResults, OptConfigType, OptMultiConfig,
                          OptSampleList, SampleList)
-from ..utils import resize
+from ..utils import fuse_conv_bn, resize, resize_argmax
 
 
 class BaseSegmentor(BaseModel, metaclass=ABCMeta):
@@ -46,6 +48,25 @@ class BaseSegmentor(BaseModel, metaclass=ABCMeta):
         """bool: whether the segmentor has decode head"""
         return hasattr(self, 'decode_head') and self.decode_head is not None
 
+    def fuse_for_inference(self) -> nn.Module:
+        """Fold the BN layers into the preceding convs and apply the
+        inference rewrites of the submodules that define their own
+        ``fuse_for_inference``, e.g. :class:`SegformerHead`.
+
+        The predictions are unchanged up to floating point rounding, but the
+        BN statistics are frozen into the conv weights, so the fused model
+        can not be trained any more. Use a model in eval mode, with
+        ``revert_sync_batchnorm`` applied if it has SyncBN layers.
+
+        Returns:
+            nn.Module: The fused model itself.
+        """
+        fuse_conv_bn(self)
+        for module in list(self.modules()):
+            if module is not self and hasattr(module, 'fuse_for_inference'):
+                module.fuse_for_inference()
+        return self
+
     @abstractmethod
     def extract_feat(self, inputs: Tensor) -> bool:
         """Placeholder for extract features from images."""
@@ -128,6 +149,26 @@ class BaseSegmentor(BaseModel, metaclass=ABCMeta):
                            seg_logits: Tensor,
                            data_samples: OptSampleList = None) -> SampleList:
         """ Convert results list to `SegDataSample`.
+
+        By default the logits are resized to the original image shape before
+        taking the argmax, and kept in the results. ``test_cfg`` accepts
+        the following keys to reduce the memory of large images:
+
+        - ``keep_seg_logits`` (bool): Whether to keep the full-resolution
+          ``seg_logits`` in the results. Defaults to True.
+        - ``argmax_tile_size`` (int, optional): If set and ``seg_logits`` are
+          not kept, the prediction is computed with :func:`resize_argmax`
+          by blocks of that many rows at the original resolution, without
+          materialising the resized logits. Defaults to None.
+        - ``uint8_pred`` (bool): Store ``pred_sem_seg`` as uint8 instead of
+          int64. Defaults to False.
+        - ``keep_low_res_probs`` (bool): Keep the softmax (or sigmoid)
+          probabilities at the network output resolution, before resizing,
+          as ``seg_probs``. Defaults to False.
+
+        Half precision logits, e.g. from a forward under autocast, are
+        post-processed and returned in fp32.
+
         Args:
             seg_logits (Tensor): The segmentation results, seg_logits from
                 model of each input image.
@@ -141,8 +182,19 @@ class BaseSegmentor(BaseModel, metaclass=ABCMeta):
             - ``pred_sem_seg``(PixelData): Prediction of semantic segmentation.
             - ``seg_logits``(PixelData): Predicted logits of semantic
                 segmentation before normalization.
+            - ``seg_probs``(PixelData): Low resolution probabilities, only
+                with ``keep_low_res_probs``.
         """
+        if seg_logits.dtype in (torch.float16, torch.bfloat16):
+            seg_logits = seg_logits.float()
         batch_size, C, H, W = seg_logits.shape
+        test_cfg = getattr(self, 'test_cfg', None) or dict()
+        keep_seg_logits = test_cfg.get('keep_seg_logits', True)
+        argmax_tile_size = test_cfg.get('argmax_tile_size', None)
+        uint8_pred = test_cfg.get('uint8_pred', False)
+        keep_low_res_probs = test_cfg.get('keep_low_res_probs', False)
+        tiled_argmax = (
+            argmax_tile_size is not None and not keep_seg_logits and C > 1)
 
         if data_samples is None:
             data_samples = [SegDataSample() for _ in range(batch_size)]
@@ -151,6 +203,8 @@ class BaseSegmentor(BaseModel, metaclass=ABCMeta):
             only_prediction = False
 
         for i in range(batch_size):
+            i_seg_pred = None
+            i_seg_probs = None
             if not only_prediction:
                 img_meta = data_samples[i].metainfo
                 # remove padding area
@@ -174,27 +228,48 @@ class BaseSegmentor(BaseModel, metaclass=ABCMeta):
                     else:
                         i_seg_logits = i_seg_logits.flip(dims=(2, ))
 
-                # resize as original shape
-                i_seg_logits = resize(
-                    i_seg_logits,
-                    size=img_meta['ori_shape'],
-                    mode='bilinear',
-                    align_corners=self.align_corners,
-                    warning=False).squeeze(0)
+                if keep_low_res_probs:
+                    i_seg_probs = self._logits_to_probs(i_seg_logits[0])
+
+                if tiled_argmax:
+                    i_seg_pred = resize_argmax(
+                        i_seg_logits[0],
+                        size=img_meta['ori_shape'],
+                        align_corners=self.align_corners,
+                        tile_size=argmax_tile_size)
+                else:
+                    # resize as original shape
+                    i_seg_logits = resize(
+                        i_seg_logits,
+                        size=img_meta['ori_shape'],
+                        mode='bilinear',
+                        align_corners=self.align_corners,
+                        warning=False).squeeze(0)
             else:
                 i_seg_logits = seg_logits[i]
+                if keep_low_res_probs:
+                    i_seg_probs = self._logits_to_probs(i_seg_logits)
 
-            if C > 1:
+            if i_seg_pred is None and C > 1:
                 i_seg_pred = i_seg_logits.argmax(dim=0, keepdim=True)
-            else:
+            elif i_seg_pred is None:
                 i_seg_logits = i_seg_logits.sigmoid()
                 i_seg_pred = (i_seg_logits >
                               self.decode_head.threshold).to(i_seg_logits)
-            data_samples[i].set_data({
-                'seg_logits':
-                PixelData(**{'data': i_seg_logits}),
-                'pred_sem_seg':
-                PixelData(**{'data': i_seg_pred})
-            })
+            if uint8_pred:
+                i_seg_pred = i_seg_pred.to(torch.uint8)
+
+            results = {'pred_sem_seg': PixelData(**{'data': i_seg_pred})}
+            if keep_seg_logits:
+                results['seg_logits'] = PixelData(**{'data': i_seg_logits})
+            if i_seg_probs is not None:
+                results['seg_probs'] = PixelData(**{'data': i_seg_probs})
+            data_samples[i].set_data(results)
 
         return data_samples
+
+    def _logits_to_probs(self, seg_logits: Tensor) -> Tensor:
+        """Normalize (C, H, W) logits into probabilities."""
+        if seg_logits.shape[0] > 1:
+            return seg_logits.softmax(dim=0)
+        return seg_logits.sigmoid()
@@ -1,9 +1,10 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import logging
+import math
 from typing import List, Optional
 
+import torch
 import torch.nn as nn
-import torch.nn.functional as F
 from mmengine.logging import print_log
 from torch import Tensor
 
@@ -238,6 +239,33 @@ class EncoderDecoder(BaseSegmentor):
         x = self.extract_feat(inputs)
         return self.decode_head.forward(x)
 
+    def _slide_weight(self, h_crop: int, w_crop: int,
+                      inputs: Tensor) -> Optional[Tensor]:
+        """Blending weight of a sliding window.
+
+        Returns None for the default uniform blending, otherwise a
+        (h_crop, w_crop) map that decays from the window centre towards its
+        borders, so that overlapping windows favour their central pixels.
+        The map is strictly positive, every pixel keeps a non-zero weight.
+        """
+        weight_type = self.test_cfg.get('slide_weight', 'uniform')
+        assert weight_type in ('uniform', 'gaussian', 'cosine'), \
+            f'Only "uniform", "gaussian" or "cosine" slide weights are ' \
+            f'supported, but got {weight_type}.'
+        if weight_type == 'uniform':
+            return None
+
+        def weight_1d(length):
+            pos = (torch.arange(length, device=inputs.device) +
+                   0.5) / length
+            if weight_type == 'gaussian':
+                # same sigma as nnU-Net: 1/8 of the window size
+                return torch.exp(-0.5 * ((pos - 0.5) / 0.125)**2)
+            return torch.sin(pos * math.pi)
+
+        weight = weight_1d(h_crop)[:, None] * weight_1d(w_crop)[None, :]
+        return weight.to(inputs.dtype)
+
     def slide_inference(self, inputs: Tensor,
                         batch_img_metas: List[dict]) -> Tensor:
         """Inference by sliding-window with overlap.
@@ -245,6 +273,14 @@ class EncoderDecoder(BaseSegmentor):
         If h_crop > h_img or w_crop > w_img, the small patch will be used to
         decode without padding.
 
+        Besides ``crop_size`` and ``stride``, ``test_cfg`` accepts:
+
+        - ``slide_batch_size`` (int): number of windows decoded together in a
+          single forward pass. Defaults to 1.
+        - ``slide_weight`` (str): how overlapping windows are blended, one of
+          ``'uniform'`` (plain average), ``'gaussian'`` or ``'cosine'``
+          (weighted towards the window centres). Defaults to ``'uniform'``.
+
         Args:
             inputs (tensor): the tensor should have a shape NxCxHxW,
                 which contains all images in the batch.
@@ -261,12 +297,12 @@ class EncoderDecoder(BaseSegmentor):
 
         h_stride, w_stride = self.test_cfg.stride
         h_crop, w_crop = self.test_cfg.crop_size
+        slide_batch_size = self.test_cfg.get('slide_batch_size', 1)
         batch_size, _, h_img, w_img = inputs.size()
         out_channels = self.out_channels
         h_grids = max(h_img - h_crop + h_stride - 1, 0) // h_stride + 1
         w_grids = max(w_img - w_crop + w_stride - 1, 0) // w_stride + 1
-        preds = inputs.new_zeros((batch_size, out_channels, h_img, w_img))
-        count_mat = inputs.new_zeros((batch_size, 1, h_img, w_img))
+        windows = []
         for h_idx in range(h_grids):
             for w_idx in range(w_grids):
                 y1 = h_idx * h_stride
@@ -275,17 +311,33 @@ class EncoderDecoder(BaseSegmentor):
                 x2 = min(x1 + w_crop, w_img)
                 y1 = max(y2 - h_crop, 0)
                 x1 = max(x2 - w_crop, 0)
-                crop_img = inputs[:, :, y1:y2, x1:x2]
-                # change the image shape to patch shape
-                batch_img_metas[0]['img_shape'] = crop_img.shape[2:]
-                # the output of encode_decode is seg logits tensor map
-                # with shape [N, C, H, W]
-                crop_seg_logit = self.encode_decode(crop_img, batch_img_metas)
-                preds += F.pad(crop_seg_logit,
-                               (int(x1), int(preds.shape[3] - x2), int(y1),
-                                int(preds.shape[2] - y2)))
-
-                count_mat[:, :, y1:y2, x1:x2] += 1
+                windows.append((y1, y2, x1, x2))
+        # all the windows have the same size, the image size at most
+        weight = self._slide_weight(
+            min(h_crop, h_img), min(w_crop, w_img), inputs)
+
+        preds = inputs.new_zeros((batch_size, out_channels, h_img, w_img))
+        count_mat = inputs.new_zeros((1, 1, h_img, w_img))
+        for i in range(0, len(windows), slide_batch_size):
+            batch_windows = windows[i:i + slide_batch_size]
+            crop_imgs = torch.cat([
+                inputs[:, :, y1:y2, x1:x2]
+                for y1, y2, x1, x2 in batch_windows
+            ])
+            # change the image shape to patch shape
+            batch_img_metas[0]['img_shape'] = crop_imgs.shape[2:]
+            # the output of encode_decode is seg logits tensor map
+            # with shape [N * num_windows, C, H, W]
+            crop_seg_logits = self.encode_decode(crop_imgs, batch_img_metas)
+            for j, (y1, y2, x1, x2) in enumerate(batch_windows):
+                crop_seg_logit = crop_seg_logits[j * batch_size:(j + 1) *
+                                                 batch_size]
+                if weight is None:
+                    preds[:, :, y1:y2, x1:x2] += crop_seg_logit
+                    count_mat[:, :, y1:y2, x1:x2] += 1
+                else:
+                    preds[:, :, y1:y2, x1:x2] += crop_seg_logit * weight
+                    count_mat[:, :, y1:y2, x1:x2] += weight
         assert (count_mat == 0).sum() == 0
         seg_logits = preds / count_mat
 
@@ -332,7 +384,12 @@ class EncoderDecoder(BaseSegmentor):
             f'Only "slide" or "whole" test mode are supported, but got ' \
             f'{self.test_cfg["mode"]}.'
         ori_shape = batch_img_metas[0]['ori_shape']
-        if not all(_['ori_shape'] == ori_shape for _ in batch_img_metas):
+        # padded batches record per-image padding that `postprocess_result`
+        # removes, so their images may have different shapes
+        padded = all('img_padding_size' in _ or 'padding_size' in _
+                     for _ in batch_img_metas)
+        if not padded and not all(_['ori_shape'] == ori_shape
+                                  for _ in batch_img_metas):
             print_log(
                 'Image shapes are different in the batch.',
                 logger='current',
@@ -1,16 +1,196 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-from typing import List
+from collections import OrderedDict
+from typing import List, Optional
 
 import torch
 from mmengine.model import BaseTTAModel
 from mmengine.structures import PixelData
+from torch import Tensor
 
 from mmseg.registry import MODELS
 from mmseg.utils import SampleList
+from ..utils import resize, resize_argmax
 
 
 @MODELS.register_module()
 class SegTTAModel(BaseTTAModel):
+    """Test time augmentation wrapper of segmentors.
+
+    ``test_step`` runs all the augmentations whose inputs share a shape
+    (e.g. the flips of a scale) in a single forward pass. The probabilities
+    of each augmentation are brought back to a working resolution and added
+    to a running sum, so only one probability map per image is alive at a
+    time, and the sum is resized to the original shape once at the end.
+
+    Args:
+        module (dict | nn.Module): The segmentor to wrap.
+        data_preprocessor (dict | nn.Module, optional): Overrides the data
+            preprocessor of ``module``. Defaults to None.
+        merge_scale (float): The working resolution of the running sum, as a
+            fraction of the original image shape. 1.0 merges at the
+            original resolution. Defaults to 1.0.
+        early_exit (dict, optional): Stop running augmentations once the
+            merged prediction is confident enough. Accepts ``min_augs``
+            (the number of augmentations to run at least, defaults to 2),
+            ``margin`` (the gap between the two highest merged
+            probabilities of a confident pixel, defaults to 0.5) and
+            ``ratio`` (the fraction of confident pixels required in every
+            image, defaults to 0.99). Augmentations are run in the order of
+            the TTA pipeline. Defaults to None.
+        argmax_tile_size (int): The number of output rows computed at once
+            by the final resize, see :func:`resize_argmax`.
+            Defaults to 512.
+    """
+
+    def __init__(self,
+                 module,
+                 data_preprocessor=None,
+                 merge_scale: float = 1.0,
+                 early_exit: Optional[dict] = None,
+                 argmax_tile_size: int = 512):
+        super().__init__(module, data_preprocessor)
+        assert merge_scale > 0, 'merge_scale must be positive'
+        self.merge_scale = merge_scale
+        self.early_exit = early_exit
+        self.argmax_tile_size = argmax_tile_size
+
+    def test_step(self, data):
+        """Get the merged predictions of all the enhanced data.
+
+        Args:
+            data (dict): Enhanced data batch sampled from dataloader, with
+                one entry per augmentation in ``inputs`` and
+                ``data_samples``.
+
+        Returns:
+            SampleList: Merged prediction.
+        """
+        if not isinstance(data, dict):
+            return super().test_step(data)
+        num_augs = len(data['inputs'])
+        data_list = [{key: value[idx]
+                      for key, value in data.items()}
+                     for idx in range(num_augs)]
+        batch_size = len(data_list[0]['data_samples'])
+
+        # group the augmentations whose inputs can be stacked without
+        # padding, keeping the order of the pipeline
+        groups = OrderedDict()
+        for idx, aug_data in enumerate(data_list):
+            key = tuple(tuple(_input.shape) for _input in aug_data['inputs'])
+            groups.setdefault(key, []).append(idx)
+
+        probs = [None] * batch_size
+        num_merged = 0
+        for aug_ids in groups.values():
+            inputs, data_samples = [], []
+            for idx in aug_ids:
+                inputs.extend(data_list[idx]['inputs'])
+                data_samples.extend(data_list[idx]['data_samples'])
+            batch = self.module.data_preprocessor(
+                dict(inputs=inputs, data_samples=data_samples), False)
+            batch_img_metas = [
+                data_sample.metainfo for data_sample in batch['data_samples']
+            ]
+            batch_inputs = batch['inputs']
+            if isinstance(batch_inputs, (list, tuple)):
+                # a preprocessor that does not stack, e.g. the default
+                # ``BaseDataPreprocessor``, the group shares a shape
+                batch_inputs = torch.stack(batch_inputs)
+            seg_logits = self.module.inference(batch_inputs, batch_img_metas)
+            for j, data_sample in enumerate(batch['data_samples']):
+                i = j % batch_size
+                i_probs = self._aug_probs(seg_logits[j:j + 1],
+                                          data_sample.metainfo)
+                if probs[i] is None:
+                    probs[i] = i_probs
+                else:
+                    probs[i] += i_probs
+            del seg_logits
+            num_merged += len(aug_ids)
+            if num_merged < num_augs and self._can_exit(probs, num_merged):
+                break
+
+        predictions = []
+        for i, data_sample in enumerate(data_list[0]['data_samples']):
+            i_probs = probs[i].div_(num_merged)
+            seg_pred = self._probs_to_pred(i_probs,
+                                           data_sample.metainfo['ori_shape'])
+            data_sample.set_data({'pred_sem_seg': PixelData(data=seg_pred)})
+            predictions.append(data_sample)
+        return predictions
+
+    def _aug_probs(self, seg_logit: Tensor, img_meta: dict) -> Tensor:
+        """Undo the padding and flip of a (1, C, H, W) logit map and return
+        its probabilities at the working resolution, as (C, H', W')."""
+        H, W = seg_logit.shape[2:]
+        if 'img_padding_size' not in img_meta:
+            padding_size = img_meta.get('padding_size', [0] * 4)
+        else:
+            padding_size = img_meta['img_padding_size']
+        padding_left, padding_right, padding_top, padding_bottom = \
+            padding_size
+        seg_logit = seg_logit[:, :, padding_top:H - padding_bottom,
+                              padding_left:W - padding_right]
+        if img_meta.get('flip', None):
+            flip_direction = img_meta.get('flip_direction', None)
+            assert flip_direction in ['horizontal', 'vertical']
+            if flip_direction == 'horizontal':
+                seg_logit = seg_logit.flip(dims=(3, ))
+            else:
+                seg_logit = seg_logit.flip(dims=(2, ))
+        seg_logit = resize(
+            seg_logit,
+            size=self._working_shape(img_meta['ori_shape']),
+            mode='bilinear',
+            align_corners=self.module.align_corners,
+            warning=False)[0].float()
+        if self.module.out_channels > 1:
+            return seg_logit.softmax(dim=0)
+        return seg_logit.sigmoid()
+
+    def _working_shape(self, ori_shape) -> tuple:
+        """The shape of the running probability sum of an image."""
+        return tuple(max(1, round(x * self.merge_scale)) for x in ori_shape)
+
+    def _can_exit(self, probs: List[Tensor], num_merged: int) -> bool:
+        """Whether the merged prediction of every image is confident enough
+        to skip the remaining augmentations."""
+        if self.early_exit is None or \
+                num_merged < self.early_exit.get('min_augs', 2):
+            return False
+        margin = self.early_exit.get('margin', 0.5)
+        ratio = self.early_exit.get('ratio', 0.99)
+        for i_probs in probs:
+            mean_probs = i_probs / num_merged
+            if mean_probs.shape[0] > 1:
+                top2 = mean_probs.topk(2, dim=0).values
+                gap = top2[0] - top2[1]
+            else:
+                gap = (2 * mean_probs[0] - 1).abs()
+            if (gap >= margin).float().mean() < ratio:
+                return False
+        return True
+
+    def _probs_to_pred(self, probs: Tensor, ori_shape) -> Tensor:
+        """Resize merged (C, H', W') probabilities to the original shape and
+        turn them into a (1, H, W) label map."""
+        if probs.shape[0] > 1:
+            if tuple(probs.shape[1:]) == tuple(ori_shape):
+                return probs.argmax(dim=0, keepdim=True)
+            return resize_argmax(
+                probs,
+                size=ori_shape,
+                align_corners=self.module.align_corners,
+                tile_size=self.argmax_tile_size)
+        if tuple(probs.shape[1:]) != tuple(ori_shape):
+            probs = resize(
+                probs[None],
+                size=ori_shape,
+                mode='bilinear',
+                align_corners=self.module.align_corners,
+                warning=False)[0]
+        return (probs > self.module.decode_head.threshold).to(probs)
 
     def merge_preds(self, data_samples_list: List[SampleList]) -> SampleList:
         """Merge predictions of enhanced data to one prediction.
@@ -24,14 +204,17 @@ class SegTTAModel(BaseTTAModel):
         """
         predictions = []
         for data_samples in data_samples_list:
-            seg_logits = data_samples[0].seg_logits.data
-            logits = torch.zeros(seg_logits.shape).to(seg_logits)
+            logits = None
             for data_sample in data_samples:
                 seg_logit = data_sample.seg_logits.data
                 if self.module.out_channels > 1:
-                    logits += seg_logit.softmax(dim=0)
+                    seg_prob = seg_logit.softmax(dim=0)
+                else:
+                    seg_prob = seg_logit.sigmoid()
+                if logits is None:
+                    logits = seg_prob
                 else:
-                    logits += seg_logit.sigmoid()
+                    logits += seg_prob
             logits /= len(data_samples)
             if self.module.out_channels == 1:
                 seg_pred = (logits > self.module.decode_head.threshold
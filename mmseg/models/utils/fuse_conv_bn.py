@@ -0,0 +1,67 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import torch
+import torch.nn as nn
+from mmcv.cnn import ConvModule
+from torch.nn.modules.batchnorm import _BatchNorm
+
+_FOLDABLE_CONVS = (nn.Conv1d, nn.Conv2d, nn.Conv3d)
+
+
+def _can_fold(conv: nn.Module, bn: nn.Module) -> bool:
+    return isinstance(conv, _FOLDABLE_CONVS) and isinstance(
+        bn, _BatchNorm) and bn.track_running_stats and \
+        conv.out_channels == bn.num_features
+
+
+def _fold_bn(conv: nn.Module, bn: _BatchNorm) -> None:
+    """Fold the statistics and affine parameters of ``bn`` into ``conv``."""
+    with torch.no_grad():
+        factor = torch.rsqrt(bn.running_var + bn.eps)
+        if bn.affine:
+            factor = factor * bn.weight
+        bias = -bn.running_mean * factor
+        if bn.affine:
+            bias = bias + bn.bias
+        if conv.bias is not None:
+            bias = bias + conv.bias * factor
+        shape = [-1] + [1] * (conv.weight.dim() - 1)
+        conv.weight = nn.Parameter(conv.weight * factor.reshape(shape))
+        conv.bias = nn.Parameter(bias)
+
+
+def fuse_conv_bn(module: nn.Module) -> nn.Module:
+    """Recursively fold the BN layers of ``module`` into the preceding convs.
+
+    As in :func:`mmcv.cnn.fuse_conv_bn`, a BN registered right after a conv
+    is folded into it and replaced by ``nn.Identity``. A :class:`ConvModule`
+    is fused according to its ``order``, so that pre-activation blocks, e.g.
+    ``order=('norm', 'act', 'conv')``, are left untouched.
+
+    Args:
+        module (nn.Module): The module to fuse, in eval mode.
+
+    Returns:
+        nn.Module: The fused module.
+    """
+    last_conv = None
+    for name, child in module.named_children():
+        if isinstance(child, ConvModule):
+            order = child.order
+            if child.with_norm and _can_fold(child.conv, child.norm) and \
+                    order.index('norm') == order.index('conv') + 1:
+                _fold_bn(child.conv, child.norm)
+                child._modules[child.norm_name] = nn.Identity()
+                if getattr(child, 'efficient_conv_bn_eval_forward', None):
+                    child.efficient_conv_bn_eval_forward = None
+            last_conv = None
+        elif isinstance(child, _BatchNorm) and last_conv is not None:
+            if _can_fold(last_conv, child):
+                _fold_bn(last_conv, child)
+                module._modules[name] = nn.Identity()
+            last_conv = None
+        elif isinstance(child, _FOLDABLE_CONVS):
+            last_conv = child
+        else:
+            fuse_conv_bn(child)
+            last_conv = None
+    return module
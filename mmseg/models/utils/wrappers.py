@@ -1,6 +1,7 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import warnings
 
+import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
@@ -27,6 +28,63 @@ def resize(input,
     return F.interpolate(input, size, scale_factor, mode, align_corners)
 
 
+def _bilinear_source_index(in_size, out_size, align_corners, device):
+    """Source indices and weights of a 1D bilinear resize, computed as
+    ``F.interpolate`` does."""
+    dst = torch.arange(out_size, device=device, dtype=torch.float32)
+    if align_corners:
+        scale = (in_size - 1) / (out_size - 1) if out_size > 1 else 0.
+        src = dst * scale
+    else:
+        src = ((dst + 0.5) * (in_size / out_size) - 0.5).clamp(min=0)
+    idx0 = src.floor().long().clamp(max=in_size - 1)
+    idx1 = (idx0 + 1).clamp(max=in_size - 1)
+    lambda1 = src - idx0
+    return idx0, idx1, lambda1
+
+
+def resize_argmax(input, size, align_corners=None, tile_size=512):
+    """Bilinearly resize a (C, H, W) score map and take its argmax over C,
+    without materialising the resized map.
+
+    The output is computed by blocks of ``tile_size`` rows, so the peak
+    memory is ``C * tile_size * size[1]`` values instead of
+    ``C * size[0] * size[1]``. The interpolation follows
+    ``F.interpolate(mode='bilinear')``, so the result is the same as
+    ``resize(input[None], size, mode='bilinear').argmax(1)``.
+
+    Args:
+        input (Tensor): The score map with shape (C, H, W).
+        size (tuple[int]): The output size (H', W').
+        align_corners (bool, optional): Same as in ``F.interpolate``.
+        tile_size (int): The number of output rows computed at once.
+            Defaults to 512.
+
+    Returns:
+        Tensor: The label map with shape (1, H', W').
+    """
+    out_h, out_w = (int(x) for x in size)
+    in_h, in_w = input.shape[1:]
+    y0, y1, ly1 = _bilinear_source_index(in_h, out_h, align_corners,
+                                         input.device)
+    x0, x1, lx1 = _bilinear_source_index(in_w, out_w, align_corners,
+                                         input.device)
+    ly1 = ly1.to(input.dtype)[:, None]
+    lx1 = lx1.to(input.dtype)
+    pred = input.new_empty((1, out_h, out_w), dtype=torch.long)
+    for start in range(0, out_h, tile_size):
+        end = min(start + tile_size, out_h)
+        # interpolate along the width first, as F.interpolate does
+        top = input[:, y0[start:end]]
+        top = top[..., x0] * (1 - lx1) + top[..., x1] * lx1
+        bottom = input[:, y1[start:end]]
+        bottom = bottom[..., x0] * (1 - lx1) + bottom[..., x1] * lx1
+        tile_ly1 = ly1[start:end]
+        scores = top * (1 - tile_ly1) + bottom * tile_ly1
+        pred[0, start:end] = scores.argmax(dim=0)
+    return pred
+
+
 class Upsample(nn.Module):
 
     def __init__(self,
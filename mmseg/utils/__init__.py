@@ -12,8 +12,8 @@ from .class_names import (ade_classes, ade_palette, bdd100k_classes,
 # yapf: enable
 from .collect_env import collect_env
 from .get_templates import get_predefined_templates
-from .io import datafrombytes
-from .misc import add_prefix, stack_batch
+from .io import AsyncPNGWriter, datafrombytes
+from .misc import add_prefix, build_label_lut, stack_batch
 from .set_env import register_all_modules
 from .tokenizer import tokenize
 from .typing_utils import (ConfigType, ForwardResults, MultiConfig,
@@ -28,6 +28,7 @@ __all__ = [
     'register_all_modules',
     'stack_batch',
     'add_prefix',
+    'build_label_lut',
     'ConfigType',
     'OptConfigType',
     'MultiConfig',
@@ -59,6 +60,7 @@ __all__ = [
     'get_classes',
     'get_palette',
     'datafrombytes',
+    'AsyncPNGWriter',
     'synapse_palette',
     'synapse_classes',
     'get_predefined_templates',
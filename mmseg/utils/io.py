@@ -2,9 +2,14 @@
 import gzip
 import io
 import pickle
+import queue
+import threading
+import time
+from typing import Optional, Sequence
 
 import cv2
 import numpy as np
+from PIL import Image
 
 
 def datafrombytes(content: bytes, backend: str = 'numpy') -> np.ndarray:
@@ -40,3 +45,130 @@ def datafrombytes(content: bytes, backend: str = 'numpy') -> np.ndarray:
             else:
                 raise ValueError
     return data
+
+
+class AsyncPNGWriter:
+    """Encode and save uint8 label maps as PNG files in background threads.
+
+    ``write`` hands the array over to a bounded queue and returns, so the
+    caller must not modify it afterwards. When the queue is full ``write``
+    blocks until a worker catches up, which bounds the memory held by
+    pending maps. ``flush`` waits for the pending maps and raises the first
+    error met by the workers, ``close`` also stops the workers. Later writes
+    of a closed writer are synchronous.
+
+    Args:
+        num_workers (int): The number of writer threads. 0 writes the files
+            synchronously in ``write``. Defaults to 2.
+        max_queue (int): The maximum number of pending maps.
+            Defaults to 32.
+        compress_level (int): The zlib compression level of the PNG files,
+            from 0 (fastest) to 9 (smallest). Defaults to 6, the Pillow
+            default.
+        palette (Sequence, optional): A list of RGB colors. If given, the
+            files are saved as palette PNGs, which are shown in color but
+            keep the label values as pixel indices. Defaults to None.
+    """
+
+    def __init__(self,
+                 num_workers: int = 2,
+                 max_queue: int = 32,
+                 compress_level: int = 6,
+                 palette: Optional[Sequence] = None):
+        assert 0 <= compress_level <= 9, 'compress_level must be in [0, 9]'
+        self.compress_level = compress_level
+        self.palette = None
+        if palette is not None:
+            self.palette = np.asarray(
+                palette, dtype=np.uint8).reshape(-1)[:768].tolist()
+        self.num_files = 0
+        self.num_bytes = 0
+        self._start_time = None
+        self._lock = threading.Lock()
+        self._errors = []
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._workers = []
+        for _ in range(num_workers):
+            worker = threading.Thread(target=self._work, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def write(self, array: np.ndarray, filename: str) -> None:
+        """Save a (H, W) uint8 label map to ``filename``.
+
+        Args:
+            array (np.ndarray): The label map, owned by the writer from now
+                on.
+            filename (str): The path of the PNG file.
+        """
+        assert array.dtype == np.uint8, 'only uint8 maps can be written'
+        if self._start_time is None:
+            self._start_time = time.perf_counter()
+        if self._workers:
+            self._queue.put((array, filename))
+        else:
+            self._save(array, filename)
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._save(*item)
+            except Exception as e:
+                with self._lock:
+                    self._errors.append(e)
+            finally:
+                self._queue.task_done()
+
+    def _save(self, array: np.ndarray, filename: str) -> None:
+        img = Image.fromarray(array)
+        if self.palette is not None:
+            img.putpalette(self.palette)
+        buffer = io.BytesIO()
+        img.save(buffer, format='PNG', compress_level=self.compress_level)
+        with open(filename, 'wb') as f:
+            f.write(buffer.getbuffer())
+        with self._lock:
+            self.num_files += 1
+            self.num_bytes += buffer.tell()
+
+    def flush(self) -> dict:
+        """Wait for the pending maps to be written.
+
+        Returns:
+            dict: The number of files and bytes written since the last
+            flush, and the time elapsed since their first ``write``.
+        """
+        self._queue.join()
+        with self._lock:
+            errors, self._errors = self._errors, []
+            stats = dict(
+                num_files=self.num_files,
+                num_bytes=self.num_bytes,
+                seconds=0. if self._start_time is None else
+                time.perf_counter() - self._start_time)
+            self.num_files = self.num_bytes = 0
+            self._start_time = None
+        if errors:
+            raise errors[0]
+        return stats
+
+    def close(self) -> dict:
+        """Flush the pending maps and join the workers.
+
+        The workers are stopped even if a pending map failed, whose error is
+        raised afterwards.
+
+        Returns:
+            dict: The statistics of :meth:`flush`.
+        """
+        try:
+            return self.flush()
+        finally:
+            for _ in self._workers:
+                self._queue.put(None)
+            for worker in self._workers:
+                worker.join()
+            self._workers = []
@@ -27,6 +27,39 @@ def add_prefix(inputs, prefix):
     return outputs
 
 
+def build_label_lut(label_map: Optional[dict] = None,
+                    reduce_zero_label: bool = False) -> np.ndarray:
+    """Compile the label changes of a uint8 segmentation map into a lookup
+    table.
+
+    The zero label reduction is applied first, then ``label_map`` on the
+    reduced labels, so ``lut[seg_map]`` gives in one pass the same result
+    as applying them one after the other.
+
+    Args:
+        label_map (dict, optional): Mapping from old to new label ids, as
+            returned by ``BaseSegDataset.get_label_map``. Defaults to None.
+        reduce_zero_label (bool): Whether to mark label zero as ignored
+            (255) and shift the other labels down by one. Defaults to False.
+
+    Returns:
+        np.ndarray: The (256, ) uint8 lookup table.
+    """
+    lut = np.arange(256, dtype=np.int64)
+    if reduce_zero_label:
+        lut -= 1
+        lut[0] = 255
+        lut[255] = 255
+    if label_map:
+        # map with the labels before any replacement, as the keys and the
+        # values may overlap
+        mapped = lut.copy()
+        for old_id, new_id in label_map.items():
+            mapped[lut == old_id] = new_id
+        lut = mapped
+    return (lut % 256).astype(np.uint8)
+
+
 def stack_batch(inputs: List[torch.Tensor],
                 data_samples: Optional[SampleList] = None,
                 size: Optional[tuple] = None,
@@ -0,0 +1,78 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import os.path as osp
+import tempfile
+
+import pytest
+import torch
+from mmengine import ConfigDict
+from mmengine.model import revert_sync_batchnorm
+
+from mmseg.apis.export import ExportWrapper, export_model
+from mmseg.registry import MODELS
+from mmseg.utils import register_all_modules
+
+
+def _build_segformer():
+    register_all_modules()
+    cfg = ConfigDict(
+        type='EncoderDecoder',
+        data_preprocessor=dict(
+            type='SegDataPreProcessor',
+            mean=[123.675, 116.28, 103.53],
+            std=[58.395, 57.12, 57.375],
+            bgr_to_rgb=True),
+        backbone=dict(
+            type='MixVisionTransformer',
+            embed_dims=8,
+            num_layers=[1, 1, 1, 1],
+            num_heads=[1, 2, 5, 8],
+            sr_ratios=[8, 4, 2, 1]),
+        decode_head=dict(
+            type='SegformerHead',
+            in_channels=[8, 16, 40, 64],
+            in_index=[0, 1, 2, 3],
+            channels=16,
+            num_classes=4),
+        test_cfg=dict(mode='whole'))
+    return revert_sync_batchnorm(MODELS.build(cfg)).eval()
+
+
+def test_export_wrapper():
+    model = _build_segformer()
+    img = torch.randint(0, 256, (3, 48, 64), dtype=torch.uint8)
+    result = model.test_step(dict(inputs=[img]))[0]
+    with torch.no_grad():
+        seg_logits = ExportWrapper(model)(img[None])[0]
+        seg_pred = ExportWrapper(model, with_argmax=True)(img[None])[0]
+    assert torch.allclose(seg_logits, result.seg_logits.data, atol=1e-5)
+    assert torch.equal(seg_pred, result.pred_sem_seg.data[0])
+
+
+@pytest.mark.parametrize('with_argmax', [False, True])
+def test_export_torchscript(with_argmax):
+    model = _build_segformer()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = export_model(
+            model,
+            osp.join(tmp_dir, 'model'),
+            formats=['torchscript'],
+            shape=(64, 96),
+            with_argmax=with_argmax,
+            verify_shapes=[(64, 96), (40, 56)])
+        assert osp.isfile(results['torchscript']['file'])
+    # the traced graph also runs on another input size
+    assert all(report['passed'] for report in results['torchscript']['parity'])
+
+
+def test_export_onnx():
+    pytest.importorskip('onnx')
+    pytest.importorskip('onnxruntime')
+    model = _build_segformer()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = export_model(
+            model,
+            osp.join(tmp_dir, 'model'),
+            formats=['onnx'],
+            shape=(64, 96),
+            verify_shapes=[(64, 96), (40, 56)])
+    assert all(report['passed'] for report in results['onnx']['parity'])
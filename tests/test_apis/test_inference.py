@@ -0,0 +1,108 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import os.path as osp
+
+import numpy as np
+import pytest
+import torch
+from mmengine import ConfigDict
+from utils import *  # noqa: F401, F403
+
+from mmseg.apis import inference_model, set_inference_mode
+from mmseg.apis.utils import _group_by_shape
+from mmseg.registry import MODELS
+from mmseg.utils import register_all_modules
+
+
+def _build_model():
+    register_all_modules()
+    cfg = ConfigDict(
+        model=dict(
+            type='InferExampleModel',
+            data_preprocessor=dict(type='SegDataPreProcessor'),
+            backbone=dict(type='InferExampleBackbone'),
+            decode_head=dict(type='InferExampleHead'),
+            test_cfg=dict(mode='whole')),
+        test_pipeline=[
+            dict(type='LoadImageFromFile'),
+            dict(type='LoadAnnotations'),
+            dict(type='PackSegInputs')
+        ])
+    model = MODELS.build(cfg.model)
+    model.cfg = cfg
+    model.eval()
+    return model
+
+
+def test_inference_model_pipeline_cache():
+    model = _build_model()
+    test_pipeline = [dict(t) for t in model.cfg.test_pipeline]
+    img = np.random.randint(0, 256, (8, 8, 3), dtype=np.uint8)
+    img_path = osp.join(
+        osp.dirname(__file__), '../data/pseudo_loveda_dataset/img_dir/0.png')
+
+    result = inference_model(model, img)
+    assert result.pred_sem_seg.shape == (8, 8)
+    # the config is not modified
+    assert [dict(t) for t in model.cfg.test_pipeline] == test_pipeline
+    assert len(model._test_pipeline_cache) == 1
+
+    # the ndarray pipeline is reused
+    pipeline = next(iter(model._test_pipeline_cache.values()))
+    inference_model(model, [img, img])
+    assert len(model._test_pipeline_cache) == 1
+    assert next(iter(model._test_pipeline_cache.values())) is pipeline
+
+    # paths still work after ndarray inputs and get their own pipeline
+    inference_model(model, img_path)
+    assert len(model._test_pipeline_cache) == 2
+
+    # editing the config invalidates the cached pipelines
+    model.cfg.test_pipeline.insert(
+        1, dict(type='Resize', scale=(4, 4), keep_ratio=False))
+    inference_model(model, img)
+    assert len(model._test_pipeline_cache) == 3
+
+
+def test_inference_model_mixed_size_batches():
+    model = _build_model()
+    shapes = [(8, 8), (20, 12), (9, 7), (20, 12), (33, 40)]
+    imgs = [
+        np.random.randint(0, 256, (h, w, 3), dtype=np.uint8)
+        for h, w in shapes
+    ]
+
+    results = inference_model(model, imgs, batch_size=2, bucket_stride=16)
+    # results come back in the input order, without padding
+    assert [r.pred_sem_seg.shape for r in results] == shapes
+    assert [r.seg_logits.shape for r in results] == shapes
+
+
+def test_group_by_shape():
+    shapes = [(3, 8, 8), (3, 20, 12), (3, 9, 7), (3, 20, 12), (3, 30, 30)]
+    batches = _group_by_shape(shapes, batch_size=2, bucket_stride=16)
+    assert batches == [[0, 2], [1, 3], [4]]
+    batches = _group_by_shape(shapes, batch_size=1, bucket_stride=16)
+    assert sorted(sum(batches, [])) == list(range(len(shapes)))
+
+
+def test_inference_model_precision():
+    model = _build_model()
+    img = np.random.randint(0, 256, (8, 8, 3), dtype=np.uint8)
+    expected = inference_model(model, img)
+
+    with pytest.raises(ValueError):
+        set_inference_mode(model, precision='int8')
+    set_inference_mode(model, precision='bf16', channels_last=True)
+    conv = next(m for m in model.modules() if isinstance(m, torch.nn.Conv2d))
+    assert conv.weight.is_contiguous(memory_format=torch.channels_last)
+    result = inference_model(model, img)
+    # the logits are post-processed in fp32
+    assert result.seg_logits.data.dtype == torch.float32
+    # bf16 keeps about 3 significant digits
+    diff = (result.seg_logits.data - expected.seg_logits.data).abs().max()
+    assert diff < 0.02 * expected.seg_logits.data.abs().max()
+
+    set_inference_mode(model)
+    assert conv.weight.is_contiguous()
+    result = inference_model(model, img)
+    assert torch.equal(result.seg_logits.data, expected.seg_logits.data)
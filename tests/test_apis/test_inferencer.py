@@ -58,3 +58,9 @@ def test_inferencer():
     assert 'visualization' in results
     assert len(results['predictions']) == 2
     assert results['predictions'][0].shape == (4, 4)
+
+    # bf16 autocast and channels last
+    infer = MMSegInferencer(
+        cfg, ckpt_filename, device='cpu', precision='bf16', channels_last=True)
+    results = infer(imgs, out_dir=tempfile.gettempdir())
+    assert results['predictions'][0].shape == (4, 4)
@@ -0,0 +1,88 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import os.path as osp
+import tempfile
+
+import pytest
+import torch
+from mmengine import Config
+
+from mmseg.apis import init_model
+from mmseg.apis.quantization import quantize_model, save_quantized
+from mmseg.registry import MODELS
+from mmseg.utils import register_all_modules
+
+CFG = dict(
+    model=dict(
+        type='EncoderDecoder',
+        data_preprocessor=dict(
+            type='SegDataPreProcessor',
+            mean=[123.675, 116.28, 103.53],
+            std=[58.395, 57.12, 57.375],
+            bgr_to_rgb=True),
+        backbone=dict(
+            type='MixVisionTransformer',
+            embed_dims=8,
+            num_layers=[1, 1, 1, 1],
+            num_heads=[1, 2, 5, 8],
+            sr_ratios=[8, 4, 2, 1]),
+        decode_head=dict(
+            type='SegformerHead',
+            in_channels=[8, 16, 40, 64],
+            in_index=[0, 1, 2, 3],
+            channels=16,
+            num_classes=4),
+        test_cfg=dict(mode='whole')))
+
+
+def _build_segformer():
+    register_all_modules()
+    torch.manual_seed(0)
+    return MODELS.build(Config(CFG).model).eval()
+
+
+def _logits(model, img):
+    with torch.no_grad():
+        return model.test_step(dict(inputs=[img]))[0].seg_logits.data
+
+
+@pytest.mark.parametrize('mode', ['dynamic', 'static'])
+def test_quantize_model(mode):
+    model = _build_segformer()
+    img = torch.randint(0, 256, (3, 64, 64), dtype=torch.uint8)
+    expected = _logits(model, img)
+    data_batches = [
+        dict(inputs=[torch.randint(0, 256, (3, 64, 64), dtype=torch.uint8)])
+        for _ in range(4)
+    ] + [dict(inputs=[img])]
+    quantize_model(model, mode, data_batches)
+    q_proj = model.backbone.layers[0][1][0].attn.attn.q_proj
+    if mode == 'static':
+        q_proj = q_proj.module
+        assert model.decode_head.conv_seg.module._get_name() == \
+            'QuantizedConv2d'
+    assert q_proj._get_name() == {
+        'dynamic': 'DynamicQuantizedLinear',
+        'static': 'QuantizedLinear'
+    }[mode]
+    logits = _logits(model, img)
+    assert (logits - expected).abs().max() < 0.1 * expected.abs().max()
+    assert (logits.argmax(0) == expected.argmax(0)).float().mean() > 0.95
+
+    with pytest.raises(ValueError):
+        quantize_model(_build_segformer(), 'int4')
+
+
+def test_init_quantized_model():
+    model = _build_segformer()
+    img = torch.randint(0, 256, (3, 64, 64), dtype=torch.uint8)
+    quantize_model(model, 'static', [dict(inputs=[img])])
+    model.dataset_meta = dict(classes=list('abcd'), palette=[[0, 0, 0]] * 4)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        checkpoint = osp.join(tmp_dir, 'model_static.pth')
+        save_quantized(model, checkpoint)
+        loaded = init_model(Config(CFG), checkpoint, device='cpu')
+        with pytest.raises(ValueError):
+            init_model(Config(CFG), checkpoint, device='cpu', precision='bf16')
+    assert loaded.quantization == dict(mode='static', backend='x86')
+    assert loaded.dataset_meta['classes'] == list('abcd')
+    assert torch.equal(_logits(loaded, img), _logits(model, img))
@@ -0,0 +1,75 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import os
+import os.path as osp
+import tempfile
+
+from mmseg.datasets import BaseSegDataset
+
+
+def _touch(path):
+    os.makedirs(osp.dirname(path), exist_ok=True)
+    open(path, 'w').close()
+
+
+def test_index_cache():
+    tmp_dir = tempfile.TemporaryDirectory()
+    root = tmp_dir.name
+    for name in ['0', '1', '2', 'sub/3']:
+        _touch(osp.join(root, 'img', name + '.jpg'))
+        if name != '1':
+            _touch(osp.join(root, 'ann', name + '.png'))
+
+    def build(**kwargs):
+        return BaseSegDataset(
+            data_root=root,
+            data_prefix=dict(img_path='img', seg_map_path='ann'),
+            metainfo=dict(classes=('a', 'b')),
+            serialize_data=False,
+            **kwargs)
+
+    dataset = build(index_cache=dict(nproc=2))
+    expected = [info['img_path'] for info in build().data_list]
+    assert [info['img_path'] for info in dataset.data_list] == expected
+    index_files = [f for f in os.listdir(root) if f.endswith('.npz')]
+    assert len(index_files) == 1
+
+    # images without a mask are reported
+    assert dataset._find_orphans(['0.jpg', '1.jpg', 'sub/3.jpg'],
+                                 osp.join(root, 'ann')) == ['1.jpg']
+
+    # the index is reused while no folder changes
+    index_path = osp.join(root, index_files[0])
+    mtime = os.stat(index_path).st_mtime_ns
+    dataset = build(index_cache=dict(nproc=2))
+    assert [info['img_path'] for info in dataset.data_list] == expected
+    assert os.stat(index_path).st_mtime_ns == mtime
+
+    # and rebuilt when a file is added
+    _touch(osp.join(root, 'img', 'sub', '4.jpg'))
+    dataset = build(index_cache=dict(nproc=2))
+    assert len(dataset) == 5
+    assert dataset.data_list[-1]['img_path'] == osp.join(
+        root, 'img', 'sub', '4.jpg')
+
+    # the index can be written to a custom path
+    index_path = osp.join(root, 'index.npz')
+    dataset = build(index_cache=dict(path=index_path))
+    assert osp.isfile(index_path)
+    assert len(dataset) == 5
+
+    # a split sharing the path rebuilds the index for its own folders
+    for name in ['5', '6']:
+        _touch(osp.join(root, 'val_img', name + '.jpg'))
+        _touch(osp.join(root, 'val_ann', name + '.png'))
+    val_dataset = BaseSegDataset(
+        data_root=root,
+        data_prefix=dict(img_path='val_img', seg_map_path='val_ann'),
+        metainfo=dict(classes=('a', 'b')),
+        serialize_data=False,
+        index_cache=dict(path=index_path))
+    assert [info['img_path'] for info in val_dataset.data_list] == [
+        osp.join(root, 'val_img', name + '.jpg') for name in ['5', '6']
+    ]
+    assert len(build(index_cache=dict(path=index_path))) == 5
+
+    tmp_dir.cleanup()
@@ -7,12 +7,16 @@ import mmcv
 import numpy as np
 from mmcv.transforms import LoadImageFromFile
 
+from mmseg.datasets import ShardedSegDataset, ShardWriter
 from mmseg.datasets.transforms import LoadAnnotations  # noqa
-from mmseg.datasets.transforms import (LoadBiomedicalAnnotation,
+from mmseg.datasets.transforms import (LoadAnnotationsFromShard,
+                                       LoadBiomedicalAnnotation,
                                        LoadBiomedicalData,
                                        LoadBiomedicalImageFromFile,
                                        LoadDepthAnnotation,
-                                       LoadImageFromNDArray)
+                                       LoadImageFromNDArray,
+                                       LoadImageFromShard)
+from mmseg.utils import build_label_lut, register_all_modules
 
 
 class TestLoading:
@@ -204,6 +208,41 @@ class TestLoading:
 
         tmp_dir.cleanup()
 
+    def test_load_seg_label_lut(self):
+        test_gt = np.random.randint(0, 256, (10, 10), dtype=np.uint8)
+        label_map = {i: 255 if i % 3 else i // 3 for i in range(28)}
+
+        tmp_dir = tempfile.TemporaryDirectory()
+        gt_path = osp.join(tmp_dir.name, 'gt.png')
+        mmcv.imwrite(test_gt, gt_path)
+
+        # the lookup table gives the same labels as reducing the zero label
+        # and then applying the label map one entry at a time
+        expected = test_gt.copy()
+        expected[expected == 0] = 255
+        expected = expected - 1
+        expected[expected == 254] = 255
+        expected_copy = expected.copy()
+        for old_id, new_id in label_map.items():
+            expected[expected_copy == old_id] = new_id
+
+        results = dict(
+            seg_map_path=gt_path,
+            label_map=label_map,
+            reduce_zero_label=True,
+            seg_fields=[])
+        load_anns = LoadAnnotations()
+        results = load_anns(results)
+        assert results['gt_seg_map'].dtype == np.uint8
+        np.testing.assert_array_equal(results['gt_seg_map'], expected)
+
+        np.testing.assert_array_equal(
+            build_label_lut(label_map, reduce_zero_label=True)[test_gt],
+            expected)
+        np.testing.assert_array_equal(build_label_lut(), np.arange(256))
+
+        tmp_dir.cleanup()
+
     def test_load_image_from_ndarray(self):
         results = {'img': np.zeros((256, 256, 3), dtype=np.uint8)}
         transform = LoadImageFromNDArray()
@@ -228,6 +267,59 @@ class TestLoading:
                                    "imdecode_backend='cv2', "
                                    'backend_args=None)')
 
+    def test_load_from_shard(self):
+        register_all_modules()
+        tmp_dir = tempfile.TemporaryDirectory()
+        imgs = [
+            np.random.randint(0, 256, (8 + i, 12, 3), dtype=np.uint8)
+            for i in range(3)
+        ]
+        seg_maps = [
+            np.random.randint(0, 3, img.shape[:2], dtype=np.uint8)
+            for img in imgs
+        ]
+        # a tiny shard size puts every sample in its own shard
+        with ShardWriter(tmp_dir.name, shard_size=1) as writer:
+            for i, (img, seg_map) in enumerate(zip(imgs, seg_maps)):
+                writer.write(f'img_{i}', img, seg_map)
+        assert len(writer.shards) == 3
+
+        dataset = ShardedSegDataset(
+            data_prefix=dict(img_path=tmp_dir.name),
+            metainfo=dict(classes=('a', 'b', 'c')),
+            pipeline=[
+                dict(type='LoadImageFromShard'),
+                dict(type='LoadAnnotationsFromShard')
+            ])
+        assert len(dataset) == 3
+        for i in range(3):
+            results = dataset.pipeline(dataset.get_data_info(i))
+            np.testing.assert_array_equal(results['img'], imgs[i])
+            assert not results['img'].flags.writeable
+            assert results['img_shape'] == imgs[i].shape[:2]
+            np.testing.assert_array_equal(results['gt_seg_map'], seg_maps[i])
+            assert results['seg_fields'] == ['gt_seg_map']
+
+        results = LoadImageFromShard(copy=True)(dataset.get_data_info(0))
+        assert results['img'].flags.writeable
+        results = LoadImageFromShard(to_float32=True)(
+            dataset.get_data_info(0))
+        assert results['img'].dtype == np.float32
+
+        # the label mapping of LoadAnnotations applies to shards too
+        dataset = ShardedSegDataset(
+            data_prefix=dict(img_path=tmp_dir.name),
+            metainfo=dict(classes=('a', 'b', 'c')),
+            reduce_zero_label=True)
+        results = LoadAnnotationsFromShard()(dataset.get_data_info(0))
+        expected = seg_maps[0].astype(np.int64) - 1
+        expected[expected < 0] = 255
+        np.testing.assert_array_equal(results['gt_seg_map'], expected)
+        assert repr(LoadAnnotationsFromShard()) == \
+            'LoadAnnotationsFromShard(reduce_zero_label=None)'
+
+        tmp_dir.cleanup()
+
     def test_load_biomedical_img(self):
         results = dict(
             img_path=osp.join(self.data_prefix, 'biomedical.nii.gz'))
@@ -336,6 +336,48 @@ def test_random_crop():
     assert results['gt_semantic_seg'].shape[:2] == (h - 20, w - 20)
 
 
+def test_random_crop_cat_max_ratio():
+
+    def reference_crop_bbox(seg, crop_size, cat_max_ratio, ignore_index):
+        # the original sampling, counting every candidate with np.unique
+        def generate():
+            margin_h = max(seg.shape[0] - crop_size[0], 0)
+            margin_w = max(seg.shape[1] - crop_size[1], 0)
+            offset_h = np.random.randint(0, margin_h + 1)
+            offset_w = np.random.randint(0, margin_w + 1)
+            return (offset_h, offset_h + crop_size[0], offset_w,
+                    offset_w + crop_size[1])
+
+        crop_bbox = generate()
+        for _ in range(10):
+            y1, y2, x1, x2 = crop_bbox
+            labels, cnt = np.unique(seg[y1:y2, x1:x2], return_counts=True)
+            cnt = cnt[labels != ignore_index]
+            if len(cnt) > 1 and np.max(cnt) / np.sum(cnt) < cat_max_ratio:
+                break
+            crop_bbox = generate()
+        return crop_bbox
+
+    seg = np.zeros((120, 90), dtype=np.uint8)
+    seg[30:60, 20:50] = 3
+    seg[70:110, 40:80] = 7
+    seg[:10] = 255
+    img = np.zeros((120, 90, 3), dtype=np.uint8)
+    for crop_size in [(20, 20), (60, 60), (100, 150)]:
+        transform = RandomCrop(crop_size=crop_size, cat_max_ratio=0.75)
+        for seed in range(20):
+            np.random.seed(seed)
+            expected = reference_crop_bbox(seg, crop_size, 0.75, 255)
+            np.random.seed(seed)
+            results = transform(
+                dict(
+                    img=img.copy(),
+                    gt_seg_map=seg.copy(),
+                    seg_fields=['gt_seg_map']))
+            y1, y2, x1, x2 = expected
+            assert np.array_equal(results['gt_seg_map'], seg[y1:y2, x1:x2])
+
+
 def test_rgb2gray():
     # test assertion out_channels should be greater than 0
     with pytest.raises(AssertionError):
@@ -423,6 +465,25 @@ def test_photo_metric_distortion():
     assert results['img_shape'] == img.shape
 
 
+def test_photo_metric_distortion_fused():
+    img = mmcv.imread(
+        osp.join(osp.dirname(__file__), '../data/color.jpg'), 'color')
+    transform = PhotoMetricDistortion()
+    for seed in range(30):
+        np.random.seed(seed)
+        params = transform._get_params()
+        np.random.seed(seed)
+        fused = transform(dict(img=img.copy()))['img']
+        assert fused.dtype == np.uint8 and fused.shape == img.shape
+        sequential = transform._distort_sequential(img.copy(), params)
+        diff = np.abs(fused.astype(int) - sequential)
+        if params['saturation'] is None or params['hue'] is None:
+            # exact, unless both HSV changes skip a round trip
+            assert diff.max() == 0
+        else:
+            assert diff.mean() < 2
+
+
 def test_rerange():
     # test assertion if min_value or max_value is illegal
     with pytest.raises(AssertionError):
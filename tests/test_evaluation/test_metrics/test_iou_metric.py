@@ -2,6 +2,7 @@
 import os.path as osp
 import shutil
 from unittest import TestCase
+from unittest.mock import patch
 
 import numpy as np
 import torch
@@ -90,6 +91,26 @@ class TestIoUMetric(TestCase):
         assert osp.isfile('tmp/00000_img.png')
         shutil.rmtree('tmp')
 
+        # test save segment file in background threads
+        iou_metric = IoUMetric(
+            iou_metrics=['mIoU'],
+            output_dir='tmp',
+            output_writer=dict(num_workers=2, palette=True))
+        iou_metric.dataset_meta = dict(
+            classes=['wall', 'building', 'sky', 'floor', 'tree'],
+            palette=[[120, 120, 120], [180, 120, 120], [6, 230, 230],
+                     [80, 50, 50], [4, 200, 3]],
+            label_map=dict(),
+            reduce_zero_label=False)
+        iou_metric.process([0] * len(data_samples), data_samples)
+        workers = list(iou_metric._writer._workers)
+        iou_metric.evaluate(2)
+        assert osp.isfile('tmp/00000_img.png')
+        # the writer threads do not outlive the evaluation
+        assert iou_metric._writer is None
+        assert not any(worker.is_alive() for worker in workers)
+        shutil.rmtree('tmp')
+
         # test format_only
         iou_metric = IoUMetric(
             iou_metrics=['mIoU'], output_dir='tmp', format_only=True)
@@ -102,3 +123,69 @@ class TestIoUMetric(TestCase):
         assert osp.exists('tmp')
         assert osp.isfile('tmp/00000_img.png')
         shutil.rmtree('tmp')
+
+    def test_streaming(self):
+        """Test that the streaming mode gives the default mode metrics."""
+        classes = ['wall', 'building', 'sky', 'floor', 'tree']
+        data_samples = self._demo_mm_inputs(batch_size=4)
+        data_samples = self._demo_mm_model_output(data_samples)
+        data_samples[0]['gt_sem_seg']['data'][0, :10] = 255
+
+        metrics = ['mIoU', 'mDice', 'mFscore']
+        iou_metric = IoUMetric(iou_metrics=metrics)
+        streaming_metric = IoUMetric(iou_metrics=metrics, streaming=True)
+        for metric in [iou_metric, streaming_metric]:
+            metric.dataset_meta = dict(
+                classes=classes, label_map=dict(), reduce_zero_label=False)
+        self.assertEqual(streaming_metric.snapshot(), dict())
+        for i in range(0, 4, 2):
+            iou_metric.process([0] * 2, data_samples[i:i + 2])
+            streaming_metric.process([0] * 2, data_samples[i:i + 2])
+        self.assertEqual(streaming_metric.results, [])
+        snapshot = streaming_metric.snapshot()
+        res = iou_metric.evaluate(4)
+        streaming_res = streaming_metric.evaluate(4)
+        self.assertEqual(res.keys(), streaming_res.keys())
+        for key, value in res.items():
+            self.assertAlmostEqual(value, streaming_res[key], places=2)
+            self.assertAlmostEqual(value, snapshot[key], places=2)
+        # the state is reset after evaluate
+        self.assertEqual(streaming_metric.snapshot(), dict())
+
+        # two ranks: the sampler pads the 3 samples with a copy of sample 0
+        rank_metrics = []
+        for rank in range(2):
+            metric = IoUMetric(iou_metrics=metrics, streaming=True)
+            metric.dataset_meta = streaming_metric.dataset_meta
+            for i in [rank, rank + 2]:
+                metric.process([0], [data_samples[i % 3]])
+            rank_metrics.append(metric)
+        confusions = []
+
+        def all_reduce(confusion):
+            # this process plays both ranks, the last one gets the sum
+            for other in confusions:
+                confusion += other
+            confusions.append(confusion.clone())
+
+        prefix = 'mmseg.evaluation.metrics.iou_metric.'
+        with patch(prefix + 'all_reduce', all_reduce):
+            for rank, metric in enumerate(rank_metrics):
+                with patch(prefix + 'get_dist_info', lambda r=rank: (r, 2)):
+                    streaming_res = metric.evaluate(3)
+        iou_metric = IoUMetric(iou_metrics=metrics)
+        iou_metric.dataset_meta = streaming_metric.dataset_meta
+        iou_metric.process([0] * 3, data_samples[:3])
+        res = iou_metric.evaluate(3)
+        for key, value in res.items():
+            self.assertAlmostEqual(value, streaming_res[key], places=2)
+
+        pred = torch.randint(0, 5, (16, 16))
+        label = torch.randint(0, 5, (16, 16))
+        label[:2] = 255
+        confusion = IoUMetric.confusion_matrix(pred, label, 5, 255)
+        self.assertEqual(confusion.sum().item(), 14 * 16)
+        areas = IoUMetric.confusion_to_areas(confusion)
+        for area, expected in zip(
+                areas, IoUMetric.intersect_and_union(pred, label, 5, 255)):
+            self.assertTrue(torch.equal(area.float(), expected))
@@ -66,6 +66,43 @@ def test_mit():
     assert x_out.shape == torch.Size([1, 56 * 56, 64])
 
 
+@pytest.mark.parametrize('sr_ratio', [1, 2])
+def test_mit_sdpa_backend(sr_ratio):
+    with pytest.raises(AssertionError):
+        EfficientMultiheadAttention(64, 2, attn_backend='flash')
+
+    # both backends share the parameters and give the same outputs
+    mha = EfficientMultiheadAttention(
+        64, 2, qkv_bias=True, sr_ratio=sr_ratio)
+    sdpa = EfficientMultiheadAttention(
+        64, 2, qkv_bias=True, sr_ratio=sr_ratio, attn_backend='sdpa')
+    sdpa.load_state_dict(mha.state_dict())
+    x = torch.randn(2, 16 * 12, 64)
+    x_mha = x.clone().requires_grad_()
+    x_sdpa = x.clone().requires_grad_()
+    out_mha = mha(x_mha, (16, 12))
+    out_sdpa = sdpa(x_sdpa, (16, 12))
+    assert torch.allclose(out_mha, out_sdpa, atol=1e-5)
+    out_mha.sum().backward()
+    out_sdpa.sum().backward()
+    assert torch.allclose(x_mha.grad, x_sdpa.grad, atol=1e-4)
+
+    model = MixVisionTransformer(
+        embed_dims=16, num_heads=[1, 2, 5, 8], num_layers=[1, 1, 1, 1])
+    model_sdpa = MixVisionTransformer(
+        embed_dims=16,
+        num_heads=[1, 2, 5, 8],
+        num_layers=[1, 1, 1, 1],
+        attn_backend='sdpa')
+    model_sdpa.load_state_dict(model.state_dict())
+    model.eval()
+    model_sdpa.eval()
+    temp = torch.randn((1, 3, 64, 96))
+    with torch.no_grad():
+        for out, out_sdpa in zip(model(temp), model_sdpa(temp)):
+            assert torch.allclose(out, out_sdpa, atol=1e-5)
+
+
 def test_mit_init():
     path = 'PATH_THAT_DO_NOT_EXIST'
     # Test all combinations of pretrained and init_cfg
@@ -62,3 +62,73 @@ class TestSegDataPreProcessor(TestCase):
         out = processor(data, training=False)
         self.assertEqual(out['inputs'].shape[2] % 15, 0)
         self.assertEqual(out['inputs'].shape[3] % 15, 0)
+
+    def test_forward_mixed_size_predict(self):
+        processor = SegDataPreProcessor(mean=[0, 0, 0], std=[1, 1, 1])
+        data = {
+            'inputs': [
+                torch.randint(0, 256, (3, 11, 10)),
+                torch.randint(0, 256, (3, 8, 12))
+            ],
+            'data_samples': [SegDataSample(), SegDataSample()]
+        }
+        out = processor(data, training=False)
+        self.assertEqual(out['inputs'].shape, (2, 3, 11, 12))
+        self.assertEqual(out['data_samples'][0].img_padding_size,
+                         (0, 2, 0, 0))
+        self.assertEqual(out['data_samples'][1].img_padding_size,
+                         (0, 0, 0, 3))
+
+        # without data samples the padding cannot be recorded
+        data.pop('data_samples')
+        with self.assertRaises(AssertionError):
+            processor(data, training=False)
+
+    def test_forward_batch_augments(self):
+
+        def get_data():
+            inputs, data_samples = [], []
+            for _ in range(3):
+                img = torch.randint(0, 256, (3, 40, 30))
+                data_sample = SegDataSample()
+                # the labels follow the first channel, so that misaligned
+                # geometric augmentations are caught
+                data_sample.gt_sem_seg = PixelData(
+                    **{'data': (img[:1] > 127).long()})
+                inputs.append(img)
+                data_samples.append(data_sample)
+            return dict(inputs=inputs, data_samples=data_samples)
+
+        processor = SegDataPreProcessor(
+            mean=[0, 0, 0],
+            std=[1, 1, 1],
+            batch_augments=[
+                dict(type='BatchRandomResize', ratio_range=(1.0, 1.0)),
+                dict(type='BatchRandomCrop', crop_size=(24, 24)),
+                dict(type='BatchRandomFlip', prob=0.5),
+            ])
+        out = processor(get_data(), training=True)
+        self.assertEqual(out['inputs'].shape, (3, 3, 24, 24))
+        for img, data_sample in zip(out['inputs'], out['data_samples']):
+            self.assertTrue(
+                torch.equal((img[:1] > 127).long(),
+                            data_sample.gt_sem_seg.data))
+            self.assertEqual(data_sample.img_shape, (24, 24))
+
+        # crops larger than the batch are padded
+        processor = SegDataPreProcessor(batch_augments=[
+            dict(type='BatchRandomResize', ratio_range=(0.5, 0.5)),
+            dict(type='BatchRandomCrop', crop_size=(24, 24)),
+            dict(type='BatchPhotoMetricDistortion'),
+        ])
+        out = processor(get_data(), training=True)
+        self.assertEqual(out['inputs'].shape, (3, 3, 24, 24))
+        self.assertTrue((out['inputs'] >= 0).all())
+        self.assertTrue((out['inputs'] <= 255).all())
+        gt = out['data_samples'][0].gt_sem_seg.data
+        self.assertEqual(gt.shape, (1, 24, 24))
+        self.assertTrue((gt[:, 20:] == 255).all())
+
+        # batch augmentations only run during training
+        out = processor(get_data(), training=False)
+        self.assertEqual(out['inputs'].shape, (3, 3, 40, 30))
@@ -38,3 +38,34 @@ def test_segformer_head():
     temp = model(inputs)
 
     assert temp.shape == (1, 19, H // 4, W // 4)
+
+
+def test_segformer_head_fuse_for_inference():
+    in_channels = (8, 16, 40, 64)
+    inputs = [
+        torch.randn((2, in_channel, 24 // 2**i, 32 // 2**i))
+        for i, in_channel in enumerate(in_channels)
+    ]
+    model = SegformerHead(
+        in_channels=in_channels,
+        in_index=[0, 1, 2, 3],
+        channels=16,
+        num_classes=5)
+    # non-trivial BN statistics
+    for module in model.modules():
+        if isinstance(module, torch.nn.BatchNorm2d):
+            module.running_mean.uniform_(-1, 1)
+            module.running_var.uniform_(0.5, 2)
+            module.weight.data.uniform_(0.5, 2)
+            module.bias.data.uniform_(-1, 1)
+    model.eval()
+    with torch.no_grad():
+        expected = model(inputs)
+        model.fuse_for_inference()
+        assert model.fusion_projs is not None
+        assert not any(
+            isinstance(module, torch.nn.BatchNorm2d)
+            for module in model.modules())
+        out = model(inputs)
+    assert torch.allclose(out, expected, atol=1e-4)
+    assert torch.equal(out.argmax(1), expected.argmax(1))
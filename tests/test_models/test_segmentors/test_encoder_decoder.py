@@ -1,4 +1,5 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import pytest
 import torch
 from mmengine import ConfigDict
 from mmengine.structures import PixelData
@@ -98,3 +99,94 @@ def test_postprocess_result():
     outputs = model.postprocess_result(seg_logits, data_samples)
     assert outputs[0].seg_logits.data.shape == torch.Size((2, 8, 8))
     assert torch.allclose(outputs[0].seg_logits.data, torch.ones((2, 8, 8)))
+
+
+def test_slide_inference():
+    cfg = ConfigDict(
+        type='EncoderDecoder',
+        backbone=dict(type='ExampleBackbone'),
+        decode_head=dict(type='ExampleDecodeHead'),
+        train_cfg=None,
+        test_cfg=dict(mode='slide', crop_size=(6, 6), stride=(4, 4)))
+    segmentor = build_segmentor(cfg)
+    segmentor.eval()
+    inputs = torch.randn(2, 3, 13, 17)
+    batch_img_metas = [dict(ori_shape=(13, 17)) for _ in range(2)]
+
+    with torch.no_grad():
+        expected = segmentor.slide_inference(inputs, batch_img_metas)
+
+        # batching the windows does not change the result
+        segmentor.test_cfg.slide_batch_size = 4
+        seg_logits = segmentor.slide_inference(inputs, batch_img_metas)
+        assert seg_logits.shape == (2, 19, 13, 17)
+        assert torch.allclose(seg_logits, expected, atol=1e-5)
+
+        # windows larger than the image
+        small_inputs = inputs[:, :, :5, :4]
+        seg_logits = segmentor.slide_inference(small_inputs, batch_img_metas)
+        assert seg_logits.shape == (2, 19, 5, 4)
+
+        for slide_weight in ['gaussian', 'cosine']:
+            segmentor.test_cfg.slide_weight = slide_weight
+            seg_logits = segmentor.slide_inference(inputs, batch_img_metas)
+            assert seg_logits.shape == (2, 19, 13, 17)
+            assert torch.isfinite(seg_logits).all()
+
+        # a constant prediction is kept by any weighted average
+        segmentor.encode_decode = lambda x, metas: x.new_ones(
+            x.shape[0], 19, *x.shape[2:])
+        seg_logits = segmentor.slide_inference(inputs, batch_img_metas)
+        assert torch.allclose(seg_logits, torch.ones_like(seg_logits))
+
+        segmentor.test_cfg.slide_weight = 'triangle'
+        with pytest.raises(AssertionError):
+            segmentor.slide_inference(inputs, batch_img_metas)
+
+
+def test_postprocess_result_low_memory():
+    cfg = ConfigDict(
+        type='EncoderDecoder',
+        backbone=dict(type='ExampleBackbone'),
+        decode_head=dict(type='ExampleDecodeHead'),
+        train_cfg=None,
+        test_cfg=dict(mode='whole'))
+    model = build_segmentor(cfg)
+
+    seg_logits = torch.randn((2, 5, 10, 12))
+
+    def _data_samples():
+        data_samples = []
+        for flip in [False, True]:
+            data_sample = SegDataSample()
+            data_sample.set_metainfo({
+                'padding_size': (0, 2, 0, 1),
+                'ori_shape': (37, 29),
+                'flip': flip,
+                'flip_direction': 'horizontal'
+            })
+            data_samples.append(data_sample)
+        return data_samples
+
+    expected = model.postprocess_result(seg_logits, _data_samples())
+
+    model.test_cfg = ConfigDict(
+        mode='whole',
+        keep_seg_logits=False,
+        argmax_tile_size=8,
+        uint8_pred=True,
+        keep_low_res_probs=True)
+    outputs = model.postprocess_result(seg_logits, _data_samples())
+    for output, expected_output in zip(outputs, expected):
+        assert 'seg_logits' not in output
+        assert output.pred_sem_seg.data.dtype == torch.uint8
+        assert torch.equal(output.pred_sem_seg.data.long(),
+                           expected_output.pred_sem_seg.data)
+        assert output.seg_probs.data.shape == (5, 9, 10)
+        assert torch.allclose(
+            output.seg_probs.data.sum(0), torch.ones((9, 10)), atol=1e-5)
+
+    # without data samples, the predictions stay at the logits resolution
+    outputs = model.postprocess_result(seg_logits)
+    assert outputs[0].pred_sem_seg.shape == (10, 12)
+    assert outputs[0].seg_probs.shape == (10, 12)
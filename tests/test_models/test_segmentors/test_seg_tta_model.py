@@ -1,5 +1,7 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import tempfile
+from copy import deepcopy
+from unittest.mock import patch
 
 import torch
 from mmengine import ConfigDict
@@ -26,6 +28,8 @@ def test_encoder_decoder_tta():
     cfg = ConfigDict(type='SegTTAModel', module=segmentor_cfg)
 
     model: BaseTTAModel = MODELS.build(cfg)
+    # no dropout, so that separate forward passes can be compared
+    model.eval()
 
     imgs = []
     data_samples = []
@@ -46,6 +50,39 @@ def test_encoder_decoder_tta():
 
     model.test_step(dict(inputs=imgs, data_samples=data_samples))
 
+    # the fused merge gives the same prediction as merging the outputs of
+    # every augmentation at the original resolution
+    data = dict(inputs=imgs, data_samples=data_samples)
+    fused = model.test_step(deepcopy(data))
+    merged = BaseTTAModel.test_step(model, deepcopy(data))
+    assert torch.equal(fused[0].pred_sem_seg.data,
+                       merged[0].pred_sem_seg.data.view(1, 10, 10))
+    assert fused[0].img_path == data_samples[0][0].img_path
+
+    # augmentations of the same shape run in one forward pass, and the
+    # probabilities can be merged at a reduced resolution
+    same_shape = dict(
+        inputs=[torch.randn(1, 3, 12, 12) for _ in range(4)],
+        data_samples=deepcopy(data_samples[:4]))
+    model.merge_scale = 0.5
+    with patch.object(
+            model.module, 'inference',
+            wraps=model.module.inference) as inference:
+        result = model.test_step(same_shape)
+    assert inference.call_count == 1
+    assert result[0].pred_sem_seg.shape == (10, 10)
+    model.merge_scale = 1.0
+
+    # early exit once the merged prediction is confident enough
+    model.early_exit = dict(min_augs=2, margin=0., ratio=0.)
+    with patch.object(
+            model.module, 'inference',
+            wraps=model.module.inference) as inference:
+        result = model.test_step(deepcopy(data))
+    assert inference.call_count == 2
+    assert result[0].pred_sem_seg.shape == (10, 10)
+    model.early_exit = None
+
     # test out_channels == 1
     segmentor_cfg = ConfigDict(
         type='EncoderDecoder',
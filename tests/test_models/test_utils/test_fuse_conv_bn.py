@@ -0,0 +1,44 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import torch
+import torch.nn as nn
+from mmcv.cnn import ConvModule
+
+from mmseg.models.utils import fuse_conv_bn
+
+
+def _randomize_bn(model):
+    for module in model.modules():
+        if isinstance(module, nn.BatchNorm2d):
+            module.running_mean.uniform_(-1, 1)
+            module.running_var.uniform_(0.5, 2)
+            module.weight.data.uniform_(0.5, 2)
+            module.bias.data.uniform_(-1, 1)
+
+
+def test_fuse_conv_bn():
+    model = nn.Sequential(
+        ConvModule(3, 8, 3, padding=1, norm_cfg=dict(type='BN')),
+        nn.Conv2d(8, 8, 1),
+        nn.BatchNorm2d(8),
+        nn.ReLU(),
+        # a pre-activation block, its BN runs before the conv
+        ConvModule(
+            8,
+            8,
+            1,
+            norm_cfg=dict(type='BN'),
+            order=('norm', 'act', 'conv')),
+        # a BN that does not follow a conv directly
+        nn.BatchNorm2d(8))
+    _randomize_bn(model)
+    model.eval()
+    x = torch.randn(2, 3, 16, 16)
+    with torch.no_grad():
+        expected = model(x)
+        fuse_conv_bn(model)
+        out = model(x)
+    assert torch.allclose(out, expected, atol=1e-5)
+    assert isinstance(model[0].norm, nn.Identity)
+    assert isinstance(model[2], nn.Identity)
+    assert isinstance(model[4].norm, nn.BatchNorm2d)
+    assert isinstance(model[5], nn.BatchNorm2d)
@@ -1,11 +1,13 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import os.path as osp
+import tempfile
 
 import numpy as np
 import pytest
 from mmengine import FileClient
+from PIL import Image
 
-from mmseg.utils import datafrombytes
+from mmseg.utils import AsyncPNGWriter, datafrombytes
 
 
 @pytest.mark.parametrize(
@@ -31,3 +33,40 @@ def test_datafrombytes(backend, suffix):
             # testing data biomedical.npy includes data and label
             assert len(data.shape) == 4
             assert data.shape[0] == 2
+
+
+@pytest.mark.parametrize('num_workers', [0, 2])
+def test_async_png_writer(num_workers):
+    tmp_dir = tempfile.TemporaryDirectory()
+    palette = [[0, 0, 0], [255, 0, 0], [0, 255, 0]]
+    writer = AsyncPNGWriter(
+        num_workers=num_workers, max_queue=2, compress_level=1,
+        palette=palette)
+    arrays = [
+        np.random.randint(0, 3, (8 + i, 10), dtype=np.uint8) for i in range(5)
+    ]
+    for i, array in enumerate(arrays):
+        writer.write(array, osp.join(tmp_dir.name, f'{i}.png'))
+    stats = writer.flush()
+    assert stats['num_files'] == 5 and stats['num_bytes'] > 0
+    for i, array in enumerate(arrays):
+        img = Image.open(osp.join(tmp_dir.name, f'{i}.png'))
+        assert img.mode == 'P'
+        assert img.getpalette()[:9] == sum(palette, [])
+        np.testing.assert_array_equal(np.array(img), array)
+    assert writer.flush()['num_files'] == 0
+
+    # errors of the workers are raised by flush
+    with pytest.raises(FileNotFoundError):
+        writer.write(arrays[0], osp.join(tmp_dir.name, 'missing', '0.png'))
+        writer.flush()
+
+    # and by close, which stops the workers anyway
+    workers = list(writer._workers)
+    with pytest.raises(FileNotFoundError):
+        writer.write(arrays[0], osp.join(tmp_dir.name, 'missing', '0.png'))
+        writer.close()
+    writer.close()
+    assert not any(worker.is_alive() for worker in workers)
+    assert writer._workers == []
+    tmp_dir.cleanup()
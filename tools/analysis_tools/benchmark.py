@@ -12,6 +12,9 @@ from mmengine.registry import init_default_scope
 from mmengine.runner import Runner, load_checkpoint
 from mmengine.utils import mkdir_or_exist
 
+from mmseg.apis import inference_context, set_inference_mode
+from mmseg.apis.inference import PRECISIONS
+from mmseg.evaluation import IoUMetric
 from mmseg.registry import MODELS
 
 
@@ -26,53 +29,62 @@ def parse_args():
         help=('if specified, the results will be dumped '
               'into the directory as json'))
     parser.add_argument('--repeat-times', type=int, default=1)
+    parser.add_argument(
+        '--fuse',
+        action='store_true',
+        help='benchmark the model after `fuse_for_inference`, which folds '
+        'BN into convs and applies the inference rewrites of the heads')
+    parser.add_argument(
+        '--precisions',
+        nargs='+',
+        default=['fp32'],
+        choices=list(PRECISIONS),
+        help='inference precisions to benchmark, the first precision and '
+        'memory format is the reference of the speed-up and mIoU drift')
+    parser.add_argument(
+        '--memory-formats',
+        nargs='+',
+        default=['contiguous'],
+        choices=['contiguous', 'channels_last'],
+        help='memory formats to benchmark, with every precision')
     args = parser.parse_args()
     return args
 
 
-def main():
-    args = parse_args()
-    cfg = Config.fromfile(args.config)
+def build_model(cfg, args, precision, channels_last):
+    cfg.model.train_cfg = None
+    # the same weights in every mode when no checkpoint is loaded
+    torch.manual_seed(0)
+    model = MODELS.build(cfg.model)
 
-    init_default_scope(cfg.get('default_scope', 'mmseg'))
+    if 'checkpoint' in args and osp.exists(args.checkpoint):
+        load_checkpoint(model, args.checkpoint, map_location='cpu')
 
-    timestamp = time.strftime('%Y%m%d_%H%M%S', time.localtime())
-    if args.work_dir is not None:
-        mkdir_or_exist(osp.abspath(args.work_dir))
-        json_file = osp.join(args.work_dir, f'fps_{timestamp}.json')
-    else:
-        # use config filename as default work_dir if cfg.work_dir is None
-        work_dir = osp.join('./work_dirs',
-                            osp.splitext(osp.basename(args.config))[0])
-        mkdir_or_exist(osp.abspath(work_dir))
-        json_file = osp.join(work_dir, f'fps_{timestamp}.json')
+    if torch.cuda.is_available():
+        model = model.cuda()
 
-    repeat_times = args.repeat_times
-    # set cudnn_benchmark
-    torch.backends.cudnn.benchmark = False
-    cfg.model.pretrained = None
+    model = revert_sync_batchnorm(model)
 
-    benchmark_dict = dict(config=args.config, unit='img / s')
-    overall_fps_list = []
-    cfg.test_dataloader.batch_size = 1
-    for time_index in range(repeat_times):
+    model.eval()
+    if args.fuse:
+        model.fuse_for_inference()
+    return set_inference_mode(model, precision, channels_last)
+
+
+def benchmark_mode(cfg, args, precision, channels_last):
+    """Return the fps of every repeat and the mIoU of the predictions of the
+    first repeat, or None if the test data has no annotations."""
+    fps_list = []
+    miou = None
+    for time_index in range(args.repeat_times):
         print(f'Run {time_index + 1}:')
         # build the dataloader
         data_loader = Runner.build_dataloader(cfg.test_dataloader)
-
-        # build the model and load checkpoint
-        cfg.model.train_cfg = None
-        model = MODELS.build(cfg.model)
-
-        if 'checkpoint' in args and osp.exists(args.checkpoint):
-            load_checkpoint(model, args.checkpoint, map_location='cpu')
-
-        if torch.cuda.is_available():
-            model = model.cuda()
-
-        model = revert_sync_batchnorm(model)
-
-        model.eval()
+        model = build_model(cfg, args, precision, channels_last)
+        metric = None
+        if time_index == 0:
+            metric = IoUMetric()
+            metric.dataset_meta = data_loader.dataset.metainfo
 
         # the first several iterations may be very slow so skip them
         num_warmup = 5
@@ -88,13 +100,17 @@ def main():
                 torch.cuda.synchronize()
             start_time = time.perf_counter()
 
-            with torch.no_grad():
-                model(inputs, data_samples, mode='predict')
+            with inference_context(model):
+                outputs = model(inputs, data_samples, mode='predict')
 
             if torch.cuda.is_available():
                 torch.cuda.synchronize()
             elapsed = time.perf_counter() - start_time
 
+            if metric is not None and 'gt_sem_seg' in outputs[0]:
+                metric.process(data,
+                               [output.to_dict() for output in outputs])
+
             if i >= num_warmup:
                 pure_inf_time += elapsed
                 if (i + 1) % args.log_interval == 0:
@@ -103,17 +119,81 @@ def main():
                           f'fps: {fps:.2f} img / s')
 
             if (i + 1) == total_iters:
-                fps = (i + 1 - num_warmup) / pure_inf_time
-                print(f'Overall fps: {fps:.2f} img / s\n')
-                benchmark_dict[f'overall_fps_{time_index + 1}'] = round(fps, 2)
-                overall_fps_list.append(fps)
                 break
-    benchmark_dict['average_fps'] = round(np.mean(overall_fps_list), 2)
-    benchmark_dict['fps_variance'] = round(np.var(overall_fps_list), 4)
-    print(f'Average fps of {repeat_times} evaluations: '
-          f'{benchmark_dict["average_fps"]}')
-    print(f'The variance of {repeat_times} evaluations: '
-          f'{benchmark_dict["fps_variance"]}')
+        assert pure_inf_time > 0, \
+            f'the test set has to be larger than the {num_warmup} warmup ' \
+            'iterations'
+        fps = (i + 1 - num_warmup) / pure_inf_time
+        print(f'Overall fps: {fps:.2f} img / s\n')
+        fps_list.append(fps)
+        if metric is not None and metric.results:
+            miou = metric.compute_metrics(metric.results)['mIoU']
+    return fps_list, miou
+
+
+def main():
+    args = parse_args()
+    cfg = Config.fromfile(args.config)
+
+    init_default_scope(cfg.get('default_scope', 'mmseg'))
+
+    timestamp = time.strftime('%Y%m%d_%H%M%S', time.localtime())
+    if args.work_dir is not None:
+        mkdir_or_exist(osp.abspath(args.work_dir))
+        json_file = osp.join(args.work_dir, f'fps_{timestamp}.json')
+    else:
+        # use config filename as default work_dir if cfg.work_dir is None
+        work_dir = osp.join('./work_dirs',
+                            osp.splitext(osp.basename(args.config))[0])
+        mkdir_or_exist(osp.abspath(work_dir))
+        json_file = osp.join(work_dir, f'fps_{timestamp}.json')
+
+    repeat_times = args.repeat_times
+    # set cudnn_benchmark
+    torch.backends.cudnn.benchmark = False
+    cfg.model.pretrained = None
+
+    benchmark_dict = dict(config=args.config, unit='img / s', modes=dict())
+    cfg.test_dataloader.batch_size = 1
+    for precision in args.precisions:
+        for memory_format in args.memory_formats:
+            mode = precision if memory_format == 'contiguous' else \
+                f'{precision}-{memory_format}'
+            print(f'Mode {mode}:')
+            fps_list, miou = benchmark_mode(
+                cfg, args, precision, memory_format == 'channels_last')
+            result = dict(
+                average_fps=round(np.mean(fps_list), 2),
+                fps_variance=round(np.var(fps_list), 4),
+                mIoU=miou)
+            for time_index, fps in enumerate(fps_list):
+                result[f'overall_fps_{time_index + 1}'] = round(fps, 2)
+            print(f'Average fps of {repeat_times} evaluations: '
+                  f'{result["average_fps"]}')
+            print(f'The variance of {repeat_times} evaluations: '
+                  f'{result["fps_variance"]}')
+            benchmark_dict['modes'][mode] = result
+
+    # the first mode is the reference of the speed-up and the mIoU drift
+    modes = benchmark_dict['modes']
+    reference = next(iter(modes.values()))
+    benchmark_dict.update(
+        {k: v
+         for k, v in reference.items() if k != 'mIoU'})
+    print(f'{"mode":<26}{"fps":>10}{"speed-up":>10}{"mIoU":>10}'
+          f'{"drift":>10}')
+    for mode, result in modes.items():
+        speed_up = result['average_fps'] / reference['average_fps']
+        if result['mIoU'] is None:
+            result['mIoU_drift'] = None
+            miou, drift = 'n/a', 'n/a'
+        else:
+            result['mIoU_drift'] = round(
+                result['mIoU'] - reference['mIoU'], 2)
+            miou, drift = f'{result["mIoU"]:.2f}', \
+                f'{result["mIoU_drift"]:+.2f}'
+        print(f'{mode:<26}{result["average_fps"]:10.2f}{speed_up:10.2f}'
+              f'{miou:>10}{drift:>10}')
     dump(benchmark_dict, json_file, indent=4)
 
 
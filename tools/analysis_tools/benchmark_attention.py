@@ -0,0 +1,113 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import argparse
+import multiprocessing
+import resource
+import time
+
+import torch
+
+from mmseg.models.backbones import MixVisionTransformer
+
+# embed_dims and num_layers of the MiT variants, see configs/segformer
+MIT_ARCHS = {
+    'b0': dict(embed_dims=32, num_layers=[2, 2, 2, 2]),
+    'b1': dict(embed_dims=64, num_layers=[2, 2, 2, 2]),
+    'b2': dict(embed_dims=64, num_layers=[3, 4, 6, 3]),
+    'b3': dict(embed_dims=64, num_layers=[3, 4, 18, 3]),
+    'b4': dict(embed_dims=64, num_layers=[3, 8, 27, 3]),
+    'b5': dict(embed_dims=64, num_layers=[3, 6, 40, 3]),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Compare the peak memory and latency of the MiT '
+        'attention backends')
+    parser.add_argument(
+        '--archs',
+        nargs='+',
+        default=['b0', 'b2', 'b5'],
+        choices=list(MIT_ARCHS),
+        help='MiT variants')
+    parser.add_argument(
+        '--crops',
+        type=int,
+        nargs='+',
+        default=[256, 512, 768],
+        help='sizes of the square inputs')
+    parser.add_argument(
+        '--backends',
+        nargs='+',
+        default=['mha', 'sdpa'],
+        choices=['mha', 'sdpa'],
+        help='attention backends')
+    parser.add_argument('--batch-size', type=int, default=1, help='batch size')
+    parser.add_argument(
+        '--num-runs', type=int, default=5, help='number of timed forwards')
+    parser.add_argument(
+        '--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+    return parser.parse_args()
+
+
+def run_backbone(arch, backend, crop, batch_size, num_runs, device):
+    """Return the peak memory of one forward, in MB, and the mean latency,
+    in ms, of an inference forward of the backbone.
+
+    The peak memory is read from the CUDA allocator, or on CPU from the
+    resident set size of this process, which therefore has to be a fresh
+    process for every measurement.
+    """
+    torch.manual_seed(0)
+    model = MixVisionTransformer(
+        **MIT_ARCHS[arch], num_heads=[1, 2, 5, 8],
+        attn_backend=backend).to(device).eval()
+    inputs = torch.randn(batch_size, 3, crop, crop, device=device)
+
+    with torch.no_grad():
+        if device.startswith('cuda'):
+            torch.cuda.synchronize()
+            torch.cuda.reset_peak_memory_stats()
+            base = torch.cuda.memory_allocated()
+            model(inputs)
+            peak = (torch.cuda.max_memory_allocated() - base) / 2**20
+        else:
+            base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            model(inputs)
+            # ru_maxrss is in kB on Linux
+            peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss -
+                    base) / 2**10
+
+        times = []
+        for _ in range(num_runs):
+            if device.startswith('cuda'):
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+            model(inputs)
+            if device.startswith('cuda'):
+                torch.cuda.synchronize()
+            times.append((time.perf_counter() - start) * 1000)
+    return peak, sum(times) / len(times)
+
+
+def main():
+    args = parse_args()
+    # every measurement in its own process, for the CPU peak memory
+    ctx = multiprocessing.get_context('spawn')
+    print(f'device {args.device}, batch size {args.batch_size}, '
+          f'{args.num_runs} runs')
+    print(f'{"arch":<6}{"crop":>6}{"backend":>9}{"peak MB":>10}'
+          f'{"ms":>10}')
+    for arch in args.archs:
+        for crop in args.crops:
+            for backend in args.backends:
+                with ctx.Pool(1) as pool:
+                    peak, latency = pool.apply(
+                        run_backbone,
+                        (arch, backend, crop, args.batch_size, args.num_runs,
+                         args.device))
+                print(f'{arch:<6}{crop:>6}{backend:>9}{peak:10.1f}'
+                      f'{latency:10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Benchmark the GrabCut refinement modes of ``tools/utils_json_to_json.py``.
+
+Every image is refined with the full-frame path and with the ROI/downscaled
+path. The report gives the mean time per image of each mode, the speed-up,
+and the IoU of the ROI result against the full-frame result, i.e. the
+accuracy lost by the faster mode. Masks are read from ``--mask_dir``: point
+it to predicted masks, or to the ground truth masks of the POG background set
+to use them as stand-ins.
+
+Example:
+    python tools/analysis_tools/benchmark_grabcut.py \
+        --img_dir /data/pog_mango_bg/images/val \
+        --mask_dir /data/pog_mango_bg/masks/val \
+        --roi_margin 0.1 --scale 0.5 --num_images 200
+"""
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+from tqdm import tqdm
+
+from tools.utils_json_to_json import grabcut_refine
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark GrabCut refinement modes.')
+    parser.add_argument('--img_dir', required=True, help='Image folder')
+    parser.add_argument('--mask_dir', required=True, help='Binary mask folder')
+    parser.add_argument('--img_suffix', default='.jpg', help='Image suffix')
+    parser.add_argument('--mask_suffix', default='.png', help='Mask suffix')
+    parser.add_argument(
+        '--roi_margin',
+        type=float,
+        default=0.1,
+        help='Bounding box padding, as a fraction of the box size')
+    parser.add_argument(
+        '--scale', type=float, default=1.0, help='Resize factor of the ROI')
+    parser.add_argument(
+        '--grabcut_iters', type=int, default=5, help='Iterations')
+    parser.add_argument(
+        '--num_images', type=int, default=100, help='Number of images to use')
+    parser.add_argument(
+        '--out', default=None, help='Optional JSON report path')
+    return parser.parse_args()
+
+
+def mask_iou(mask_a: np.ndarray, mask_b: np.ndarray) -> float:
+    """Compute the IoU of two binary masks. Two empty masks have an IoU of
+    1."""
+    union = np.count_nonzero(mask_a | mask_b)
+    if union == 0:
+        return 1.0
+    return np.count_nonzero(mask_a & mask_b) / union
+
+
+def main(args):
+    names = sorted(f[:-len(args.img_suffix)] for f in os.listdir(args.img_dir)
+                   if f.endswith(args.img_suffix))[:args.num_images]
+    cv2.setNumThreads(1)
+
+    full_times, roi_times, ious = [], [], []
+    for name in tqdm(names, desc='Benchmarking GrabCut'):
+        image = cv2.imread(os.path.join(args.img_dir, name + args.img_suffix))
+        mask = cv2.imread(
+            os.path.join(args.mask_dir, name + args.mask_suffix),
+            cv2.IMREAD_GRAYSCALE)
+        if image is None or mask is None:
+            continue
+        mask = (mask > 0).astype(np.uint8)
+
+        start = time.perf_counter()
+        full = grabcut_refine(image, mask, grabcut_iters=args.grabcut_iters)
+        full_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        roi = grabcut_refine(
+            image,
+            mask,
+            grabcut_iters=args.grabcut_iters,
+            roi_margin=args.roi_margin,
+            scale=args.scale)
+        roi_times.append(time.perf_counter() - start)
+        ious.append(mask_iou(full.astype(bool), roi.astype(bool)))
+
+    if not ious:
+        raise RuntimeError('No image/mask pair found.')
+    report = dict(
+        num_images=len(ious),
+        roi_margin=args.roi_margin,
+        scale=args.scale,
+        grabcut_iters=args.grabcut_iters,
+        full_ms_per_img=1000 * float(np.mean(full_times)),
+        roi_ms_per_img=1000 * float(np.mean(roi_times)),
+        speedup=float(np.sum(full_times) / np.sum(roi_times)),
+        mean_iou_vs_full=float(np.mean(ious)),
+        min_iou_vs_full=float(np.min(ious)))
+    for key, value in report.items():
+        if isinstance(value, float):
+            value = f'{value:.4f}'
+        print(f'{key}: {value}')
+    if args.out is not None:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main(parse_args())
@@ -0,0 +1,65 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import argparse
+import time
+
+import numpy as np
+
+from mmseg.apis import inference_model, init_model
+from mmseg.apis.utils import _preprare_data
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Measure the per-call Python overhead of inference_model')
+    parser.add_argument('config', help='test config file path')
+    parser.add_argument('--checkpoint', default=None, help='checkpoint file')
+    parser.add_argument('--device', default='cpu', help='device used')
+    parser.add_argument(
+        '--img-size', type=int, default=64, help='side of the test images')
+    parser.add_argument(
+        '--num-calls', type=int, default=200, help='number of timed calls')
+    args = parser.parse_args()
+    return args
+
+
+def time_calls(func, num_calls):
+    """Return the mean duration of ``func()`` in milliseconds."""
+    func()  # warm up
+    start = time.perf_counter()
+    for _ in range(num_calls):
+        func()
+    return (time.perf_counter() - start) / num_calls * 1000
+
+
+def main():
+    args = parse_args()
+    model = init_model(args.config, args.checkpoint, device=args.device)
+    img = np.random.randint(
+        0, 256, (args.img_size, args.img_size, 3), dtype=np.uint8)
+
+    def uncached_prepare():
+        # the behaviour before the cache: build the pipeline on every call
+        model._test_pipeline_cache = None
+        _preprare_data(img, model)
+
+    def cached_prepare():
+        _preprare_data(img, model)
+
+    def uncached_inference():
+        model._test_pipeline_cache = None
+        inference_model(model, img)
+
+    def cached_inference():
+        inference_model(model, img)
+
+    print(f'{args.img_size}x{args.img_size} image, '
+          f'{args.num_calls} calls, ms per call:')
+    for name, func in [('prepare data, uncached', uncached_prepare),
+                       ('prepare data, cached', cached_prepare),
+                       ('inference_model, uncached', uncached_inference),
+                       ('inference_model, cached', cached_inference)]:
+        print(f'{name:<28}{time_calls(func, args.num_calls):8.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import argparse
+import time
+
+import numpy as np
+from numpy import random
+
+from mmseg.datasets.transforms import PhotoMetricDistortion
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Compare the sequential and fused PhotoMetricDistortion')
+    parser.add_argument(
+        '--shapes',
+        type=int,
+        nargs='+',
+        default=[512, 512, 1792, 2176],
+        help='(h, w) pairs of the test images')
+    parser.add_argument(
+        '--num-calls', type=int, default=50, help='number of timed calls')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args()
+    assert len(args.shapes) % 2 == 0, '--shapes takes (h, w) pairs'
+    return args
+
+
+def time_calls(func, img, num_calls, seed):
+    """Return the mean duration of ``func(img)`` in milliseconds, with the
+    same random draws for every function."""
+    func(img.copy())  # warm up
+    random.seed(seed)
+    start = time.perf_counter()
+    for _ in range(num_calls):
+        func(img)
+    return (time.perf_counter() - start) / num_calls * 1000
+
+
+def main():
+    args = parse_args()
+    transform = PhotoMetricDistortion()
+
+    def sequential(img):
+        # one uint8 round trip per distortion, as before the fused version
+        return transform._distort_sequential(img, transform._get_params())
+
+    def fused(img):
+        return transform.transform(dict(img=img))['img']
+
+    print(f'{args.num_calls} calls, ms per image:')
+    for h, w in zip(args.shapes[::2], args.shapes[1::2]):
+        img = np.random.RandomState(args.seed).randint(
+            0, 256, (h, w, 3), dtype=np.uint8)
+        t_seq = time_calls(sequential, img, args.num_calls, args.seed)
+        t_fused = time_calls(fused, img, args.num_calls, args.seed)
+        print(f'{h}x{w:<10}sequential {t_seq:8.3f}  fused {t_fused:8.3f}  '
+              f'speed-up {t_seq / t_fused:5.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,11 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import argparse
+import json
 import os
+import os.path as osp
+from concurrent.futures import ProcessPoolExecutor
 
+import cv2
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.ticker import MultipleLocator
@@ -10,7 +14,7 @@ from mmengine.registry import init_default_scope
 from mmengine.utils import mkdir_or_exist, progressbar
 from PIL import Image
 
-from mmseg.registry import DATASETS
+from mmseg.registry import DATASETS, TRANSFORMS
 
 init_default_scope('mmseg')
 
@@ -20,7 +24,10 @@ def parse_args():
         description='Generate confusion matrix from segmentation results')
     parser.add_argument('config', help='test config file path')
     parser.add_argument(
-        'prediction_path', help='prediction path where test folder result')
+        'prediction_path',
+        help='folder of the predicted PNG files, in the order of the '
+        'dataset when sorted, or a .json/.jsonl results file of the '
+        'inference tools')
     parser.add_argument(
         'save_dir', help='directory where confusion matrix will be saved')
     parser.add_argument(
@@ -33,6 +40,18 @@ def parse_args():
         '--title',
         default='Normalized Confusion Matrix',
         help='title of the matrix color map')
+    parser.add_argument(
+        '--nproc',
+        type=int,
+        default=4,
+        help='number of processes reading the annotations and predictions '
+        'without the whole test pipeline')
+    parser.add_argument(
+        '--annotations-only',
+        action='store_true',
+        help='only load the annotations, with the LoadAnnotations step of '
+        'the test pipeline, and match the PNG files with the dataset images '
+        'by name. Always the case for a results file')
     parser.add_argument(
         '--cfg-options',
         nargs='+',
@@ -77,6 +96,182 @@ def calculate_confusion_matrix(dataset, results):
     return confusion_matrix
 
 
+def image_confusion_matrix(gt_segm, res_segm, num_classes, ignore_index):
+    """Calculate the confusion matrix of one image with a single
+    ``np.bincount``.
+
+    Args:
+        gt_segm (ndarray): The (H, W) ground truth label map.
+        res_segm (ndarray): The (H, W) predicted label map.
+        num_classes (int): Number of classes.
+        ignore_index (int): Ground truth label ignored in the matrix.
+
+    Returns:
+        ndarray: The int64 (num_classes, num_classes) matrix, rows being the
+            ground truth classes.
+    """
+    if gt_segm.shape != res_segm.shape:
+        raise ValueError(f'the prediction shape {res_segm.shape} differs '
+                         f'from the ground truth shape {gt_segm.shape}')
+    gt_segm, res_segm = gt_segm.ravel(), res_segm.ravel()
+    valid = (gt_segm != ignore_index) & (gt_segm < num_classes) & (
+        res_segm >= 0) & (res_segm < num_classes)
+    inds = num_classes * gt_segm[valid].astype(np.int64) + res_segm[valid]
+    return np.bincount(
+        inds, minlength=num_classes**2).reshape(num_classes, num_classes)
+
+
+def load_predictions(prediction_path):
+    """Index the predictions by image name, without extension.
+
+    Args:
+        prediction_path (str): A folder of PNG label maps named after the
+            images, or a ``.json``/``.jsonl`` results file of
+            ``tools/utils_json_to_json.py``, which must then be importable,
+            e.g. with the repo root in ``PYTHONPATH``.
+
+    Returns:
+        dict: The path of the PNG file, or the list of instances, of each
+            image.
+    """
+    if prediction_path.endswith(('.json', '.jsonl')):
+        from tools.utils_json_to_json import read_results
+        try:
+            with open(prediction_path) as f:
+                results = json.load(f)
+        except json.JSONDecodeError:
+            # a .jsonl file, or a .json file still being streamed
+            results = read_results(prediction_path)
+        predictions = results['predictions']
+        return {
+            osp.splitext(osp.basename(name))[0]: instances or []
+            for name, instances in predictions.items()
+        }
+    return {
+        osp.splitext(name)[0]: osp.join(prediction_path, name)
+        for name in os.listdir(prediction_path) if name.endswith('.png')
+    }
+
+
+def instances_to_label_map(instances, shape):
+    """Draw the polygons of a results file back into a label map.
+
+    Pixels outside of every instance get label 0, the background, which the
+    results files leave out. Larger instances are drawn first, so nested
+    ones stay visible, and the holes of an instance are filled.
+
+    Args:
+        instances (list[dict]): The instances of an image, with ``mask``
+            polygons and ``category:_id`` labels.
+        shape (tuple): The (H, W) shape of the label map.
+
+    Returns:
+        ndarray: The int32 label map.
+    """
+    label_map = np.zeros(shape, dtype=np.int32)
+    for instance in sorted(instances, key=lambda x: -x.get('area', 0)):
+        polygon = np.asarray(instance['mask'], dtype=np.int32)
+        cv2.fillPoly(label_map, [polygon.reshape(-1, 1, 2)],
+                     int(instance['category:_id']))
+    return label_map
+
+
+_load_annotations = None
+
+
+def _init_worker(load_cfg):
+    global _load_annotations
+    init_default_scope('mmseg')
+    _load_annotations = TRANSFORMS.build(load_cfg)
+
+
+def _chunk_confusion_matrix(tasks, num_classes, ignore_index, pred_offset):
+    """Sum the confusion matrices of ``(data_info, prediction)`` pairs."""
+    confusion_matrix = np.zeros((num_classes, num_classes), dtype=np.int64)
+    for data_info, prediction in tasks:
+        gt_segm = _load_annotations(dict(data_info))['gt_seg_map']
+        if isinstance(prediction, str):
+            res_segm = np.asarray(Image.open(prediction))
+            if pred_offset:
+                res_segm = res_segm.astype(np.int64) - pred_offset
+        else:
+            res_segm = instances_to_label_map(prediction, gt_segm.shape)
+        confusion_matrix += image_confusion_matrix(gt_segm, res_segm,
+                                                   num_classes, ignore_index)
+    return confusion_matrix
+
+
+def calculate_confusion_matrix_from_annotations(dataset,
+                                                predictions,
+                                                load_cfg=None,
+                                                nproc=4):
+    """Calculate the confusion matrix loading only the annotations.
+
+    The images are neither decoded nor transformed. The ground truth goes
+    through ``LoadAnnotations`` alone, and the work is split in chunks over
+    a process pool whose partial matrices are summed.
+
+    Args:
+        dataset (Dataset): Test or val dataset.
+        predictions (dict): The predictions of each image name, see
+            :func:`load_predictions`. Images without a prediction are
+            skipped.
+        load_cfg (dict, optional): Config of the annotation loading
+            transform. Defaults to ``dict(type='LoadAnnotations')``.
+        nproc (int): Number of processes. Defaults to 4.
+
+    Returns:
+        ndarray: The (num_classes, num_classes) confusion matrix.
+    """
+    n = len(dataset.metainfo['classes'])
+    if load_cfg is None:
+        load_cfg = dict(type='LoadAnnotations')
+    # IoUMetric saves the predictions of reduce_zero_label datasets shifted
+    # by one, to match the original annotations
+    pred_offset = 1 if dataset.reduce_zero_label else 0
+
+    tasks, num_missing = [], 0
+    for idx in range(len(dataset)):
+        data_info = dataset.get_data_info(idx)
+        name = osp.splitext(osp.basename(data_info['img_path']))[0]
+        if name not in predictions:
+            num_missing += 1
+            continue
+        data_info['seg_fields'] = []
+        tasks.append((data_info, predictions[name]))
+    if num_missing:
+        print(f'{num_missing} images of the dataset have no prediction and '
+              'are skipped')
+
+    # a few chunks per process, so that one slow chunk does not stall the
+    # pool and only one partial matrix per chunk is sent back
+    chunk_size = max(1, len(tasks) // (4 * max(nproc, 1)))
+    chunks = [
+        tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)
+    ]
+    args = (n, dataset.ignore_index, pred_offset)
+    confusion_matrix = np.zeros((n, n), dtype=np.int64)
+    prog_bar = progressbar.ProgressBar(len(tasks))
+    if nproc <= 1:
+        _init_worker(load_cfg)
+        for chunk in chunks:
+            confusion_matrix += _chunk_confusion_matrix(chunk, *args)
+            prog_bar.update(len(chunk))
+    else:
+        with ProcessPoolExecutor(
+                max_workers=nproc,
+                initializer=_init_worker,
+                initargs=(load_cfg, )) as pool:
+            futures = [
+                pool.submit(_chunk_confusion_matrix, chunk, *args)
+                for chunk in chunks
+            ]
+            for chunk, future in zip(chunks, futures):
+                confusion_matrix += future.result()
+                prog_bar.update(len(chunk))
+    return confusion_matrix
+
+
 def plot_confusion_matrix(confusion_matrix,
                           labels,
                           save_dir=None,
@@ -169,24 +364,37 @@ def main():
     if args.cfg_options is not None:
         cfg.merge_from_dict(args.cfg_options)
 
-    results = []
-    for img in sorted(os.listdir(args.prediction_path)):
-        img = os.path.join(args.prediction_path, img)
-        image = Image.open(img)
-        image = np.copy(image)
-        results.append(image)
+    annotations_only = args.annotations_only or \
+        args.prediction_path.endswith(('.json', '.jsonl'))
+    if not annotations_only:
+        results = []
+        for img in sorted(os.listdir(args.prediction_path)):
+            img = os.path.join(args.prediction_path, img)
+            image = Image.open(img)
+            image = np.copy(image)
+            results.append(image)
 
-    assert isinstance(results, list)
-    if isinstance(results[0], np.ndarray):
-        pass
-    else:
-        raise TypeError('invalid type of prediction results')
+        assert isinstance(results, list)
+        if isinstance(results[0], np.ndarray):
+            pass
+        else:
+            raise TypeError('invalid type of prediction results')
 
-    dataset = DATASETS.build(cfg.test_dataloader.dataset)
-    confusion_matrix = calculate_confusion_matrix(dataset, results)
+        dataset = DATASETS.build(cfg.test_dataloader.dataset)
+        confusion_matrix = calculate_confusion_matrix(dataset, results)
+    else:
+        dataset_cfg = cfg.test_dataloader.dataset
+        load_cfg = next((transform for transform in dataset_cfg.pipeline
+                         if transform['type'] == 'LoadAnnotations'), None)
+        # the pipeline is not used, only the data list
+        dataset_cfg.pipeline = []
+        dataset = DATASETS.build(dataset_cfg)
+        predictions = load_predictions(args.prediction_path)
+        confusion_matrix = calculate_confusion_matrix_from_annotations(
+            dataset, predictions, load_cfg=load_cfg, nproc=args.nproc)
     plot_confusion_matrix(
         confusion_matrix,
-        dataset.METAINFO['classes'],
+        dataset.metainfo['classes'],
         save_dir=args.save_dir,
         show=args.show,
         title=args.title,
@@ -0,0 +1,19 @@
+from argparse import ArgumentParser
+
+from tools.utils_json_to_json import convert_results
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description="Convert streamed results (.jsonl or unclosed .json) to the "
+        '{"id_to_cat_mapping", "predictions"} JSON layout.'
+    )
+    parser.add_argument("-inp", "--input", required=True, help="Results file")
+    parser.add_argument("-out", "--output", required=True, help="Output JSON file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    convert_results(args.input, args.output)
+    print(f"Results saved to {args.output}")
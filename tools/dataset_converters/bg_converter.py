@@ -1,8 +1,16 @@
 import argparse
 import os
+from functools import partial
+
 import numpy as np
 from PIL import Image
-from tqdm import tqdm
+
+from mmseg.utils import build_label_lut
+from tools.dataset_converters.parallel_files import CHECKPOINT_NAME, process_files
+
+# POG part ids to background/garment: 31 is background, 0 stays background and
+# every other id is garment
+BG_LABEL_MAP = {i: 0 if i == 31 else 1 for i in range(1, 256)}
 
 
 def parse_arguments():
@@ -13,35 +21,61 @@ def parse_arguments():
     ap.add_argument(
         "-t", "--target", required=True, help="Path to the target directory."
     )
+    ap.add_argument("--nproc", type=int, default=8, help="Number of processes.")
+    ap.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the masks converted by a previous run of the same command.",
+    )
     return vars(ap.parse_args())
 
 
-def process_masks(input_dir, output_dir):
+def convert_mask(src, dst, lut):
+    """
+    Remap the labels of a mask through ``lut`` and save it as a uint8 PNG.
+
+    The mask is written to a temporary file first and renamed, so ``dst`` is never
+    left half written and a hard link at ``dst`` is replaced, not modified.
+    """
+    mask = np.asarray(Image.open(src))
+    if mask.dtype != np.uint8:
+        mask = mask.astype(np.uint8)
+    tmp_path = dst + ".tmp.png"
+    Image.fromarray(lut[mask]).save(tmp_path)
+    os.replace(tmp_path, dst)
+
+
+def process_masks(input_dir, output_dir, nproc=8, resume=False):
     """
     Process .png mask files in the input directory and map pixel values:
-    - Map all non-zero values to 1, except for 30, which is mapped to 0.
+    - Map all non-zero values to 1, except for 31, which is mapped to 0.
 
     Parameters:
     - input_dir: str, path to the input directory containing .png masks.
     - output_dir: str, path to the output directory where processed masks will be saved.
+    - nproc: int, number of processes.
+    - resume: bool, skip the masks converted by a previous interrupted run.
     """
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    for file_name in tqdm(os.listdir(input_dir)):
-        if file_name.endswith(".png"):
-            # Load the mask image
-            mask_path = os.path.join(input_dir, file_name)
-            mask = np.array(Image.open(mask_path))
+    os.makedirs(output_dir, exist_ok=True)
+    lut = build_label_lut(BG_LABEL_MAP)
 
-            # Apply the transformation
-            processed_mask = np.where(mask == 31, 0, np.where(mask > 0, 1, 0))
-
-            # Save the processed mask
-            output_path = os.path.join(output_dir, file_name)
-            Image.fromarray(processed_mask.astype(np.uint8)).save(output_path)
+    tasks = [
+        (os.path.join(input_dir, file_name), os.path.join(output_dir, file_name))
+        for file_name in sorted(os.listdir(input_dir))
+        if file_name.endswith(".png")
+    ]
+    process_files(
+        tasks,
+        partial(convert_mask, lut=lut),
+        checkpoint=os.path.join(output_dir, CHECKPOINT_NAME),
+        resume=resume,
+        nproc=nproc,
+        desc="Converting masks",
+    )
 
 
 if __name__ == "__main__":
     args = parse_arguments()
-    process_masks(args["source"], args["target"])
+    process_masks(
+        args["source"], args["target"], nproc=args["nproc"], resume=args["resume"]
+    )
@@ -1,7 +1,12 @@
 import argparse
 import os
-import shutil
-from tqdm import tqdm
+from functools import partial
+
+from tools.dataset_converters.parallel_files import (
+    CHECKPOINT_NAME,
+    link_file,
+    process_files,
+)
 
 
 def parse_arguments():
@@ -12,37 +17,58 @@ def parse_arguments():
     ap.add_argument(
         "-t", "--target", required=True, help="Path to the target directory."
     )
+    ap.add_argument(
+        "--link",
+        nargs="?",
+        const="hardlink",
+        choices=["hardlink", "symlink"],
+        help="Link the files into the target directory instead of copying them. "
+        "Hard links, the default of the option, fall back to copies across file "
+        "systems.",
+    )
+    ap.add_argument("--nproc", type=int, default=8, help="Number of processes.")
+    ap.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the files handled by a previous run of the same command.",
+    )
     return vars(ap.parse_args())
 
 
-def copy_and_rename_files(source_dir, target_dir):
+def copy_and_rename_files(
+    source_dir, target_dir, mode="copy", nproc=8, resume=False
+):
     # Ensure the target directory exists
     os.makedirs(target_dir, exist_ok=True)
 
-    # Collect all files with the specified suffix
-    files_to_process = []
+    # Collect all files with the specified suffix, renamed by replacing the suffix
+    tasks = []
     for root, _, files in os.walk(source_dir):
         for file in files:
             if file.endswith("_gtFine_labelIds.png"):
-                files_to_process.append((root, file))
+                new_name = file.replace("_gtFine_labelIds.png", ".png")
+                tasks.append(
+                    (os.path.join(root, file), os.path.join(target_dir, new_name))
+                )
 
-    # Iterate through files with progress bar
-    for root, file in tqdm(files_to_process, desc="Processing files", unit="file"):
-        # Construct the full source file path
-        source_path = os.path.join(root, file)
-
-        # Create the new file name by replacing the suffix
-        new_name = file.replace("_gtFine_labelIds.png", ".png")
-
-        # Construct the target file path
-        target_path = os.path.join(target_dir, new_name)
-
-        # Copy the file to the target directory with the new name
-        shutil.copy2(source_path, target_path)
+    process_files(
+        sorted(tasks),
+        partial(link_file, mode=mode),
+        checkpoint=os.path.join(target_dir, CHECKPOINT_NAME),
+        resume=resume,
+        nproc=nproc,
+        desc="Processing files",
+    )
 
     print("Files have been copied and renamed.")
 
 
 if __name__ == "__main__":
     args = parse_arguments()
-    copy_and_rename_files(args["source"], args["target"])
+    copy_and_rename_files(
+        args["source"],
+        args["target"],
+        mode=args["link"] or "copy",
+        nproc=args["nproc"],
+        resume=args["resume"],
+    )
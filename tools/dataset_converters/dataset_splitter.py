@@ -1,9 +1,14 @@
 import os
-import shutil
+from functools import partial
 from sklearn.model_selection import train_test_split
-from tqdm import tqdm
 import argparse
 
+from tools.dataset_converters.parallel_files import (
+    CHECKPOINT_NAME,
+    link_file,
+    process_files,
+)
+
 
 def arg_parser():
     parser = argparse.ArgumentParser(
@@ -40,6 +45,22 @@ def arg_parser():
         default=42,
         help="Random seed for reproducibility. Default: 42",
     )
+    parser.add_argument(
+        "--link",
+        nargs="?",
+        const="hardlink",
+        choices=["hardlink", "symlink"],
+        help="Link the files into the splits instead of copying them. Hard links, "
+        "the default of the option, fall back to copies across file systems.",
+    )
+    parser.add_argument(
+        "--nproc", type=int, default=8, help="Number of processes. Default: 8"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the files placed by a previous run of the same command.",
+    )
     return parser
 
 
@@ -50,6 +71,9 @@ def train_test_val_split(
     test_size=0.2,
     val_size=0.2,
     random_seed=42,
+    mode="copy",
+    nproc=8,
+    resume=False,
 ):
     """
     Perform a train-test-validation split for paired image and annotation files.
@@ -59,8 +83,11 @@ def train_test_val_split(
     - annotation_dir: Directory containing `.png` files.
     - output_dir: Base directory for train/val/test splits.
     - test_size: Proportion of the dataset to include in the test split.
-    - val_size: Proportion of the remaining data (after test split) to use for validation.
+    - mode: "copy", "hardlink" or "symlink", how the files are placed in the splits.
     - random_seed: Seed for reproducibility.
+    - mode: "copy", "hardlink" or "symlink", how the files are placed in the splits.
+    - nproc: Number of processes.
+    - resume: Skip the files placed by a previous interrupted run.
     """
     # Define output directories
     train_image_dir = os.path.join(output_dir, "images/train")
@@ -89,8 +116,8 @@ def train_test_val_split(
         f.split(".")[0]: f for f in os.listdir(annotation_dir) if f.endswith(".png")
     }
 
-    # Match files with annotations
-    common_keys = set(image_files.keys()) & set(annotation_files.keys())
+    # Match files with annotations, sorted so that the split only depends on the seed
+    common_keys = sorted(set(image_files.keys()) & set(annotation_files.keys()))
 
     # Create full paths for matched files
     matched_image_paths = [
@@ -118,20 +145,28 @@ def train_test_val_split(
         random_state=random_seed,
     )
 
-    # Define helper function to copy files
-    def copy_files(file_list, target_dir):
-        for file_path in tqdm(file_list, desc=f"Copying files to {target_dir}"):
-            shutil.copy(
-                file_path, os.path.join(target_dir, os.path.basename(file_path))
-            )
-
-    # Copy files to respective directories
-    copy_files(train_images, train_image_dir)
-    copy_files(val_images, val_image_dir)
-    copy_files(test_images, test_image_dir)
-    copy_files(train_annotations, train_annotation_dir)
-    copy_files(val_annotations, val_annotation_dir)
-    copy_files(test_annotations, test_annotation_dir)
+    # Place the files in their split directories
+    tasks = []
+    for file_list, target_dir in [
+        (train_images, train_image_dir),
+        (val_images, val_image_dir),
+        (test_images, test_image_dir),
+        (train_annotations, train_annotation_dir),
+        (val_annotations, val_annotation_dir),
+        (test_annotations, test_annotation_dir),
+    ]:
+        tasks.extend(
+            (file_path, os.path.join(target_dir, os.path.basename(file_path)))
+            for file_path in file_list
+        )
+    process_files(
+        tasks,
+        partial(link_file, mode=mode),
+        checkpoint=os.path.join(output_dir, CHECKPOINT_NAME),
+        resume=resume,
+        nproc=nproc,
+        desc=f"Placing files ({mode})",
+    )
 
     # Print summary
     print(f"Train: {len(train_images)} files")
@@ -151,4 +186,7 @@ if __name__ == "__main__":
         test_size=args.test_size,
         val_size=args.val_size,
         random_seed=args.random_seed,
+        mode=args.link or "copy",
+        nproc=args.nproc,
+        resume=args.resume,
     )
@@ -0,0 +1,143 @@
+"""
+Pack an image/mask folder pair into memory-mapped shards for ``ShardedSegDataset``.
+
+Images are decoded once here, optionally resized to a fixed scale, and stored as raw
+uint8 arrays, so the training pipeline maps them instead of decoding a JPEG and a PNG
+per sample. See ``ShardWriter`` in ``mmseg/datasets/sharded.py`` for the layout.
+
+Example:
+    python tools/dataset_converters/pack_shards.py \
+        --img_dir /data/pog_mango_bg/images/train \
+        --ann_dir /data/pog_mango_bg/masks/train \
+        --out_dir /data/pog_mango_bg/shards/train \
+        --scale 1080 1080
+"""
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import mmcv
+import numpy as np
+from tqdm import tqdm
+
+from mmseg.datasets import ShardWriter
+
+
+def parse_arguments():
+    ap = argparse.ArgumentParser(description="Pack a dataset split into shards.")
+    ap.add_argument("--img_dir", required=True, help="Path to the image directory.")
+    ap.add_argument(
+        "--ann_dir", default=None, help="Path to the mask directory (optional)."
+    )
+    ap.add_argument("--out_dir", required=True, help="Path to the shard directory.")
+    ap.add_argument("--img_suffix", default=".jpg", help="Image suffix.")
+    ap.add_argument("--seg_map_suffix", default=".png", help="Mask suffix.")
+    ap.add_argument(
+        "--scale",
+        type=int,
+        nargs=2,
+        default=None,
+        help="Resize every sample to fit this (w, h) scale, keeping the aspect "
+        "ratio. Samples are stored at their original size by default.",
+    )
+    ap.add_argument(
+        "--shard_size", type=int, default=1024, help="Shard size in MiB."
+    )
+    ap.add_argument("--nproc", type=int, default=8, help="Decoding threads.")
+    return ap.parse_args()
+
+
+def load_sample(img_path, seg_map_path=None, scale=None):
+    """
+    Decode an image and its mask the way the file loading transforms do.
+
+    :param img_path: str
+        Path to the image.
+    :param seg_map_path: str or None
+        Path to the mask.
+    :param scale: tuple or None
+        ``(w, h)`` scale to resize to, keeping the aspect ratio.
+    :return: tuple
+        The (H, W, 3) BGR image and the (H, W) mask or None.
+    """
+    img = mmcv.imread(img_path, flag="color")
+    seg_map = None
+    if seg_map_path is not None:
+        seg_map = (
+            mmcv.imread(seg_map_path, flag="unchanged", backend="pillow")
+            .squeeze()
+            .astype(np.uint8)
+        )
+    if scale is not None:
+        img = mmcv.imrescale(img, scale, interpolation="bilinear")
+        if seg_map is not None:
+            seg_map = mmcv.imresize(
+                seg_map, img.shape[1::-1], interpolation="nearest"
+            )
+    return img, seg_map
+
+
+def pack_shards(
+    img_dir,
+    out_dir,
+    ann_dir=None,
+    img_suffix=".jpg",
+    seg_map_suffix=".png",
+    scale=None,
+    shard_size=1024,
+    nproc=8,
+):
+    """
+    Pack every image of ``img_dir``, and its mask in ``ann_dir``, into shards.
+
+    Parameters:
+    - img_dir: str, folder of the images.
+    - out_dir: str, folder of the shards and of ``index.json``.
+    - ann_dir: str or None, folder of the masks.
+    - img_suffix / seg_map_suffix: str, file suffixes.
+    - scale: tuple or None, ``(w, h)`` scale to resize to.
+    - shard_size: int, shard size in MiB.
+    - nproc: int, number of decoding threads.
+    """
+    names = sorted(
+        f[: -len(img_suffix)] for f in os.listdir(img_dir) if f.endswith(img_suffix)
+    )
+
+    def load(name):
+        img_path = os.path.join(img_dir, name + img_suffix)
+        seg_map_path = None
+        if ann_dir is not None:
+            seg_map_path = os.path.join(ann_dir, name + seg_map_suffix)
+        return img_path, load_sample(img_path, seg_map_path, scale)
+
+    chunk = 4 * nproc
+    with ShardWriter(out_dir, shard_size=shard_size << 20, scale=scale) as writer:
+        with ThreadPoolExecutor(max_workers=nproc) as pool:
+            with tqdm(total=len(names)) as bar:
+                # decode by chunks, so at most ``chunk`` samples wait in
+                # memory, and write in order, so an epoch reads the shards
+                # sequentially
+                for start in range(0, len(names), chunk):
+                    chunk_names = names[start : start + chunk]
+                    for name, (img_path, (img, seg_map)) in zip(
+                        chunk_names, pool.map(load, chunk_names)
+                    ):
+                        writer.write(
+                            name, img, seg_map, img_path=os.path.abspath(img_path)
+                        )
+                    bar.update(len(chunk_names))
+    print(f"Packed {len(names)} samples into {len(writer.shards)} shards.")
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    pack_shards(
+        args.img_dir,
+        args.out_dir,
+        ann_dir=args.ann_dir,
+        img_suffix=args.img_suffix,
+        seg_map_suffix=args.seg_map_suffix,
+        scale=args.scale,
+        shard_size=args.shard_size,
+        nproc=args.nproc,
+    )
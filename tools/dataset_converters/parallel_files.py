@@ -0,0 +1,126 @@
+"""
+Shared core of the dataset converters: run a per-file function over a process pool,
+recording the finished files in a checkpoint so that an interrupted run can resume.
+"""
+import errno
+import os
+import shutil
+from multiprocessing import Pool
+
+from tqdm import tqdm
+
+CHECKPOINT_NAME = ".converted.txt"
+
+
+def read_checkpoint(checkpoint):
+    """
+    Read the output paths recorded in a checkpoint file.
+
+    A last line without a newline was being written when the run stopped and is
+    ignored.
+
+    :param checkpoint: str
+        Path to the checkpoint file.
+    :return: set
+        The output paths of the finished files, empty if the file is missing.
+    """
+    if not os.path.isfile(checkpoint):
+        return set()
+    with open(checkpoint, encoding="utf-8") as f:
+        return {line[:-1] for line in f if line.endswith("\n")}
+
+
+def link_file(src, dst, mode="copy"):
+    """
+    Make ``dst`` a copy of ``src``, or a link to it.
+
+    :param src: str
+        Path to the source file.
+    :param dst: str
+        Path to the destination file, replaced if it exists.
+    :param mode: str
+        ``"copy"``, ``"hardlink"`` or ``"symlink"``. Hard links fall back to a copy
+        across file systems.
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if mode == "hardlink":
+        try:
+            os.link(src, dst)
+            return
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+    elif mode == "symlink":
+        os.symlink(os.path.abspath(src), dst)
+        return
+    elif mode != "copy":
+        raise ValueError(f"Unknown link mode {mode}")
+    shutil.copy2(src, dst)
+
+
+def _run_task(fn_task):
+    fn, (src, dst) = fn_task
+    fn(src, dst)
+    return dst
+
+
+def process_files(
+    tasks, fn, checkpoint=None, resume=False, nproc=8, chunksize=64, desc=None
+):
+    """
+    Run ``fn(src, dst)`` for every ``(src, dst)`` pair of ``tasks``.
+
+    The pairs are distributed over ``nproc`` processes. Each finished ``dst`` is
+    appended to ``checkpoint``; with ``resume`` the pairs whose ``dst`` is already
+    recorded there are skipped, so a killed run restarts where it stopped. ``fn``
+    should write ``dst`` atomically, or at least overwrite a partial file.
+
+    :param tasks: list
+        ``(src, dst)`` path pairs.
+    :param fn: callable
+        A picklable function, e.g. a module-level function or a ``functools.partial``
+        of one.
+    :param checkpoint: str or None
+        Path to the checkpoint file. None disables the checkpoint.
+    :param resume: bool
+        Skip the pairs recorded in an existing checkpoint instead of starting over.
+    :param nproc: int
+        Number of processes, 1 runs in the current process.
+    :param chunksize: int
+        Number of pairs sent to a process at once.
+    :param desc: str or None
+        Progress bar description.
+    :return: int
+        The number of pairs processed by this run.
+    """
+    done = set()
+    if checkpoint is not None and resume:
+        done = read_checkpoint(checkpoint)
+    todo = [(fn, task) for task in tasks if task[1] not in done]
+    if len(todo) < len(tasks):
+        print(f"Resuming: {len(tasks) - len(todo)} files were already processed.")
+    if not todo:
+        return 0
+
+    log = None
+    if checkpoint is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(checkpoint)), exist_ok=True)
+        log = open(checkpoint, "a" if resume else "w", encoding="utf-8")
+    try:
+        if nproc > 1:
+            pool = Pool(nproc)
+            results = pool.imap_unordered(_run_task, todo, chunksize=chunksize)
+        else:
+            pool = None
+            results = map(_run_task, todo)
+        for dst in tqdm(results, total=len(todo), desc=desc, unit="file"):
+            if log is not None:
+                log.write(dst + "\n")
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        if log is not None:
+            log.close()
+    return len(todo)
@@ -0,0 +1,126 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import argparse
+import json
+import os
+import os.path as osp
+
+import torch
+from mmengine.model import revert_sync_batchnorm
+
+from mmseg.apis import init_model
+from mmseg.apis.export import (ExportWrapper, export_model, load_exported,
+                               measure_latency)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Export a segmentor to TorchScript and ONNX, check the '
+        'exported files against the eager model and report their latency')
+    parser.add_argument('config', help='config file path')
+    parser.add_argument('--checkpoint', default=None, help='checkpoint file')
+    parser.add_argument(
+        '--output-prefix',
+        default='work_dirs/export/model',
+        help='the files are {prefix}.pt, {prefix}.onnx and '
+        '{prefix}_report.json')
+    parser.add_argument(
+        '--formats',
+        nargs='+',
+        default=['torchscript', 'onnx'],
+        choices=['torchscript', 'onnx'],
+        help='export formats')
+    parser.add_argument(
+        '--shape',
+        type=int,
+        nargs=2,
+        default=[512, 512],
+        help='(height, width) of the example input')
+    parser.add_argument(
+        '--verify-shapes',
+        type=int,
+        nargs='+',
+        default=None,
+        help='(height, width) pairs of the parity check, by default the '
+        'example shape and a smaller one')
+    parser.add_argument(
+        '--with-argmax',
+        action='store_true',
+        help='output the label map instead of the logits')
+    parser.add_argument(
+        '--no-norm',
+        action='store_true',
+        help='do not fuse the normalization of the data preprocessor, the '
+        'exported model then takes normalized inputs')
+    parser.add_argument('--opset', type=int, default=13, help='ONNX opset')
+    parser.add_argument(
+        '--num-runs',
+        type=int,
+        default=20,
+        help='timed runs of the latency report, 0 to skip it')
+    parser.add_argument(
+        '--num-threads',
+        type=int,
+        default=None,
+        help='CPU threads of the latency report')
+    args = parser.parse_args()
+    if args.verify_shapes is not None:
+        assert len(args.verify_shapes) % 2 == 0, \
+            '--verify-shapes takes (height, width) pairs'
+        args.verify_shapes = list(
+            zip(args.verify_shapes[::2], args.verify_shapes[1::2]))
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.num_threads is not None:
+        torch.set_num_threads(args.num_threads)
+    model = init_model(args.config, args.checkpoint, device='cpu')
+    model = revert_sync_batchnorm(model)
+    os.makedirs(osp.dirname(osp.abspath(args.output_prefix)), exist_ok=True)
+
+    results = export_model(
+        model,
+        args.output_prefix,
+        formats=args.formats,
+        shape=tuple(args.shape),
+        with_norm=not args.no_norm,
+        with_argmax=args.with_argmax,
+        verify_shapes=args.verify_shapes,
+        opset_version=args.opset)
+
+    passed = True
+    for fmt, result in results.items():
+        print(f'{fmt}: {result["file"]}')
+        if result['parity'] is None:
+            print('  parity not checked, onnxruntime is not installed')
+            continue
+        for report in result['parity']:
+            passed &= report['passed']
+            print(f'  {report}')
+
+    if args.num_runs > 0:
+        shape = (1, 3) + tuple(args.shape)
+        runners = dict(
+            eager=ExportWrapper(model, not args.no_norm,
+                                args.with_argmax).eval())
+        for fmt, result in results.items():
+            if fmt == 'torchscript' or result['parity'] is not None:
+                runners[fmt] = load_exported(result['file'])
+        print(f'latency of a {args.shape[0]}x{args.shape[1]} image, '
+              f'{torch.get_num_threads()} threads, ms:')
+        print(f'{"":<14}{"mean":>10}{"median":>10}{"p90":>10}')
+        for name, run in runners.items():
+            latency = measure_latency(run, shape, num_runs=args.num_runs)
+            results.setdefault(name, dict())['latency'] = latency
+            print(f'{name:<14}{latency["mean"]:10.2f}'
+                  f'{latency["median"]:10.2f}{latency["p90"]:10.2f}')
+
+    with open(args.output_prefix + '_report.json', 'w') as f:
+        json.dump(results, f, indent=2)
+    if not passed:
+        raise SystemExit('The exported outputs differ from the eager model')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,14 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import argparse
 
-import numpy as np
 import torch
 import torch._C
 import torch.serialization
 from mmengine import Config
+from mmengine.registry import init_default_scope
 from mmengine.runner import load_checkpoint
-from torch import nn
 
+from mmseg.apis.export import ExportWrapper, check_parity, export_torchscript
 from mmseg.models import build_segmentor
 
 torch.manual_seed(3)
@@ -56,36 +56,6 @@ def _convert_batchnorm(module):
     return module_output
 
 
-def _demo_mm_inputs(input_shape, num_classes):
-    """Create a superset of inputs needed to run test or train batches.
-
-    Args:
-        input_shape (tuple):
-            input batch dimensions
-        num_classes (int):
-            number of semantic classes
-    """
-    (N, C, H, W) = input_shape
-    rng = np.random.RandomState(0)
-    imgs = rng.rand(*input_shape)
-    segs = rng.randint(
-        low=0, high=num_classes - 1, size=(N, 1, H, W)).astype(np.uint8)
-    img_metas = [{
-        'img_shape': (H, W, C),
-        'ori_shape': (H, W, C),
-        'pad_shape': (H, W, C),
-        'filename': '<demo>.png',
-        'scale_factor': 1.0,
-        'flip': False,
-    } for _ in range(N)]
-    mm_inputs = {
-        'imgs': torch.FloatTensor(imgs).requires_grad_(True),
-        'img_metas': img_metas,
-        'gt_semantic_seg': torch.LongTensor(segs)
-    }
-    return mm_inputs
-
-
 def pytorch2libtorch(model,
                      input_shape,
                      show=False,
@@ -104,30 +74,25 @@ def pytorch2libtorch(model,
         verify (bool): Whether compare the outputs between
             Pytorch and TorchScript. Default: False.
     """
-    if isinstance(model.decode_head, nn.ModuleList):
-        num_classes = model.decode_head[-1].num_classes
-    else:
-        num_classes = model.decode_head.num_classes
-
-    mm_inputs = _demo_mm_inputs(input_shape, num_classes)
-
-    imgs = mm_inputs.pop('imgs')
-
-    # replace the original forword with forward_dummy
-    model.forward = model.forward_dummy
+    # 1.x segmentors have no ``forward_dummy``, trace the network forward
+    # and the resize of the logits to the input size instead, on normalized
+    # inputs as before. See tools/deployment/export.py to also fuse the
+    # normalization and the argmax.
     model.eval()
-    traced_model = torch.jit.trace(
-        model,
-        example_inputs=imgs,
-        check_trace=verify,
-    )
+    wrapper = ExportWrapper(model, with_norm=False)
+    export_torchscript(wrapper, output_file, input_shape)
 
     if show:
-        print(traced_model.graph)
+        print(torch.jit.load(output_file).graph)
 
-    traced_model.save(output_file)
     print(f'Successfully exported TorchScript model: {output_file}')
 
+    if verify:
+        traced_model = torch.jit.load(output_file)
+        for report in check_parity(wrapper, traced_model, [input_shape]):
+            assert report['passed'], f'TorchScript outputs differ: {report}'
+        print('The outputs are same between Pytorch and TorchScript')
+
 
 def parse_args():
     parser = argparse.ArgumentParser(
@@ -165,6 +130,7 @@ if __name__ == '__main__':
 
     cfg = Config.fromfile(args.config)
     cfg.model.pretrained = None
+    init_default_scope(cfg.get('default_scope', 'mmseg'))
 
     # build the model and load checkpoint
     cfg.model.train_cfg = None
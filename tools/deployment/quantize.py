@@ -0,0 +1,129 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import argparse
+import json
+import os
+import os.path as osp
+import time
+from itertools import islice
+
+import numpy as np
+import torch
+from mmengine.model import revert_sync_batchnorm
+from mmengine.runner import Runner
+
+from mmseg.apis import init_model
+from mmseg.apis.quantization import QUANT_MODES, quantize_model, save_quantized
+from mmseg.evaluation import IoUMetric
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Post-training int8 quantization of a SegFormer for CPU '
+        'inference, with a latency and mIoU report against fp32')
+    parser.add_argument('config', help='config file path')
+    parser.add_argument('checkpoint', help='fp32 checkpoint file')
+    parser.add_argument(
+        '--output-prefix',
+        default='work_dirs/quantize/model',
+        help='the files are {prefix}_{mode}.pth and {prefix}_report.json')
+    parser.add_argument(
+        '--mode', default='static', choices=QUANT_MODES, help='quantization')
+    parser.add_argument(
+        '--backend',
+        default='x86',
+        choices=torch.backends.quantized.supported_engines,
+        help='quantized engine')
+    parser.add_argument(
+        '--calib-batches',
+        type=int,
+        default=32,
+        help='batches of the val dataloader to calibrate a static model on')
+    parser.add_argument(
+        '--eval-batches',
+        type=int,
+        default=None,
+        help='images of the val dataloader in the report, all by default, '
+        '0 to skip the report')
+    parser.add_argument(
+        '--num-threads',
+        type=int,
+        default=None,
+        help='CPU threads of the latency report')
+    return parser.parse_args()
+
+
+def evaluate(model, data_loader, num_batches=None):
+    """Return the latencies of ``model.test_step``, in ms, and the mIoU of
+    its predictions on ``data_loader``, or None without annotations."""
+    metric = IoUMetric()
+    metric.dataset_meta = data_loader.dataset.metainfo
+    times = []
+    for data in islice(data_loader, num_batches):
+        start = time.perf_counter()
+        with torch.no_grad():
+            outputs = model.test_step(data)
+        times.append((time.perf_counter() - start) * 1000)
+        if 'gt_sem_seg' in outputs[0]:
+            metric.process(data, [output.to_dict() for output in outputs])
+    miou = metric.compute_metrics(metric.results)['mIoU'] \
+        if metric.results else None
+    return times, miou
+
+
+def main():
+    args = parse_args()
+    if args.num_threads is not None:
+        torch.set_num_threads(args.num_threads)
+    os.makedirs(osp.dirname(osp.abspath(args.output_prefix)), exist_ok=True)
+    quantized_file = f'{args.output_prefix}_{args.mode}.pth'
+
+    model = revert_sync_batchnorm(
+        init_model(args.config, args.checkpoint, device='cpu'))
+    cfg = model.cfg
+    # the calibration batches are the first batches of the val split
+    data_batches = None
+    if args.mode == 'static':
+        data_batches = islice(
+            Runner.build_dataloader(cfg.val_dataloader), args.calib_batches)
+    quantize_model(model, args.mode, data_batches, backend=args.backend)
+    save_quantized(model, quantized_file)
+    print(f'{args.mode} int8 model: {quantized_file}')
+    if args.eval_batches == 0:
+        return
+
+    cfg.val_dataloader.batch_size = 1
+    data_loader = Runner.build_dataloader(cfg.val_dataloader)
+    models = dict(
+        fp32=(args.checkpoint,
+              revert_sync_batchnorm(
+                  init_model(cfg, args.checkpoint, device='cpu'))),
+        int8=(quantized_file, init_model(cfg, quantized_file, device='cpu')))
+    results = dict()
+    print(f'{torch.get_num_threads()} threads, latency of an image in ms:')
+    print(f'{"":<6}{"mean":>10}{"median":>10}{"size MB":>10}{"mIoU":>10}'
+          f'{"drift":>10}')
+    for name, (file, model) in models.items():
+        times, miou = evaluate(model, data_loader, args.eval_batches)
+        # the first images warm the model up
+        times = times[min(5, len(times) - 1):]
+        result = dict(
+            checkpoint=file,
+            size=osp.getsize(file) / 2**20,
+            mean=float(np.mean(times)),
+            median=float(np.median(times)),
+            mIoU=miou)
+        reference = results.get('fp32', result)
+        result['mIoU_drift'] = None if miou is None else \
+            round(miou - reference['mIoU'], 2)
+        results[name] = result
+        drift = 'n/a' if miou is None else f'{result["mIoU_drift"]:+.2f}'
+        miou = 'n/a' if miou is None else f'{miou:.2f}'
+        print(f'{name:<6}{result["mean"]:10.2f}{result["median"]:10.2f}'
+              f'{result["size"]:10.2f}{miou:>10}{drift:>10}')
+    results['int8'].update(mode=args.mode, backend=args.backend)
+    with open(args.output_prefix + '_report.json', 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
+
+import mmcv
+import numpy as np
+import torch
+
+from mmseg.apis.utils import _get_test_pipeline, _shape_bucket
+from mmseg.models import BaseSegmentor
+from mmseg.structures import SegDataSample
+
+IMAGE_EXTENSIONS = (".jpg", ".png")
+
+
+def list_images(input_folder: str) -> List[str]:
+    """
+    List the images of a folder in a deterministic order.
+
+    :param input_folder: str
+        Folder containing the images.
+    :return: list[str]
+        Sorted paths of the ``.jpg`` and ``.png`` files in the folder.
+    """
+    return [
+        os.path.join(input_folder, name)
+        for name in sorted(os.listdir(input_folder))
+        if name.endswith(IMAGE_EXTENSIONS)
+    ]
+
+
+class FolderInferenceEngine:
+    """
+    Streaming inference over a sequence of image paths.
+
+    Images are decoded and run through the test pipeline in a thread pool,
+    ``prefetch`` images ahead of the model so it never waits for the disk.
+    Decoded samples are grouped into buckets of similar network input size,
+    and every bucket that reaches ``batch_size`` goes through the segmentor
+    as a single batch, padded to its largest image. Results are yielded as
+    soon as their batch is done, so the number of images held in memory is
+    bounded by ``prefetch`` no matter how many images are processed.
+
+    :param model: BaseSegmentor
+        Segmentor returned by ``init_model``.
+    :param batch_size: int
+        Maximum number of images per forward pass.
+    :param num_workers: int
+        Number of decoding threads.
+    :param prefetch: int
+        Maximum number of decoded images waiting for the model.
+    :param bucket_stride: int
+        Size granularity of the buckets, in pixels of the network input.
+        1 only batches images of identical input size.
+    :param keep_logits: bool
+        Keep ``seg_logits`` in the yielded results. They are dropped by
+        default because they are the largest part of a ``SegDataSample``.
+    """
+
+    def __init__(
+        self,
+        model: BaseSegmentor,
+        batch_size: int = 4,
+        num_workers: int = 4,
+        prefetch: int = 16,
+        bucket_stride: int = 32,
+        keep_logits: bool = False,
+    ):
+        assert batch_size >= 1, "batch_size must be positive"
+        self.model = model
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.prefetch = max(prefetch, batch_size)
+        self.bucket_stride = bucket_stride
+        self.keep_logits = keep_logits
+        self.pipeline = _get_test_pipeline(model, from_ndarray=True)
+
+    def _load(self, path: str) -> Tuple[str, np.ndarray, dict]:
+        """
+        Decode an image and run it through the test pipeline.
+
+        :param path: str
+            Path to the image.
+        :return: tuple
+            The path, the decoded BGR image and the packed pipeline output.
+        """
+        image = mmcv.imread(path)
+        if image is None:
+            raise FileNotFoundError(f"Image not found: {path}")
+        data = self.pipeline(dict(img=image))
+        data["data_samples"].set_metainfo(dict(img_path=path))
+        return path, image, data
+
+    def _forward(
+        self, batch: List[Tuple[str, np.ndarray, dict]]
+    ) -> Iterator[Tuple[str, np.ndarray, SegDataSample]]:
+        """
+        Run one bucket through the segmentor.
+
+        :param batch: list
+            Items produced by ``_load``.
+        :return: iterator
+            ``(path, image, result)`` for every item of the batch.
+        """
+        data = dict(
+            inputs=[item[2]["inputs"] for item in batch],
+            data_samples=[item[2]["data_samples"] for item in batch],
+        )
+        with torch.no_grad():
+            results = self.model.test_step(data)
+        for (path, image, _), result in zip(batch, results):
+            if not self.keep_logits and "seg_logits" in result:
+                del result.seg_logits
+            yield path, image, result
+
+    def __call__(
+        self, image_paths: Iterable[str]
+    ) -> Iterator[Tuple[str, np.ndarray, SegDataSample]]:
+        """
+        Run inference over ``image_paths``.
+
+        Results come out in completion order, not in input order.
+
+        :param image_paths: iterable of str
+            Paths to the images.
+        :return: iterator
+            ``(path, image, result)`` triplets, where ``image`` is the
+            decoded BGR image at its original resolution.
+        """
+        paths = iter(image_paths)
+        buckets = {}
+        num_buffered = 0
+        with ThreadPoolExecutor(max_workers=self.num_workers) as pool:
+            pending = deque(pool.submit(self._load, p)
+                            for p in islice(paths, self.prefetch))
+            while pending:
+                item = pending.popleft().result()
+                next_path = next(paths, None)
+                if next_path is not None:
+                    pending.append(pool.submit(self._load, next_path))
+
+                key = _shape_bucket(item[2]["inputs"].shape, self.bucket_stride)
+                bucket = buckets.setdefault(key, [])
+                bucket.append(item)
+                num_buffered += 1
+                if len(bucket) < self.batch_size:
+                    if num_buffered < self.prefetch:
+                        continue
+                    # too many partial buckets: flush the fullest one
+                    key = max(buckets, key=lambda k: len(buckets[k]))
+                bucket = buckets.pop(key)
+                num_buffered -= len(bucket)
+                yield from self._forward(bucket)
+
+        for bucket in buckets.values():
+            yield from self._forward(bucket)
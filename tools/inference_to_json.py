@@ -1,10 +1,10 @@
 import os
-from tqdm import tqdm
-from mmseg.apis.inference import inference_model, init_model
-from tools.inference import make_dir_if_not_exists
 from argparse import ArgumentParser
 
-from tools.utils_json_to_json import seg_results_to_json
+from mmseg.apis.inference import init_model
+from tools.inference import make_dir_if_not_exists
+from tools.inference_engine import FolderInferenceEngine, list_images
+from tools.utils_json_to_json import done_images, seg_results_to_json
 
 
 def parse_args():
@@ -14,6 +14,85 @@ def parse_args():
     parser.add_argument("-inp", "--input_folder", required=True, help="Image folder")
     parser.add_argument("-out", "--out_dir", required=True, help="Output directory")
     parser.add_argument("--gpu", help="GPU device", default=0)
+    parser.add_argument(
+        "--batch_size", type=int, default=4, help="Images per forward pass"
+    )
+    parser.add_argument(
+        "--num_workers", type=int, default=4, help="Image decoding threads"
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=16,
+        help="Maximum number of decoded images waiting for the model",
+    )
+    parser.add_argument(
+        "--bucket_stride",
+        type=int,
+        default=32,
+        help="Size granularity of the batching buckets, in network input pixels",
+    )
+    parser.add_argument(
+        "--refine_workers",
+        type=int,
+        default=4,
+        help="GrabCut refinement processes, 0 to refine in the main process",
+    )
+    parser.add_argument(
+        "--debug_dir", default=None, help="Directory for GrabCut debug masks"
+    )
+    parser.add_argument(
+        "--refine_mode",
+        choices=["full", "roi"],
+        default="full",
+        help="Run GrabCut on the full frame or on the padded mask bounding box",
+    )
+    parser.add_argument(
+        "--roi_margin",
+        type=float,
+        default=0.1,
+        help="Bounding box padding in roi mode, as a fraction of the box size",
+    )
+    parser.add_argument(
+        "--refine_scale",
+        type=float,
+        default=1.0,
+        help="Resize factor of the GrabCut working region",
+    )
+    parser.add_argument(
+        "--grabcut_iters", type=int, default=5, help="GrabCut iterations"
+    )
+    parser.add_argument(
+        "--multi_class",
+        action="store_true",
+        help="Emit every blob of every class instead of the refined largest garment",
+    )
+    parser.add_argument(
+        "--min_area", type=int, default=0, help="Minimum blob area in multi-class mode"
+    )
+    parser.add_argument(
+        "--simplify_tolerance",
+        type=float,
+        default=0.0,
+        help="Polygon simplification tolerance in pixels in multi-class mode",
+    )
+    parser.add_argument(
+        "--out_format",
+        choices=["json", "jsonl"],
+        default="json",
+        help="Write results.json incrementally or one record per line to results.jsonl",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip the images already present in the results file",
+    )
+    parser.add_argument(
+        "--fsync_interval",
+        type=int,
+        default=100,
+        help="Number of images between two fsyncs of the results file",
+    )
     return parser.parse_args()
 
 
@@ -22,16 +101,46 @@ def main(args):
     model = init_model(
         config=args.config, checkpoint=args.checkpoint, device=f"cuda:{args.gpu}"
     )
-    results = []
-    for img in tqdm(os.listdir(args.input_folder)):
-        if not img.endswith(".jpg") | img.endswith(".png"):
-            continue
-        result = inference_model(
-            model, f"{args.input_folder}/{img}"
-        )  # here you can either specify a path to the image or a numpy array
-        results.append(result)
+    engine = FolderInferenceEngine(
+        model,
+        batch_size=args.batch_size,
+        num_workers=args.num_workers,
+        prefetch=args.prefetch,
+        bucket_stride=args.bucket_stride,
+    )
+    save_path = f"{args.out_dir}/results.{args.out_format}"
+    image_paths = list_images(args.input_folder)
+    if args.resume:
+        done = done_images(save_path)
+        image_paths = [p for p in image_paths if os.path.basename(p) not in done]
+    if args.debug_dir is not None:
+        make_dir_if_not_exists(args.debug_dir)
 
-    seg_results_to_json(results, save_path=f"{args.out_dir}/results.json")
+    if args.multi_class:
+        extract_cfg = dict(
+            multi_class=True,
+            cat_mapping=dict(enumerate(model.dataset_meta["classes"])),
+            min_area=args.min_area,
+            simplify_tolerance=args.simplify_tolerance,
+        )
+    else:
+        extract_cfg = dict(
+            grabcut_iters=args.grabcut_iters,
+            roi_margin=args.roi_margin if args.refine_mode == "roi" else None,
+            scale=args.refine_scale,
+            debug_dir=args.debug_dir,
+        )
+
+    # the engine yields the decoded images, so GrabCut does not read them again
+    seg_results_to_json(
+        engine(image_paths),
+        save_path=save_path,
+        total=len(image_paths),
+        resume=args.resume,
+        fsync_interval=args.fsync_interval,
+        num_workers=args.refine_workers,
+        **extract_cfg,
+    )
 
 
 if __name__ == "__main__":
@@ -1,7 +1,13 @@
 import json
+import multiprocessing
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator
+
 import cv2
 import numpy as np
+from scipy import ndimage
 from tqdm import tqdm
 
 
@@ -15,9 +21,288 @@ def save_json(data: dict, file_path: str):
         json.dump(data, f)
 
 
+def _scan_results(file_path: str, keep_instances: bool = True) -> tuple:
+    """
+    Read a results file written by ``ResultsWriter``, tolerating a truncated tail.
+
+    :param file_path: Path to a ``.json`` or ``.jsonl`` results file.
+    :param keep_instances: If False, the predictions only map image names to None.
+    :return: ``(cat_mapping, predictions, end_offset)``, where ``end_offset`` is the
+        byte offset right after the last complete record.
+    """
+    cat_mapping, predictions, end_offset = None, {}, 0
+    is_jsonl = file_path.endswith(".jsonl")
+    with open(file_path, "rb") as f:
+        for line_no, raw_line in enumerate(f):
+            if not raw_line.endswith(b"\n"):
+                break  # interrupted while writing this record
+            line = raw_line.decode("utf-8").strip()
+            try:
+                if is_jsonl:
+                    record = json.loads(line)
+                    if "id_to_cat_mapping" in record:
+                        cat_mapping = record["id_to_cat_mapping"]
+                        record = {}
+                    else:
+                        record = {record["image"]: record["instances"]}
+                elif line_no == 0:
+                    header = json.loads(line + "}}")
+                    cat_mapping = header.get("id_to_cat_mapping")
+                    record = {}
+                elif line == "}}":
+                    break  # closing line, the file is complete
+                else:
+                    record = json.loads("{" + line.lstrip(",") + "}")
+            except (json.JSONDecodeError, KeyError):
+                break
+            for name, instances in record.items():
+                predictions[name] = instances if keep_instances else None
+            end_offset += len(raw_line)
+    return cat_mapping, predictions, end_offset
+
+
+def done_images(file_path: str) -> set:
+    """
+    List the images already present in a results file, e.g. to resume a job.
+
+    :param file_path: Path to a ``.json`` or ``.jsonl`` results file.
+    :return: Names of the images with a complete record, empty if the file is missing.
+    """
+    if not os.path.isfile(file_path):
+        return set()
+    return set(_scan_results(file_path, keep_instances=False)[1])
+
+
+def read_results(file_path: str) -> dict:
+    """
+    Load a results file written by ``ResultsWriter`` in the
+    ``{"id_to_cat_mapping", "predictions"}`` layout, even if it was not closed.
+
+    :param file_path: Path to a ``.json`` or ``.jsonl`` results file.
+    :return: The results dictionary.
+    """
+    cat_mapping, predictions, _ = _scan_results(file_path)
+    results = {}
+    if cat_mapping is not None:
+        results["id_to_cat_mapping"] = cat_mapping
+    results["predictions"] = predictions
+    return results
+
+
+def convert_results(src_path: str, dst_path: str):
+    """
+    Convert a streamed results file to a single ``{"id_to_cat_mapping", "predictions"}``
+    JSON file for downstream consumers.
+
+    :param src_path: Path to a ``.json`` or ``.jsonl`` results file.
+    :param dst_path: Path to the output JSON file.
+    """
+    save_json(read_results(src_path), dst_path)
+
+
+class ResultsWriter:
+    """
+    Write per-image results to disk as soon as they are produced.
+
+    Two formats are supported, chosen from the file extension:
+
+    - ``.jsonl``: one ``{"image": name, "instances": [...]}`` record per line,
+      preceded by a ``{"id_to_cat_mapping": ...}`` line if a mapping is given.
+    - ``.json``: the ``{"id_to_cat_mapping", "predictions"}`` layout written
+      incrementally, one prediction per line. The object is closed by ``close``;
+      an unclosed file can still be read with ``read_results``.
+
+    The file is flushed and fsynced every ``fsync_interval`` records. With
+    ``resume`` an existing file is kept, a partially written last record is
+    dropped, and the images it already contains are listed in ``done``.
+
+    :param save_path: Path to the output file.
+    :param cat_mapping: Optional category id to name mapping.
+    :param resume: Append to an existing file instead of overwriting it.
+    :param fsync_interval: Number of records between two fsyncs.
+    """
+
+    def __init__(
+        self,
+        save_path: str,
+        cat_mapping: dict = None,
+        resume: bool = False,
+        fsync_interval: int = 100,
+    ):
+        self.save_path = save_path
+        self.is_jsonl = save_path.endswith(".jsonl")
+        self.fsync_interval = fsync_interval
+        self.done = set()
+
+        if resume and os.path.isfile(save_path):
+            file_cat_mapping, predictions, end_offset = _scan_results(
+                save_path, keep_instances=False
+            )
+            self.done = set(predictions)
+            os.truncate(save_path, end_offset)
+            self._file = open(save_path, "a", encoding="utf-8")
+            if end_offset == 0:
+                self._write_header(cat_mapping)
+            elif cat_mapping is not None and file_cat_mapping is None:
+                raise ValueError(
+                    f"{save_path} has no category mapping, cannot resume with one."
+                )
+        else:
+            self._file = open(save_path, "w", encoding="utf-8")
+            self._write_header(cat_mapping)
+        self._num_written = len(self.done)
+        self._num_unsynced = 0
+
+    def _write_header(self, cat_mapping: dict | None):
+        if self.is_jsonl:
+            if cat_mapping is not None:
+                self._file.write(json.dumps({"id_to_cat_mapping": cat_mapping}) + "\n")
+            return
+        header = {} if cat_mapping is None else {"id_to_cat_mapping": cat_mapping}
+        # drop the closing brace, predictions follow on their own lines
+        self._file.write(json.dumps(header)[:-1])
+        self._file.write(", " if header else "")
+        self._file.write('"predictions": {\n')
+
+    def write(self, name: str, instances: list | None):
+        """
+        Append the result of one image.
+
+        :param name: Image name, the key of the record.
+        :param instances: Instances of the image, or None.
+        """
+        if self.is_jsonl:
+            record = json.dumps({"image": name, "instances": instances})
+        else:
+            record = json.dumps({name: instances})[1:-1]
+            if self._num_written:
+                record = "," + record
+        self._file.write(record + "\n")
+        self.done.add(name)
+        self._num_written += 1
+        self._num_unsynced += 1
+        if self._num_unsynced >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        """
+        Flush the written records to disk.
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._num_unsynced = 0
+
+    def close(self):
+        """
+        Close the JSON object if needed and flush the file.
+        """
+        if not self.is_jsonl:
+            self._file.write("}}\n")
+        self.sync()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # leave the file open-ended so that it can be resumed
+            self.sync()
+            self._file.close()
+
+
+def grabcut_refine(
+    image: np.ndarray,
+    binary_mask: np.ndarray,
+    grabcut_iters: int = 5,
+    roi_margin: float = None,
+    scale: float = 1.0,
+) -> np.ndarray:
+    """
+    Refine a binary mask with GrabCut.
+
+    By default GrabCut runs over the whole frame. With ``roi_margin`` it only runs on
+    the bounding box of the mask padded by that fraction of the box size on every
+    side, everything outside the box being background. With ``scale < 1`` the
+    working region is downscaled before GrabCut and the result is upsampled back.
+
+    :param image: numpy.ndarray
+        BGR image - (H x W x 3) uint8 array.
+    :param binary_mask: numpy.ndarray
+        Binary mask - (H x W) uint8 array with values 0 and 1.
+    :param grabcut_iters: int
+        Number of GrabCut iterations.
+    :param roi_margin: float, optional
+        Padding of the mask bounding box, as a fraction of its width and height.
+        None runs GrabCut on the full frame.
+    :param scale: float
+        Resize factor applied to the working region, in (0, 1].
+    :return: numpy.ndarray
+        Refined binary mask - (H x W) uint8 array with values 0 and 1.
+    """
+    assert 0 < scale <= 1, "scale must be in (0, 1]"
+    height, width = binary_mask.shape
+    x0, y0, x1, y1 = 0, 0, width, height
+    if roi_margin is not None:
+        x, y, w, h = cv2.boundingRect(binary_mask)
+        if w == 0 or h == 0:
+            return np.zeros_like(binary_mask)
+        pad_x, pad_y = int(round(w * roi_margin)), int(round(h * roi_margin))
+        x0, y0 = max(x - pad_x, 0), max(y - pad_y, 0)
+        x1, y1 = min(x + w + pad_x, width), min(y + h + pad_y, height)
+
+    roi_image = image[y0:y1, x0:x1]
+    roi_mask = binary_mask[y0:y1, x0:x1]
+    if scale < 1:
+        size = (
+            max(int(round((x1 - x0) * scale)), 1),
+            max(int(round((y1 - y0) * scale)), 1),
+        )
+        roi_image = cv2.resize(roi_image, size, interpolation=cv2.INTER_AREA)
+        roi_mask = cv2.resize(roi_mask, size, interpolation=cv2.INTER_NEAREST)
+
+    refined_mask = binary_mask.copy()
+    # GrabCut needs samples of both models to initialise from a mask
+    if roi_mask.all() or not roi_mask.any():
+        return refined_mask
+
+    # Define the foreground and background models for Graph Cuts
+    gc_mask = np.where(roi_mask == 1, cv2.GC_PR_FGD, cv2.GC_PR_BGD).astype(np.uint8)
+    bgd_model = np.zeros((1, 65), np.float64)
+    fgd_model = np.zeros((1, 65), np.float64)
+    cv2.grabCut(
+        roi_image,
+        gc_mask,
+        None,
+        bgd_model,
+        fgd_model,
+        grabcut_iters,
+        cv2.GC_INIT_WITH_MASK,
+    )
+    roi_refined = (gc_mask == cv2.GC_FGD) | (gc_mask == cv2.GC_PR_FGD)
+    roi_refined = roi_refined.astype(np.uint8)
+    if scale < 1:
+        # upsample the soft mask and threshold it to avoid blocky edges
+        roi_refined = cv2.resize(
+            roi_refined * 255, (x1 - x0, y1 - y0), interpolation=cv2.INTER_LINEAR
+        )
+        roi_refined = (roi_refined > 127).astype(np.uint8)
+
+    refined_mask[:] = 0
+    refined_mask[y0:y1, x0:x1] = roi_refined
+    return refined_mask
+
+
 def sem_seg_tensor_output_to_instance_dict(
     original_image_path: str,
     binary_mask: np.ndarray,
+    original_image: np.ndarray = None,
+    grabcut_iters: int = 5,
+    roi_margin: float = None,
+    scale: float = 1.0,
+    debug_dir: str = None,
 ) -> dict | None:
     """
     Given a binary mask, containing id per pixel, produce a dictionary describing the largest instance.
@@ -28,49 +313,50 @@ def sem_seg_tensor_output_to_instance_dict(
     4. Add confidence and label fields.
 
     :param original_image_path: str
-        Path to the original image.
+        Path to the original image. Only read when ``original_image`` is None.
     :param binary_mask: numpy.ndarray
         Binary mask - (H x W) uint8 array.
+    :param original_image: numpy.ndarray, optional
+        Already decoded BGR image, to avoid reading it again from disk.
+    :param grabcut_iters: int
+        Number of GrabCut iterations.
+    :param roi_margin: float, optional
+        Run GrabCut on the padded mask bounding box, see ``grabcut_refine``.
+    :param scale: float
+        Resize factor of the GrabCut working region, see ``grabcut_refine``.
+    :param debug_dir: str, optional
+        If given, the predicted and refined masks are written there as PNGs.
     :return: dict | None
         Dictionary containing instance data or None if no valid instance is found.
     """
     # Load the original image
-    original_image = cv2.imread(original_image_path)
+    if original_image is None:
+        original_image = cv2.imread(original_image_path)
     if original_image is None:
         raise FileNotFoundError(f"Image not found: {original_image_path}")
 
     # Ensure binary_mask is binary (0 or 1)
     binary_mask = (binary_mask > 0).astype(np.uint8)
 
-    # save mask here
-    cv2.imwrite("bin_mask.png", binary_mask[0] * 255)
-
-    # Prepare the mask for Graph Cuts
-    mask_fg = binary_mask.copy()[0] * 255
-    mask_bg = cv2.bitwise_not(mask_fg)
-    # Define the foreground and background models for Graph Cuts
-    mask = np.zeros(original_image.shape[:2], np.uint8)  # Initialize mask for GrabCut
-    mask[binary_mask[0] == 1] = cv2.GC_PR_FGD
-    mask[binary_mask[0] == 0] = cv2.GC_PR_BGD
-    bgd_model = np.zeros((1, 65), np.float64)
-    fgd_model = np.zeros((1, 65), np.float64)
+    if debug_dir is not None:
+        debug_name = os.path.splitext(os.path.basename(original_image_path))[0]
+        cv2.imwrite(
+            os.path.join(debug_dir, f"{debug_name}_bin_mask.png"), binary_mask[0] * 255
+        )
 
-    # Apply Graph Cuts
-    refined_mask = mask.copy()
-    cv2.grabCut(
+    refined_mask = grabcut_refine(
         original_image,
-        refined_mask,
-        None,
-        bgd_model,
-        fgd_model,
-        5,
-        cv2.GC_INIT_WITH_MASK,
+        binary_mask[0],
+        grabcut_iters=grabcut_iters,
+        roi_margin=roi_margin,
+        scale=scale,
     )
-    refined_mask = np.where(
-        (refined_mask == cv2.GC_FGD) | (refined_mask == cv2.GC_PR_FGD), 1, 0
-    ).astype(np.uint8)
 
-    cv2.imwrite("bin_mask_ref.png", refined_mask * 255)
+    if debug_dir is not None:
+        cv2.imwrite(
+            os.path.join(debug_dir, f"{debug_name}_bin_mask_ref.png"),
+            refined_mask * 255,
+        )
 
     # Find connected components
     num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(
@@ -111,32 +397,216 @@ def sem_seg_tensor_output_to_instance_dict(
     return [instance_dict]
 
 
+def label_map_to_instance_dicts(
+    label_map: np.ndarray,
+    min_area: int = 0,
+    simplify_tolerance: float = 0.0,
+    ignore_ids: tuple = (0,),
+) -> list:
+    """
+    Extract one instance per 8-connected blob of every class of a label map.
+
+    Every class is labelled on its own bounding-box crop, found for all the classes
+    with one ``ndimage.find_objects`` call on the label map, so the extra memory is
+    that of the largest crop rather than of a (K x H x W) volume, and the per-image
+    cost depends on the classes present, not on the number of classes of the model.
+
+    :param label_map: numpy.ndarray
+        Class id per pixel - (H x W) integer array, e.g. ``pred_sem_seg``.
+    :param min_area: int
+        Blobs with fewer pixels are dropped.
+    :param simplify_tolerance: float
+        ``cv2.approxPolyDP`` tolerance in pixels, 0 keeps the raw contour.
+    :param ignore_ids: tuple
+        Class ids that do not produce instances, background by default.
+    :return: list
+        Instance dictionaries sorted by class id then decreasing area.
+    """
+    # slice c + 1 is the bounding box of class c, None if it is absent
+    class_slices = ndimage.find_objects(label_map.astype(np.int32) + 1)
+    structure = np.ones((3, 3), dtype=bool)  # 8-connectivity
+
+    instances = []
+    for class_id, class_slice in enumerate(class_slices):
+        if class_slice is None or class_id in ignore_ids:
+            continue
+        crop_ys, crop_xs = class_slice
+        components, _ = ndimage.label(
+            label_map[class_slice] == class_id, structure=structure
+        )
+        areas = np.bincount(components.ravel())[1:]
+        slices = ndimage.find_objects(components)
+        keep = np.flatnonzero(areas >= max(min_area, 1))
+        for idx in keep[np.argsort(-areas[keep], kind="stable")]:
+            ys, xs = slices[idx]
+            blob = (components[ys, xs] == idx + 1).astype(np.uint8)
+            y0, x0 = crop_ys.start + ys.start, crop_xs.start + xs.start
+            contours, _ = cv2.findContours(
+                blob,
+                cv2.RETR_EXTERNAL,
+                cv2.CHAIN_APPROX_SIMPLE,
+                offset=(x0, y0),
+            )
+            contour = max(contours, key=cv2.contourArea)
+            if simplify_tolerance > 0:
+                contour = cv2.approxPolyDP(contour, simplify_tolerance, True)
+            instances.append(
+                {
+                    "mask": [(int(x), int(y)) for x, y in contour[:, 0]],
+                    "bbox": [
+                        x0,
+                        y0,
+                        crop_xs.start + xs.stop,
+                        crop_ys.start + ys.stop,
+                    ],
+                    "area": int(areas[idx]),
+                    "confidence": 1.0,
+                    "category:_id": class_id,
+                }
+            )
+    return instances
+
+
+def _init_refine_worker():
+    """
+    Keep each worker on a single OpenCV thread, the pool provides the parallelism.
+    """
+    cv2.setNumThreads(1)
+
+
+def _refine_worker(
+    path: str,
+    image: np.ndarray | None,
+    seg_map: np.ndarray,
+    multi_class: bool,
+    refine_cfg: dict,
+) -> tuple:
+    """
+    Process pool entry point of ``refine_results``.
+    """
+    if multi_class:
+        instances = label_map_to_instance_dicts(seg_map[0], **refine_cfg)
+    else:
+        instances = sem_seg_tensor_output_to_instance_dict(
+            original_image_path=path,
+            binary_mask=seg_map,
+            original_image=image,
+            **refine_cfg,
+        )
+    return os.path.basename(path), instances
+
+
+def _as_triplet(result) -> tuple:
+    """
+    Normalize a result to a ``(path, image, SegDataSample)`` triplet.
+    """
+    if isinstance(result, tuple):
+        return result
+    return result.img_path, None, result
+
+
+def refine_results(
+    results: Iterable,
+    num_workers: int = 4,
+    max_pending: int = None,
+    multi_class: bool = False,
+    **refine_cfg,
+) -> Iterator[tuple]:
+    """
+    Run ``sem_seg_tensor_output_to_instance_dict`` over a stream of results in parallel.
+
+    Only the predicted map and, when GrabCut needs it, the decoded image are sent to
+    the workers. At most ``max_pending`` images are in flight, so memory stays bounded
+    for arbitrarily long streams.
+
+    :param results: Iterable of ``SegDataSample`` or of ``(path, image, SegDataSample)``
+        triplets as yielded by ``FolderInferenceEngine``. When ``image`` is None the
+        worker reads it from ``path``.
+    :param num_workers: Number of worker processes. 0 runs everything in this process.
+    :param max_pending: Maximum number of images submitted and not yet returned.
+        Defaults to ``2 * num_workers``.
+    :param multi_class: Extract every class with ``label_map_to_instance_dicts``
+        instead of refining the largest foreground blob.
+    :param refine_cfg: Keyword arguments of ``sem_seg_tensor_output_to_instance_dict``
+        (``grabcut_iters``, ``roi_margin``, ``scale``, ``debug_dir``), or of
+        ``label_map_to_instance_dicts`` (``min_area``, ``simplify_tolerance``) when
+        ``multi_class`` is set.
+    :return: Iterator of ``(image_name, instances)`` pairs, in input order.
+    """
+    triplets = (_as_triplet(result) for result in results)
+    if num_workers == 0:
+        # no pool: leave the process-wide OpenCV thread count untouched
+        for path, image, pred in triplets:
+            seg_map = pred.pred_sem_seg.data.cpu().numpy().astype(np.uint8)
+            yield _refine_worker(path, image, seg_map, multi_class, refine_cfg)
+        return
+
+    max_pending = max_pending or 2 * num_workers
+    pending = deque()
+    # spawn rather than fork: the parent holds CUDA state and decoding threads
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_refine_worker,
+    ) as pool:
+        for path, image, pred in triplets:
+            seg_map = pred.pred_sem_seg.data.cpu().numpy().astype(np.uint8)
+            image = None if multi_class else image
+            pending.append(
+                pool.submit(
+                    _refine_worker, path, image, seg_map, multi_class, refine_cfg
+                )
+            )
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
 def seg_results_to_json(
     results,
     save_path: str = "results.json",
     cat_mapping: dict = None,
+    total: int = None,
+    num_workers: int = 4,
+    resume: bool = False,
+    fsync_interval: int = 100,
+    multi_class: bool = False,
+    **refine_cfg,
 ) -> None:
     """
-    Convert YOLO segmentation results to JSON format.
+    Convert segmentation results to JSON format.
 
-    :param results: YOLO segmentation results.
-    :param confidence_threshold: Confidence threshold.
-    :param save_path: Path to save the JSON file.
+    Each image is written as soon as it is refined, see ``ResultsWriter``. A ``.json``
+    ``save_path`` produces the ``{"id_to_cat_mapping", "predictions"}`` layout and a
+    ``.jsonl`` one a JSON Lines file, which ``convert_results`` turns into that layout.
+
+    :param results: Iterable of ``SegDataSample`` or of ``(path, image, SegDataSample)``
+        triplets. It can be a generator, in which case every result is refined as
+        soon as it is produced.
+    :param save_path: Path to save the ``.json`` or ``.jsonl`` file.
+    :param cat_mapping: Optional category id to name mapping.
+    :param total: Number of results, for the progress bar only.
+    :param num_workers: Number of GrabCut worker processes.
+    :param resume: Keep the images already in ``save_path`` and skip them.
+    :param fsync_interval: Number of images between two fsyncs of the output.
+    :param multi_class: Emit one instance per blob of every class, see
+        ``refine_results``.
+    :param refine_cfg: Keyword arguments forwarded to ``refine_results``.
     """
-    json_results = {}
-    for pred in tqdm(results, desc="Converting to JSON"):
-        binary_mask, path = (
-            pred.pred_sem_seg.data.cpu().numpy(),
-            pred.img_path,
+    with ResultsWriter(
+        save_path, cat_mapping=cat_mapping, resume=resume, fsync_interval=fsync_interval
+    ) as writer:
+        todo = (
+            triplet
+            for triplet in map(_as_triplet, results)
+            if os.path.basename(triplet[0]) not in writer.done
         )
-        instances_list_of_dicts = sem_seg_tensor_output_to_instance_dict(
-            original_image_path=path, binary_mask=binary_mask
+        refined = refine_results(
+            todo, num_workers=num_workers, multi_class=multi_class, **refine_cfg
         )
-        json_results[os.path.basename(path)] = instances_list_of_dicts
-
-    final_json = {}
-    if cat_mapping is not None:
-        final_json["id_to_cat_mapping"] = cat_mapping
-    final_json["predictions"] = json_results
-    save_json(final_json, save_path)
-    print(f"Results saved to {save_path}")
\ No newline at end of file
+        for name, instances_list_of_dicts in tqdm(
+            refined, desc="Converting to JSON", total=total
+        ):
+            writer.write(name, instances_list_of_dicts)
+    print(f"Results saved to {save_path}")